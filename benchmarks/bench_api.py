@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+# Measure read API throughput: keep-alive clients fetching /current, with and
+# without If-None-Match. The cache is filled with a synthetic snapshot, so no
+# database is needed.
+# Run from the repository root: python benchmarks/bench_api.py
+import http.client
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from snapshot import Snapshot, MEASUREMENT_FIELDS
+import station_api
+
+PORT = 18751
+CLIENTS = 8
+REQUESTS = 2000  # per client
+
+def make_snapshot():
+    now = datetime.now(timezone.utc)
+    values = {field: float(index) for index, field in enumerate(MEASUREMENT_FIELDS)}
+    values['wind_cardinal'] = 'SW'
+    return Snapshot(source_id=1, source_time=now, timestamp=now, **values)
+
+def client(results, conditional):
+    connection = http.client.HTTPConnection('127.0.0.1', PORT)
+    headers = {}
+    statuses = {}
+    for _ in range(REQUESTS):
+        connection.request('GET', '/current', headers=headers)
+        response = connection.getresponse()
+        response.read()
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if conditional:
+            headers['If-None-Match'] = response.getheader('ETag')
+    connection.close()
+    results.append(statuses)
+
+def run(conditional):
+    results = []
+    threads = [threading.Thread(target=client, args=(results, conditional)) for _ in range(CLIENTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    statuses = {}
+    for result in results:
+        for status, count in result.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return CLIENTS * REQUESTS / elapsed, statuses
+
+def main():
+    snapshot = make_snapshot()
+    api_config = {'enabled': True, 'port': PORT, 'history': False}
+    cache = station_api.start_read_api(api_config, lambda: snapshot, None, forecasts=False)
+    cache.publish('current', snapshot.to_json())
+
+    for name, conditional in (("GET /current", False), ("conditional GET", True)):
+        rate, statuses = run(conditional)
+        print(f"{name:18s} {rate:8.0f} req/s  {statuses}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+# Time the forecast bias correction for one location and check that it removes a
+# known bias. A temporary SQLite database is filled with a month of synthetic
+# readings and archived issuances whose forecasts run warm by day and dry by night.
+# Run from the repository root: python benchmarks/bench_correction.py
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'forecast'))
+import numpy as np
+
+import visualcrossing_forecast as forecast
+from forecast_correction import BiasCorrection
+from sensor_ingest import READING_COLUMNS
+
+DAYS = 30
+ISSUE_EVERY = 3  # hours between archived issuances
+HORIZON = 48  # hours per issuance
+RUNS = 20
+
+def truth(moment):
+    """Synthetic observed (temp, humidity) at a moment"""
+    phase = (moment.hour + moment.minute / 60) / 24 * 2 * math.pi
+    return 12 - 6 * math.cos(phase) + 2 * math.sin(moment.toordinal() / 3), 75 + 15 * math.cos(phase)
+
+def forecast_values(moment, lead):
+    """Synthetic forecast: +2 C in the afternoon, -8 % humidity at night, noise growing with lead"""
+    temp, humidity = truth(moment)
+    noise = np.random.normal(0, 0.3 + lead / 48)
+    return temp + (2.0 if 12 <= moment.hour < 18 else 0.5) + noise, humidity - (8 if moment.hour < 6 else 0) + noise
+
+def fill(connection, now):
+    cursor = connection.cursor()
+    start = now - timedelta(days=DAYS)
+
+    # One reading every 5 minutes
+    columns = ['CREATED'] + READING_COLUMNS
+    rows = []
+    moment = start
+    while moment < now:
+        temp, humidity = truth(moment)
+        reading = dict.fromkeys(READING_COLUMNS, 0.0)
+        reading.update({'AIR_TEMP': temp, 'HUMIDITY': humidity, 'DEW_POINT': temp - 5,
+                        'PRESSURE_SEA': 1013.0, 'WIND_SPEED': 8.0, 'WIND_GUST': 12.0, 'WIND_CARDINAL': 'N'})
+        rows.append((moment,) + tuple(reading[column] for column in READING_COLUMNS))
+        moment += timedelta(minutes=5)
+    cursor.executemany(f"INSERT INTO dataentry ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+                       rows)
+
+    # Archived issuances every ISSUE_EVERY hours
+    archive = []
+    issued = start
+    while issued < now:
+        for lead in range(HORIZON):
+            valid = issued + timedelta(hours=lead)
+            temp, humidity = forecast_values(valid, lead)
+            archive.append(('Here', issued, valid, lead, temp, humidity, temp - 5, 0.0, 12.0, 8.0, 0.0, 1013.0))
+        issued += timedelta(hours=ISSUE_EVERY)
+    cursor.executemany(forecast.STORAGE.insert_ignore('weather_hourly_archive', forecast.ARCHIVE_COLUMNS), archive)
+
+    # The current issuance
+    hourly = [('Here', (now + timedelta(hours=lead)).date(), now + timedelta(hours=lead))
+              + forecast_values(now + timedelta(hours=lead), lead) for lead in range(HORIZON)]
+    cursor.executemany("INSERT INTO weather_hourly (location, date, datetime, temp, humidity) "
+                       "VALUES (%s, %s, %s, %s, %s)", hourly)
+    connection.commit()
+    cursor.close()
+    return len(rows), len(archive)
+
+def main():
+    np.random.seed(1)
+    forecast.logger.disabled = True
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.db')
+        forecast.configure({'database': {'backend': 'sqlite', 'path': path},
+                            'forecast': {'api_key': 'bench', 'location': 'Here'}})
+        forecast.create_database_tables()
+
+        connection = forecast.get_db_connection()
+        readings, archived = fill(connection, now)
+        print(f"{readings} readings, {archived} archived forecast rows, {HORIZON} hours to correct")
+
+        correction = BiasCorrection()
+        samples = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            correction.update(connection, forecast.STORAGE, 'Here', now)
+            samples.append(time.perf_counter() - start)
+        print(f"update() median {sorted(samples)[RUNS // 2] * 1000:.1f} ms")
+
+        cursor = connection.cursor()
+        cursor.execute("SELECT h.datetime, h.temp, h.humidity, c.temp, c.humidity FROM weather_hourly h "
+                       "JOIN weather_hourly_corrected c ON c.location = h.location AND c.datetime = h.datetime")
+        rows = cursor.fetchall()
+        cursor.close()
+        connection.close()
+
+    truths = np.array([truth(datetime.fromisoformat(str(row[0]))) for row in rows])
+    raw = np.array([row[1:3] for row in rows], dtype=float)
+    corrected = np.array([row[3:5] for row in rows], dtype=float)
+    for column, name in enumerate(('temp', 'humidity')):
+        print(f"{name:9s} MAE raw {np.abs(raw[:, column] - truths[:, column]).mean():5.2f}  "
+              f"corrected {np.abs(corrected[:, column] - truths[:, column]).mean():5.2f}")
+
+if __name__ == "__main__":
+    main()
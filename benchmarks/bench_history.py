@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# Time downsampling a year of one-minute readings to a chart-sized series with
+# each method, and the peak memory used while streaming the rows.
+# Run from the repository root: python benchmarks/bench_history.py
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import weather_services
+from station_history import METHODS, downsample_history
+from bench_storage import synthetic_rows, time_inserts
+
+DAYS = 365
+POINTS = 1000
+
+def main():
+    weather_services.logger.disabled = True
+    end = datetime.now().replace(microsecond=0)
+    start = end - timedelta(days=DAYS)
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = {'database': {'backend': 'sqlite', 'path': os.path.join(directory, 'history.db')}, 'services': {}}
+        app = weather_services.WeatherApp(config)
+        rows = synthetic_rows(DAYS * 1440, end - timedelta(minutes=1))
+        time_inserts(app, rows)
+        del rows
+        print(f"{DAYS} days of one-minute rows in SQLite, downsampled to {POINTS} points")
+
+        for method in METHODS:
+            started = time.perf_counter()
+            result = downsample_history(app.db, 'AIR_TEMP', start, end, points=POINTS, method=method)
+            elapsed = time.perf_counter() - started
+
+            # A second, traced run for memory (tracing slows it down too much to time)
+            tracemalloc.start()
+            downsample_history(app.db, 'AIR_TEMP', start, end, points=POINTS, method=method)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{method:8s} {result['rows']:8d} rows -> {len(result['offsets']):5d} points "
+                  f"{elapsed * 1000:8.0f} ms  peak {peak / 1e6:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# Compare creation time, attribute access and memory of Snapshot vs the previous per-call dict.
+# Run from the repository root: python benchmarks/bench_snapshot.py
+import os
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from snapshot import Snapshot, MEASUREMENT_FIELDS
+
+COUNT = 100000
+VALUES = {field: float(index) for index, field in enumerate(MEASUREMENT_FIELDS)}
+NOW = datetime.now()
+
+def make_dict():
+    data = dict(VALUES)
+    data['source_id'] = 1
+    data['source_time'] = NOW
+    data['timestamp'] = NOW
+    return data
+
+ROW = list(VALUES.values())
+
+def make_snapshot():
+    return Snapshot(source_id=1, source_time=NOW, timestamp=NOW, **VALUES)
+
+def make_snapshot_positional():
+    # The way get_weather_data() builds it from the query row
+    return Snapshot._make(ROW + [1, NOW, NOW])
+
+def memory_per_instance(factory):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [factory() for _ in range(COUNT)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del instances
+    return (after - before) / COUNT
+
+def main():
+    data = make_dict()
+    snap = make_snapshot()
+
+    results = [
+        ("dict create", timeit.timeit(make_dict, number=COUNT)),
+        ("Snapshot create", timeit.timeit(make_snapshot, number=COUNT)),
+        ("Snapshot _make", timeit.timeit(make_snapshot_positional, number=COUNT)),
+        ("dict read x10", timeit.timeit(lambda: [data['temperature'] for _ in range(10)], number=COUNT)),
+        ("Snapshot read x10", timeit.timeit(lambda: [snap.temperature for _ in range(10)], number=COUNT)),
+    ]
+
+    for name, seconds in results:
+        print(f"{name:20s} {seconds / COUNT * 1e9:8.0f} ns/op")
+
+    print(f"{'dict memory':20s} {memory_per_instance(make_dict):8.0f} bytes")
+    print(f"{'Snapshot memory':20s} {memory_per_instance(make_snapshot_positional):8.0f} bytes")
+
+if __name__ == "__main__":
+    main()
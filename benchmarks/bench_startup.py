@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+# Compare the cost of importing weather_services (lazy) with importing its heavy
+# dependencies eagerly, and time building the application from the config.
+# Run from the repository root: python benchmarks/bench_startup.py
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+RUNS = 10
+
+# Each statement runs in a fresh interpreter so nothing is cached between runs
+STATEMENTS = [
+    ("python only", "pass"),
+    ("import weather_services", "import weather_services"),
+    ("eager dependencies", "import requests, yaml, mysql.connector, numpy"),
+]
+
+def time_import(statement):
+    """Median wall time in seconds of a fresh interpreter running statement"""
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=ROOT, check=True)
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2]
+
+def time_get_app():
+    """Seconds to load the template config and build the application"""
+    import weather_services
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, 'weather_services_config.yaml')
+        shutil.copy(os.path.join(ROOT, 'weather_services_config_template.yaml'), config_path)
+        start = time.perf_counter()
+        weather_services.get_app(config_path)
+        return time.perf_counter() - start
+
+def main():
+    for name, statement in STATEMENTS:
+        print(f"{name:25s} {time_import(statement) * 1000:8.1f} ms")
+    print(f"{'get_app() (first call)':25s} {time_get_app() * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+# Time the snapshot, rain and QC queries and batched inserts on a storage backend.
+# By default a temporary SQLite database is filled with synthetic readings; with
+# --config the configured database (MySQL or SQLite) is queried read-only.
+# Run from the repository root: python benchmarks/bench_storage.py [--config weather_services_config.yaml]
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import weather_services
+from sensor_ingest import READING_COLUMNS
+
+RUNS = 50
+ROWS = 50000  # synthetic readings, one per minute up to now
+BATCH_SIZE = 500
+
+def synthetic_rows(count, end):
+    """Plausible readings, one per minute ending at end"""
+    rows = []
+    for index in range(count):
+        phase = index / 1440 * 2 * math.pi
+        reading = {
+            'HUMIDITY': 70 + 20 * math.sin(phase),
+            'AIR_TEMP': 12 + 8 * math.sin(phase),
+            'FEELS_LIKE': 11 + 8 * math.sin(phase),
+            'DEW_POINT': 6 + 2 * math.sin(phase),
+            'PRESSURE_SEA': 1013 + 5 * math.sin(phase / 7),
+            'RAINFALL': 0.2 if index % 97 == 0 else 0.0,
+            'WIND_SPEED': 10 + 5 * math.sin(index / 13),
+            'WIND_GUST': 15 + 8 * math.sin(index / 11),
+            'WIND_DIRECTION': (index * 7) % 360,
+            'WIND_CARDINAL': 'N',
+            'UV_INDEX': max(0.0, 5 * math.sin(phase)),
+            'TEMP_CASE': 20.0
+        }
+        created = end - timedelta(minutes=count - 1 - index)
+        rows.append((created.replace(microsecond=0),) + tuple(reading[column] for column in READING_COLUMNS))
+    return rows
+
+def time_inserts(app, rows):
+    """Seconds per row for batched inserts the way sensor_ingest writes them"""
+    columns = ['CREATED'] + READING_COLUMNS
+    query = f"INSERT INTO dataentry ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    connection = app.db.connect()
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    for offset in range(0, len(rows), BATCH_SIZE):
+        cursor.executemany(query, rows[offset:offset + BATCH_SIZE])
+        connection.commit()
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    connection.close()
+    return elapsed / len(rows)
+
+def time_query(cursor, query, params=()):
+    """Median seconds to run query and fetch its rows"""
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2]
+
+def time_snapshot():
+    """Median seconds for a whole get_weather_data() call"""
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        weather_services.get_weather_data()
+        samples.append(time.perf_counter() - start)
+    return sorted(samples)[len(samples) // 2]
+
+def run(app, results):
+    weather_services.app = app
+    connection = app.db.connect()
+    cursor = connection.cursor(buffered=True)
+
+    results.append(("snapshot query", time_query(cursor, app.snapshot_query)))
+    if app.qc_gate is not None:
+        results.append(("QC query", time_query(cursor, app.qc_query)))
+
+    # The first refresh seeds today's rain, later ones only read new rows
+    start = time.perf_counter()
+    app.rain_tracker.refresh(cursor)
+    results.append(("rain seed", time.perf_counter() - start))
+    results.append(("rain refresh", time_query(cursor, app.rain_tracker.NEW_QUERY, (app.rain_tracker.last_id,))))
+    cursor.close()
+    connection.close()
+
+    results.append(("get_weather_data()", time_snapshot()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the station database queries")
+    parser.add_argument('--config', help="Query the database configured in this file (read-only)")
+    parser.add_argument('--rows', type=int, default=ROWS, help="Synthetic readings for the temporary database")
+    args = parser.parse_args()
+
+    weather_services.logger.disabled = True
+    results = []
+
+    if args.config:
+        config = weather_services.load_config(args.config)
+        app = weather_services.WeatherApp(config, config_path=args.config)
+        print(f"Backend: {app.storage.name} (configured)")
+        run(app, results)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            config = {'database': {'backend': 'sqlite', 'path': os.path.join(directory, 'bench.db')}, 'services': {}}
+            app = weather_services.WeatherApp(config)
+            print(f"Backend: {app.storage.name} ({args.rows} synthetic rows)")
+            results.append(("batched insert/row", time_inserts(app, synthetic_rows(args.rows, datetime.now()))))
+            run(app, results)
+
+    for name, seconds in results:
+        print(f"{name:22s} {seconds * 1000:10.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+import os
+import signal
+import threading
+import logging
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'reload' config section
+DEFAULT_WATCH_INTERVAL = 5  # seconds between config file checks
+
+# Per-service changes found by diff_services()
+STARTED = 'started'  # enabled, needs a schedule
+STOPPED = 'stopped'  # disabled, its schedule should end
+RETUNED = 'retuned'  # still enabled with a new interval
+UPDATED = 'updated'  # other settings (credentials, http) that apply on the next upload
+
+# Config sections only read at startup; changes to them are logged but need a restart
+RESTART_SECTIONS = ('database', 'health', 'station', 'qc', 'trigger', 'ingest', 'supervisor', 'forecast', 'reload', 'api', 'climate', 'trace')
+
+def diff_services(old_services, new_services):
+    """Return {service_name: change} for every service whose config differs"""
+    changes = {}
+    for name in set(old_services) | set(new_services):
+        old = old_services.get(name) or {}
+        new = new_services.get(name) or {}
+        if old == new:
+            continue
+
+        was_enabled, enabled = old.get('enabled', False), new.get('enabled', False)
+        if enabled and not was_enabled:
+            changes[name] = STARTED
+        elif was_enabled and not enabled:
+            changes[name] = STOPPED
+        elif enabled and int(old.get('interval', 300)) != int(new.get('interval', 300)):
+            changes[name] = RETUNED
+        else:
+            changes[name] = UPDATED
+    return changes
+
+def restart_sections(old_config, new_config):
+    """Return the startup-only sections that differ between two configs"""
+    return [section for section in RESTART_SECTIONS if old_config.get(section) != new_config.get(section)]
+
+# Reloads the config on SIGHUP or when the file changes on disk.
+# The signal handler only sets an event; the reload itself runs on the watcher
+# thread so it never interrupts code holding locks in the main thread.
+class ConfigWatcher:
+    def __init__(self, path, reload, watch=True, watch_interval=DEFAULT_WATCH_INTERVAL):
+        self.path = path
+        self.reload = reload  # Callable run after every change
+        self.watch = watch
+        self.watch_interval = watch_interval
+        self.requested = threading.Event()
+        self.last_stat = self._stat()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def request_reload(self, signum=None, frame=None):
+        self.requested.set()
+
+    def run(self):
+        while True:
+            requested = self.requested.wait(self.watch_interval if self.watch else None)
+            self.requested.clear()
+
+            stat = self._stat()
+            if not requested and (stat is None or stat == self.last_stat):
+                continue
+            self.last_stat = stat
+
+            logger.info(f"Reloading configuration from {self.path} ({'SIGHUP' if requested else 'file changed'})")
+            try:
+                self.reload()
+                metrics.incr('config.reloads')
+            except Exception as e:
+                logger.error(f"Error reloading configuration: {str(e)}")
+                metrics.incr('config.reload_errors')
+
+def start_config_watcher(reload_config, path, reload):
+    """Start reloading the config on SIGHUP and, optionally, on file changes.
+
+    Args:
+        reload_config (dict): The 'reload' config section
+        path (str): Config file to watch
+        reload: Callable applying the new config
+
+    Returns:
+        ConfigWatcher, or None when reloading is disabled
+    """
+    reload_config = reload_config or {}
+    if not reload_config.get('enabled', True):
+        return None
+
+    watcher = ConfigWatcher(
+        path,
+        reload,
+        watch=bool(reload_config.get('watch', True)),
+        watch_interval=float(reload_config.get('watch_interval', DEFAULT_WATCH_INTERVAL))
+    )
+
+    # Signal handlers can only be installed from the main thread, and not on Windows
+    if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGHUP, watcher.request_reload)
+
+    thread = threading.Thread(target=watcher.run, name="config_watch_thread", daemon=True)
+    thread.start()
+    logger.info(f"Config reload enabled (SIGHUP{', file watch' if watcher.watch else ''})")
+    return watcher
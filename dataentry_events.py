@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+import os
+import socket
+import threading
+import time
+import logging
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'trigger' config section
+DEFAULT_MODE = 'socket'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 5599
+DEFAULT_POLL_INTERVAL = 2  # seconds between notification table checks
+DEFAULT_FALLBACK_INTERVAL = 600  # upload anyway if no event arrives for this long
+
+# Wakes upload loops when new dataentry rows land
+class NewDataNotifier:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.sequence = 0
+        self.listeners = []
+
+    def notify(self):
+        """Signal that at least one new row is available"""
+        with self.condition:
+            self.sequence += 1
+            self.condition.notify_all()
+            listeners = list(self.listeners)
+        metrics.incr('events.new_data')
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, callback):
+        """Call callback (from the watcher thread) on every notification"""
+        with self.condition:
+            self.listeners.append(callback)
+
+    def wake(self):
+        """Wake waiting upload loops without a new row (e.g. after a config reload)"""
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait_for_new(self, last_seen, timeout, interrupt=None):
+        """Block until the sequence moves past last_seen, interrupt is set or timeout expires.
+
+        Returns the current sequence number; it equals last_seen on timeout or interrupt.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.sequence != last_seen or (interrupt is not None and interrupt.is_set()), timeout)
+            return self.sequence
+
+# Listens on a local socket that the station logger writes to after each insert
+class SocketWatcher:
+    def __init__(self, notifier, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        self.notifier = notifier
+        self.host = host
+        self.port = port
+        self.path = path  # Unix datagram socket path, used instead of UDP when set
+        self.sock = None
+
+    def open(self):
+        if self.path:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.bind(self.path)
+            logger.info(f"Listening for new data events on {self.path}")
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind((self.host, self.port))
+            logger.info(f"Listening for new data events on udp://{self.host}:{self.port}")
+
+    def run(self):
+        """Block on the socket; every datagram is one new-data event"""
+        try:
+            self.open()
+        except OSError as e:
+            logger.error(f"Could not open new data socket: {str(e)}")
+            return
+
+        while True:
+            try:
+                self.sock.recv(1024)
+                self.notifier.notify()
+            except OSError as e:
+                logger.error(f"New data socket error: {str(e)}")
+                time.sleep(5)
+
+# Watches the single-row dataentry_notify table maintained by an insert trigger
+class NotifyTableWatcher:
+    def __init__(self, notifier, db, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.notifier = notifier
+        self.db = db
+        self.poll_interval = poll_interval
+        self.last_id = None
+
+    def run(self):
+        """Check the notification row's last_id, a primary-key lookup, and notify on change"""
+        logger.info(f"Watching dataentry_notify every {self.poll_interval} seconds")
+        connection = None
+        while True:
+            try:
+                if connection is None or not connection.is_connected():
+                    connection = self.db.connect()
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SELECT last_id FROM dataentry_notify WHERE id = 1;")
+                    result = cursor.fetchone()
+                finally:
+                    cursor.close()
+
+                last_id = result[0] if result else None
+                if last_id is not None and last_id != self.last_id:
+                    # The first read only establishes the baseline
+                    if self.last_id is not None:
+                        self.notifier.notify()
+                    self.last_id = last_id
+            except Exception as e:
+                logger.error(f"Error watching dataentry_notify: {str(e)}")
+                connection = None
+            time.sleep(self.poll_interval)
+
+def start_trigger(trigger_config, db_factory):
+    """Start the configured event source and return its notifier.
+
+    Args:
+        trigger_config (dict): The 'trigger' config section
+        db_factory: Callable returning a Database (only used in 'table' mode)
+
+    Returns:
+        NewDataNotifier, or None when event-driven uploads are disabled
+    """
+    if not trigger_config or not trigger_config.get('enabled', False):
+        return None
+
+    notifier = NewDataNotifier()
+    mode = trigger_config.get('mode', DEFAULT_MODE)
+
+    if mode == 'socket':
+        watcher = SocketWatcher(
+            notifier,
+            host=trigger_config.get('host', DEFAULT_HOST),
+            port=int(trigger_config.get('port', DEFAULT_PORT)),
+            path=trigger_config.get('path')
+        )
+    elif mode == 'table':
+        watcher = NotifyTableWatcher(
+            notifier,
+            db_factory(),
+            poll_interval=float(trigger_config.get('poll_interval', DEFAULT_POLL_INTERVAL))
+        )
+    else:
+        logger.error(f"Unknown trigger mode '{mode}', falling back to interval polling")
+        return None
+
+    thread = threading.Thread(target=watcher.run, name="trigger_thread", daemon=True)
+    thread.start()
+    logger.info(f"Event-driven uploads enabled ({mode} trigger)")
+    return notifier
+
+def fallback_interval(trigger_config):
+    """Longest time a service waits for an event before uploading anyway"""
+    return int((trigger_config or {}).get('fallback_interval', DEFAULT_FALLBACK_INTERVAL))
@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# Values derived from the measured snapshot fields, computed once per snapshot
+# and shared by every upload service's encoder.
+
+# Snapshot fields filled in by derived_values()
+DERIVED_FIELDS = ('heat_index', 'wind_chill')
+
+def heat_index(temperature, humidity):
+    """Heat index in °C (NWS Rothfusz regression); the air temperature below ~27 °C"""
+    t = temperature * 9 / 5 + 32
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + humidity * 0.094)
+    if (simple + t) / 2 < 80:
+        return temperature
+
+    result = (-42.379 + 2.04901523 * t + 10.14333127 * humidity
+              - 0.22475541 * t * humidity - 0.00683783 * t * t
+              - 0.05481717 * humidity * humidity + 0.00122874 * t * t * humidity
+              + 0.00085282 * t * humidity * humidity - 0.00000199 * t * t * humidity * humidity)
+
+    # NWS adjustments for very dry and very humid conditions
+    if humidity < 13 and 80 <= t <= 112:
+        result -= ((13 - humidity) / 4) * ((17 - abs(t - 95)) / 17) ** 0.5
+    elif humidity > 85 and 80 <= t <= 87:
+        result += ((humidity - 85) / 10) * ((87 - t) / 5)
+
+    return round((result - 32) * 5 / 9, 1)
+
+def wind_chill(temperature, wind_speed):
+    """Wind chill in °C (JAG/TI formula, wind in km/h); the air temperature outside its range"""
+    if temperature > 10 or wind_speed <= 4.8:
+        return temperature
+    factor = wind_speed ** 0.16
+    return round(13.12 + 0.6215 * temperature - 11.37 * factor + 0.3965 * temperature * factor, 1)
+
+def derived_values(temperature, humidity, wind_speed):
+    """Return the DERIVED_FIELDS values in order"""
+    return heat_index(temperature, humidity), wind_chill(temperature, wind_speed)
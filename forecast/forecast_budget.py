@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+import threading
+import logging
+from datetime import datetime, time, timezone
+
+from station_metrics import metrics
+
+logger = logging.getLogger("weather_updater")
+
+# Defaults for the optional 'forecast.budget' section
+DEFAULT_BURST = 0.2  # Share of the daily budget that may be spent ahead of an even pace
+DEFAULT_MIN_DAYS = 1  # Shortest horizon (days after today) fetched when credits run short
+
+# Visual Crossing bills one record per hour of hourly data (or per day without
+# hours); a current-conditions-only request is a single record
+HOURS_PER_DAY = 24
+CURRENT_COST = 1
+
+def estimate_cost(days, hours=True):
+    """Records billed for a timeline request covering days days"""
+    return days * (HOURS_PER_DAY if hours else 1)
+
+# Daily Visual Crossing credit budget. Credits may be spent at an even pace
+# through the UTC day (when the quota resets) plus a burst allowance, so a
+# fetch that does not fit now is deferred until enough of the day has passed.
+class CreditBudget:
+    def __init__(self, daily_credits, burst=DEFAULT_BURST, min_days=DEFAULT_MIN_DAYS):
+        self.daily_credits = daily_credits
+        self.burst = burst
+        self.min_days = min_days
+        self.lock = threading.Lock()
+        self.day = None  # UTC date the spent credits belong to
+        self.spent = 0
+
+    def _roll(self, now):
+        if now.date() != self.day:
+            self.day = now.date()
+            self.spent = 0
+
+    def allowance(self, now):
+        """Credits that may have been spent by now"""
+        elapsed = (now - datetime.combine(now.date(), time.min, tzinfo=timezone.utc)).total_seconds() / 86400
+        return min(self.daily_credits, self.daily_credits * (elapsed + self.burst))
+
+    def available(self, now=None):
+        """Credits that can be spent right now"""
+        now = now or datetime.now(timezone.utc)
+        with self.lock:
+            self._roll(now)
+            return self.allowance(now) - self.spent
+
+    def allow(self, cost, now=None):
+        """Return True if a request costing cost credits fits the budget now"""
+        if cost <= self.available(now):
+            return True
+        metrics.incr('forecast.credits.deferred')
+        return False
+
+    def plan_days(self, days, hours=True, now=None):
+        """Longest horizon up to days whose request fits, dropping the far days first.
+
+        Returns the number of days after today to fetch, or None if not even
+        min_days (or days, when fewer are wanted) fits yet.
+        """
+        available = self.available(now)
+        for horizon in range(days, min(self.min_days, days) - 1, -1):
+            if estimate_cost(horizon + 1, hours) <= available:  # today plus horizon days
+                if horizon < days:
+                    logger.info(f"Credit budget allows {horizon} of {days} forecast days ({available:.0f} available)")
+                    metrics.incr('forecast.credits.trimmed')
+                metrics.set_gauge('forecast.horizon_days', horizon)
+                return horizon
+
+        logger.info(f"Credit budget exhausted for now ({available:.0f} available), deferring forecast fetch")
+        metrics.incr('forecast.credits.deferred')
+        return None
+
+    def record(self, cost, now=None):
+        """Add the credits a completed request used"""
+        now = now or datetime.now(timezone.utc)
+        with self.lock:
+            self._roll(now)
+            self.spent += cost
+            spent = self.spent
+        metrics.incr('forecast.credits.used', cost)
+        self._publish(spent)
+
+    def restore(self, day, spent):
+        """Resume from the credits already recorded for a UTC day (e.g. after a restart)"""
+        with self.lock:
+            if day == datetime.now(timezone.utc).date():
+                self.day = day
+                self.spent = spent
+        self._publish(self.spent)
+
+    def _publish(self, spent):
+        metrics.set_gauge('forecast.credits.spent', spent)
+        metrics.set_gauge('forecast.credits.remaining', max(0, self.daily_credits - spent))
+
+def create_credit_budget(budget_config):
+    """Create the credit budget from the 'forecast.budget' section (None when not configured)"""
+    if not budget_config or budget_config.get('daily_credits') is None:
+        return None
+    return CreditBudget(
+        int(budget_config['daily_credits']),
+        burst=float(budget_config.get('burst', DEFAULT_BURST)),
+        min_days=int(budget_config.get('min_days', DEFAULT_MIN_DAYS))
+    )
@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""Bias correction of the hourly forecast against local station observations.
+
+Pairs archived forecasts (weather_hourly_archive) with hourly aggregates of the
+station's dataentry table and fits, for each lead-time block and hour of day, a
+recency-weighted linear regression of observed on forecast values. After each
+full forecast update the upcoming hours of weather_hourly are corrected with
+these fits and written to weather_hourly_corrected. The fitting and correction
+are vectorized with NumPy, so a month of pairs is processed in milliseconds.
+"""
+import time
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from station_metrics import metrics
+
+logger = logging.getLogger("weather_updater")
+
+# Defaults for the optional 'forecast.correction' section
+DEFAULT_TRAINING_DAYS = 30  # Days of archived forecasts and observations fitted
+DEFAULT_HALF_LIFE = 7  # Days after which a pair counts half as much as a new one
+DEFAULT_MIN_PAIRS = 20  # Pairs a fit needs before it is used
+
+LEAD_BLOCK = 6  # Hours of lead time sharing one fit
+MAX_SLOPE_DEVIATION = 0.5  # Regression slopes are kept within 1 +/- this
+
+# Corrected forecast column -> (dataentry aggregate it is fitted to, (lower, upper) bounds)
+CORRECTED_FIELDS = {
+    'temp': ('AVG(AIR_TEMP)', (-np.inf, np.inf)),
+    'humidity': ('AVG(HUMIDITY)', (0, 100)),
+    'dew': ('AVG(DEW_POINT)', (-np.inf, np.inf)),
+    'pressure': ('AVG(PRESSURE_SEA)', (-np.inf, np.inf)),
+    'windspeed': ('AVG(WIND_SPEED)', (0, np.inf)),
+    'windgust': ('MAX(WIND_GUST)', (0, np.inf)),
+}
+
+def fetch_array(cursor, query, params, width):
+    """Run query and return its rows as a float array of width columns (NULL -> NaN)"""
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    if not rows:
+        return np.empty((0, width))
+    return np.array(rows, dtype=float)
+
+def weighted_fit(index, x, y, weights, size):
+    """Weighted least squares y = intercept + slope * x for each index value.
+
+    Returns (intercept, slope, pairs) arrays of length size. Groups without
+    spread in x get a slope of 1, so their fit is a plain bias.
+    """
+    pairs = np.bincount(index, minlength=size)
+    total = np.bincount(index, weights, size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.bincount(index, weights * x, size) / total
+        mean_y = np.bincount(index, weights * y, size) / total
+        variance = np.bincount(index, weights * x * x, size) / total - mean_x * mean_x
+        covariance = np.bincount(index, weights * x * y, size) / total - mean_x * mean_y
+        slope = np.where(variance > 1e-6, covariance / variance, 1.0)
+    slope = np.clip(np.nan_to_num(slope, nan=1.0), 1 - MAX_SLOPE_DEVIATION, 1 + MAX_SLOPE_DEVIATION)
+    return mean_y - slope * mean_x, slope, pairs
+
+# Fits recent forecast errors and writes the corrected hourly forecast
+class BiasCorrection:
+    def __init__(self, training_days=DEFAULT_TRAINING_DAYS, half_life=DEFAULT_HALF_LIFE, min_pairs=DEFAULT_MIN_PAIRS):
+        self.training_days = training_days
+        self.half_life = half_life
+        self.min_pairs = min_pairs
+
+    def load_pairs(self, cursor, storage, location, issued_at):
+        """Matched (hour_keys, lead_hours, forecast, observed) arrays from the training window"""
+        start = issued_at - timedelta(days=self.training_days)
+
+        # Observations are bucketed to the nearest hour, centred on the forecast valid time
+        aggregates = ', '.join(aggregate for aggregate, _ in CORRECTED_FIELDS.values())
+        observations = fetch_array(cursor, f'''
+            SELECT {storage.hour_bucket('CREATED', 1800)} AS hour_key, {aggregates}
+            FROM dataentry
+            WHERE CREATED >= %s AND CREATED < %s
+            GROUP BY hour_key
+            ORDER BY hour_key
+        ''', (start, issued_at), len(CORRECTED_FIELDS) + 1)
+        forecasts = fetch_array(cursor, f'''
+            SELECT {storage.hour_bucket('valid_at')}, lead_hours, {', '.join(CORRECTED_FIELDS)}
+            FROM weather_hourly_archive
+            WHERE location = %s AND valid_at >= %s AND valid_at < %s
+        ''', (location, start, issued_at), len(CORRECTED_FIELDS) + 2)
+
+        # Keep the forecast rows with an observed hour (observation keys are sorted)
+        obs_keys = observations[:, 0].astype(np.int64)
+        fc_keys = forecasts[:, 0].astype(np.int64)
+        idx = np.minimum(np.searchsorted(obs_keys, fc_keys), max(len(obs_keys) - 1, 0))
+        matched = (obs_keys[idx] == fc_keys) if len(obs_keys) else np.zeros(len(fc_keys), dtype=bool)
+        return (fc_keys[matched], forecasts[matched, 1].astype(np.int64),
+                forecasts[matched, 2:], observations[idx[matched], 1:])
+
+    def load_targets(self, cursor, storage, location, issued_at):
+        """Upcoming weather_hourly rows: (datetimes, hour_keys, lead_hours, values)"""
+        cursor.execute(f'''
+            SELECT datetime, {storage.hour_bucket('datetime')}, {storage.hour_bucket('%s', 1800)},
+                   {', '.join(CORRECTED_FIELDS)}
+            FROM weather_hourly
+            WHERE location = %s AND datetime >= %s
+            ORDER BY datetime
+        ''', (issued_at, location, issued_at.replace(minute=0, second=0, microsecond=0)))
+        rows = cursor.fetchall()
+        if not rows:
+            return [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, len(CORRECTED_FIELDS)))
+        table = np.array([row[1:] for row in rows], dtype=float)
+        hour_keys = table[:, 0].astype(np.int64)
+        leads = np.maximum(hour_keys - table[:, 1].astype(np.int64), 0)
+        return [row[0] for row in rows], hour_keys, leads, table[:, 2:]
+
+    def correct(self, pairs, hour_keys, leads, values, now_key):
+        """Apply the fits learned from pairs to forecast values (NaN where the forecast is missing)"""
+        train_keys, train_leads, train_forecast, train_observed = pairs
+        blocks = int(max(train_leads.max(initial=0), leads.max(initial=0))) // LEAD_BLOCK + 1
+
+        # Cells are (lead block, hour of day); each falls back to its lead block's fit, then to no change
+        train_block = train_leads // LEAD_BLOCK
+        train_cell = train_block * 24 + train_keys % 24
+        weights = 0.5 ** ((now_key - train_keys) / (self.half_life * 24))
+        block = leads // LEAD_BLOCK
+        cell = block * 24 + hour_keys % 24
+
+        corrected = values.copy()
+        for column, (_, (lower, upper)) in enumerate(CORRECTED_FIELDS.values()):
+            x, y = train_forecast[:, column], train_observed[:, column]
+            valid = ~(np.isnan(x) | np.isnan(y))
+            cell_fit = weighted_fit(train_cell[valid], x[valid], y[valid], weights[valid], blocks * 24)
+            block_fit = weighted_fit(train_block[valid], x[valid], y[valid], weights[valid], blocks)
+
+            use_cell = cell_fit[2][cell] >= self.min_pairs
+            use_block = ~use_cell & (block_fit[2][block] >= self.min_pairs)
+            intercept = np.where(use_cell, cell_fit[0][cell], np.where(use_block, block_fit[0][block], 0.0))
+            slope = np.where(use_cell, cell_fit[1][cell], np.where(use_block, block_fit[1][block], 1.0))
+            corrected[:, column] = np.clip(intercept + slope * values[:, column], lower, upper)
+        return corrected
+
+    def update(self, connection, storage, location, issued_at=None):
+        """Refit against recent pairs and rewrite weather_hourly_corrected for location"""
+        issued_at = issued_at or datetime.now()
+        started = time.perf_counter()
+        cursor = connection.cursor()
+
+        try:
+            pairs = self.load_pairs(cursor, storage, location, issued_at)
+            datetimes, hour_keys, leads, values = self.load_targets(cursor, storage, location, issued_at)
+            if len(hour_keys):
+                corrected = self.correct(pairs, hour_keys, leads, values, int(hour_keys[0] - leads[0]))
+            else:
+                corrected = values
+
+            # Replace the location's rows, so hours no longer forecast do not linger
+            columns = ['location', 'datetime', 'lead_hours'] + list(CORRECTED_FIELDS)
+            rows = [
+                (location, moment, int(lead)) + tuple(None if np.isnan(value) else round(float(value), 2) for value in row)
+                for moment, lead, row in zip(datetimes, leads, corrected)
+            ]
+            cursor.execute("DELETE FROM weather_hourly_corrected WHERE location = %s", (location,))
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO weather_hourly_corrected ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))})", rows)
+            connection.commit()
+
+            elapsed = time.perf_counter() - started
+            metrics.observe('forecast.correction', elapsed)
+            metrics.incr('forecast.corrected_rows', len(rows))
+            logger.info(f"Corrected {len(rows)} hourly forecast rows for {location} "
+                        f"from {len(pairs[0])} forecast/observation pairs in {elapsed * 1000:.0f} ms")
+        except Exception as e:
+            logger.error(f"Error correcting hourly forecast: {e}")
+            connection.rollback()
+        finally:
+            cursor.close()
+
+def create_bias_correction(correction_config):
+    """Create the bias correction from the 'forecast.correction' section (None when not enabled)"""
+    if not correction_config or not correction_config.get('enabled', False):
+        return None
+    return BiasCorrection(
+        training_days=int(correction_config.get('training_days', DEFAULT_TRAINING_DAYS)),
+        half_life=float(correction_config.get('half_life', DEFAULT_HALF_LIFE)),
+        min_pairs=int(correction_config.get('min_pairs', DEFAULT_MIN_PAIRS))
+    )
@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+"""Forecast verification against local station observations.
+
+Joins the append-only weather_hourly_archive (one row per forecast issuance
+and valid hour) against hourly aggregates of the station's dataentry table
+and computes bias, MAE and RMSE for each lead time. All of the per-row work
+is done with NumPy so a year of archived hourly forecasts verifies in seconds.
+"""
+import argparse
+import csv
+import logging
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import visualcrossing_forecast as forecast
+from visualcrossing_forecast import logger
+
+# Forecast archive column -> dataentry aggregate it is verified against
+VERIFIED_FIELDS = {
+    'temp': 'AVG(AIR_TEMP)',
+    'humidity': 'AVG(HUMIDITY)',
+    'dew': 'AVG(DEW_POINT)',
+    'pressure': 'AVG(PRESSURE_SEA)',
+    'windspeed': 'AVG(WIND_SPEED)',
+    'windgust': 'MAX(WIND_GUST)',
+    'precip': 'SUM(RAINFALL)'
+}
+
+def load_observations(connection, start, end):
+    """Load hourly observation aggregates from dataentry.
+
+    Rows are bucketed to the nearest hour so each bucket is centred on the
+    forecast valid time. Returns (hour_keys, values) where hour_keys is a
+    sorted int64 array of hours since the epoch and values is a float array
+    with one column per entry in VERIFIED_FIELDS.
+    """
+    cursor = connection.cursor()
+
+    try:
+        aggregates = ', '.join(VERIFIED_FIELDS.values())
+        cursor.execute(f'''
+            SELECT {forecast.STORAGE.hour_bucket('CREATED', 1800)} AS hour_key, {aggregates}
+            FROM dataentry
+            WHERE CREATED >= %s AND CREATED < %s
+            GROUP BY hour_key
+            ORDER BY hour_key
+        ''', (start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(VERIFIED_FIELDS)))
+
+    table = np.array(rows, dtype=float)
+    return table[:, 0].astype(np.int64), table[:, 1:]
+
+def load_forecasts(connection, location, start, end):
+    """Load archived forecasts valid in [start, end).
+
+    Returns (hour_keys, lead_hours, values) with values columns ordered as
+    VERIFIED_FIELDS. Missing forecast values become NaN.
+    """
+    cursor = connection.cursor()
+
+    try:
+        columns = ', '.join(VERIFIED_FIELDS.keys())
+        cursor.execute(f'''
+            SELECT {forecast.STORAGE.hour_bucket('valid_at')}, lead_hours, {columns}
+            FROM weather_hourly_archive
+            WHERE location = %s AND valid_at >= %s AND valid_at < %s
+        ''', (location, start, end))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty((0, len(VERIFIED_FIELDS)))
+
+    table = np.array(rows, dtype=float)
+    return table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2:]
+
+def compute_scores(obs_keys, obs_values, fc_keys, fc_leads, fc_values):
+    """Compute per-lead-time verification scores.
+
+    Returns a dict mapping each verified field to a dict of arrays indexed by
+    lead hour: 'count', 'bias', 'mae' and 'rmse'. Leads without any matched
+    pair have a count of 0 and NaN scores.
+    """
+    scores = {}
+    if len(fc_keys) == 0 or len(obs_keys) == 0:
+        return scores
+
+    # Match each forecast row to its observation bucket (obs_keys is sorted)
+    idx = np.searchsorted(obs_keys, fc_keys)
+    idx_clipped = np.minimum(idx, len(obs_keys) - 1)
+    matched = (idx < len(obs_keys)) & (obs_keys[idx_clipped] == fc_keys)
+
+    n_leads = int(fc_leads.max()) + 1
+
+    for col, field in enumerate(VERIFIED_FIELDS):
+        error = fc_values[:, col] - obs_values[idx_clipped, col]
+        valid = matched & ~np.isnan(error)
+        leads = fc_leads[valid]
+        error = error[valid]
+
+        count = np.bincount(leads, minlength=n_leads)
+        error_sum = np.bincount(leads, weights=error, minlength=n_leads)
+        abs_sum = np.bincount(leads, weights=np.abs(error), minlength=n_leads)
+        sq_sum = np.bincount(leads, weights=error * error, minlength=n_leads)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores[field] = {
+                'count': count,
+                'bias': error_sum / count,
+                'mae': abs_sum / count,
+                'rmse': np.sqrt(sq_sum / count)
+            }
+
+    return scores
+
+def verify_forecasts(connection, location, start, end):
+    """Verify archived forecasts for a location over [start, end)."""
+    obs_keys, obs_values = load_observations(connection, start, end)
+    fc_keys, fc_leads, fc_values = load_forecasts(connection, location, start, end)
+    logger.info(f"Verifying {len(fc_keys)} forecast rows against {len(obs_keys)} observed hours for {location}")
+    return compute_scores(obs_keys, obs_values, fc_keys, fc_leads, fc_values)
+
+def write_scores_csv(scores, path):
+    """Write verification scores as one row per (field, lead hour)."""
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['field', 'lead_hours', 'count', 'bias', 'mae', 'rmse'])
+        for field, result in scores.items():
+            for lead in np.nonzero(result['count'])[0]:
+                writer.writerow([field, int(lead), int(result['count'][lead]),
+                                 round(float(result['bias'][lead]), 3),
+                                 round(float(result['mae'][lead]), 3),
+                                 round(float(result['rmse'][lead]), 3)])
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Verify archived forecasts against station observations")
+    parser.add_argument('--config', help="Path to weather_services_config.yaml")
+    parser.add_argument('--location', help="Archived forecast location to verify (defaults to the configured location)")
+    parser.add_argument('--days', type=int, default=30, help="Number of past days to verify")
+    parser.add_argument('--csv', help="Write per-lead scores to this CSV file")
+    args = parser.parse_args()
+
+    config = forecast.load_config(args.config)
+    if not forecast.validate_config(config):
+        sys.exit(1)
+    forecast.configure(config)
+
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+
+    connection = forecast.get_db_connection()
+    try:
+        scores = verify_forecasts(connection, args.location or forecast.LOCATION, start, end)
+    finally:
+        connection.close()
+
+    if not scores:
+        logger.warning("No matching forecast/observation pairs found")
+        sys.exit(1)
+
+    if args.csv:
+        write_scores_csv(scores, args.csv)
+        logger.info(f"Wrote verification scores to {args.csv}")
+
+    # Summarise day-one skill for each field
+    for field, result in scores.items():
+        day_one = result['count'][:25] > 0
+        if day_one.any():
+            logger.info(f"{field}: 0-24h bias {np.nanmean(result['bias'][:25][day_one]):.2f}, "
+                        f"MAE {np.nanmean(result['mae'][:25][day_one]):.2f}, "
+                        f"RMSE {np.nanmean(result['rmse'][:25][day_one]):.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,74 @@
 #!/usr/bin/python3
 import requests
-import mysql.connector
 import time
 import schedule
-from datetime import datetime, timedelta
+import yaml
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
 import threading
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("weather_updater.log"),
-        logging.StreamHandler()
-    ]
-)
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from station_metrics import metrics
+from storage import create_storage, missing_fields
+from forecast_budget import CURRENT_COST, create_credit_budget, estimate_cost
+
 logger = logging.getLogger("weather_updater")
 
-# Configuration
+# Shared configuration file (same file as weather_services.py)
+CONFIG_FILE = 'weather_services_config.yaml'
+
+# Configuration (populated from the 'forecast' and 'database' sections by configure())
 API_KEY = ''
 LOCATION = ''  # e.g., 'London,UK' or '37.8267,-122.4233'
-DB_CONFIG = {
-    'user': '',
-    'password': '',
-    'host': 'localhost',
-    'database': '',
-    'port': 3306
-}
+STORAGE = None  # MySQL or SQLite backend from the 'database' section
 
 # Update intervals (in minutes)
-CURRENT_UPDATE_INTERVAL = 5  # Update current conditions every 15 minutes
-FORECAST_UPDATE_INTERVAL = 180  # Update forecast every 6 hours (360 minutes)
+CURRENT_UPDATE_INTERVAL = 5  # Update current conditions every 5 minutes
+FORECAST_UPDATE_INTERVAL = 180  # Update forecast every 3 hours (180 minutes)
 FORECAST_DAYS = 7  # Number of days to forecast
 
+# API request timeouts (in seconds), so a hung request cannot hold a worker and a pooled connection
+API_CONNECT_TIMEOUT = 5  # Establish the connection
+API_READ_TIMEOUT = 30  # Wait between bytes of the response (full forecasts are large)
+
+# Tiered refresh (populated from the 'forecast.tiers' section by configure())
+NEAR_DAYS = None  # Days after today the full update fetches with hours (None: all FORECAST_DAYS in one request)
+FAR_UPDATE_INTERVAL = 720  # Refresh the days beyond NEAR_DAYS, daily values only, every 12 hours (minutes)
+
+# Daily API credit budget from the 'forecast.budget' section (None: unlimited)
+BUDGET = None
+
+# Bias correction from the 'forecast.correction' section (None: disabled)
+CORRECTION = None
+
+# Database connection pool settings
+DB_POOL_SIZE = 2  # One connection for each scheduled job is enough
+
+# Timezone fields of the last API response, for times in the location's local time
+LOCATION_TZ = {}
+
+# Callables run with the refreshed table names after each update (e.g. to invalidate read caches)
+UPDATE_LISTENERS = []
+
+# Housekeeping (populated from the 'forecast.retention' section by configure())
+HOURLY_RETENTION = 24  # Hours of past hourly forecasts kept
+DAILY_RETENTION = 2  # Days of past daily forecasts kept
+ALERT_RETENTION = 24  # Hours ended alerts are kept
+ARCHIVE_RETENTION = None  # Days of archived issuances kept (None keeps them for verification)
+PURGE_INTERVAL = 60  # Run housekeeping every hour (minutes)
+PURGE_BATCH_SIZE = 1000  # Rows deleted per statement, so locks stay short
+
+# Secondary indexes the housekeeping deletes rely on: (table, name, columns)
+HOUSEKEEPING_INDEXES = [
+    ('weather_hourly', 'datetime_idx', 'datetime'),
+    ('weather_daily', 'date_idx', 'date'),
+    ('weather_alerts', 'ends_idx', 'ends'),
+]
+
 # API parameters
 API_PARAMS = {
     'unitGroup': 'metric',  # Options: us, metric, uk
@@ -42,6 +77,14 @@ API_PARAMS = {
     'key': API_KEY
 }
 
+# API parameters for the far horizon: daily values only, billed one record per day
+DAILY_API_PARAMS = {
+    'unitGroup': 'metric',
+    'include': 'days',
+    'contentType': 'json',
+    'key': API_KEY
+}
+
 # API parameters for current conditions only (to reduce data usage)
 CURRENT_API_PARAMS = {
     'unitGroup': 'metric',
@@ -50,14 +93,149 @@ CURRENT_API_PARAMS = {
     'key': API_KEY
 }
 
+# Lazily created connection pool, reused across update cycles
+db_pool = None
+db_pool_lock = threading.Lock()
+
+def configure_logging():
+    """Configure logging when the forecast service runs standalone."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("weather_updater.log"),
+            logging.StreamHandler()
+        ]
+    )
+
+def load_config(path=None):
+    """Load the shared configuration file.
+
+    Looks in the working directory first and then next to the repository root,
+    so the forecast service can be started from either location.
+    """
+    candidates = [path] if path else [
+        CONFIG_FILE,
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', CONFIG_FILE)
+    ]
+
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            with open(candidate, 'r') as config_file:
+                return yaml.safe_load(config_file)
+
+    raise FileNotFoundError(f"Configuration file '{CONFIG_FILE}' not found")
+
+def validate_config(config):
+    """Validate the sections of the configuration used by the forecast service."""
+    if 'database' not in config:
+        logger.error("Missing 'database' section in configuration file.")
+        return False
+
+    for field in missing_fields(config['database']):
+        logger.error(f"Missing required database field: {field}")
+        return False
+
+    if 'forecast' not in config:
+        logger.error("Missing 'forecast' section in configuration file.")
+        return False
+
+    for field in ['api_key', 'location']:
+        if not config['forecast'].get(field):
+            logger.error(f"Missing required forecast field: {field}")
+            return False
+
+    return True
+
+def configure(config, pool=None):
+    """Apply a loaded configuration to the module settings.
+
+    Args:
+        config (dict): Parsed weather_services_config.yaml
+        pool: Optional existing connection pool to share with other services
+    """
+    global API_KEY, LOCATION, STORAGE, BUDGET, CORRECTION, db_pool
+    global CURRENT_UPDATE_INTERVAL, FORECAST_UPDATE_INTERVAL, FORECAST_DAYS, DB_POOL_SIZE
+    global API_CONNECT_TIMEOUT, API_READ_TIMEOUT
+    global NEAR_DAYS, FAR_UPDATE_INTERVAL
+    global HOURLY_RETENTION, DAILY_RETENTION, ALERT_RETENTION, ARCHIVE_RETENTION, PURGE_INTERVAL, PURGE_BATCH_SIZE
+
+    forecast_config = config['forecast']
+    API_KEY = forecast_config['api_key']
+    LOCATION = forecast_config['location']
+    CURRENT_UPDATE_INTERVAL = int(forecast_config.get('current_interval', CURRENT_UPDATE_INTERVAL))
+    FORECAST_UPDATE_INTERVAL = int(forecast_config.get('forecast_interval', FORECAST_UPDATE_INTERVAL))
+    FORECAST_DAYS = int(forecast_config.get('forecast_days', FORECAST_DAYS))
+    API_CONNECT_TIMEOUT = float(forecast_config.get('connect_timeout', API_CONNECT_TIMEOUT))
+    API_READ_TIMEOUT = float(forecast_config.get('read_timeout', API_READ_TIMEOUT))
+
+    tiers = forecast_config.get('tiers') or {}
+    near_days = tiers.get('near_days')
+    # A near horizon covering every forecast day is the single-request refresh
+    NEAR_DAYS = max(0, int(near_days)) if near_days is not None and int(near_days) < FORECAST_DAYS else None
+    FAR_UPDATE_INTERVAL = int(tiers.get('far_interval', FAR_UPDATE_INTERVAL))
+
+    retention = forecast_config.get('retention') or {}
+    HOURLY_RETENTION = float(retention.get('hourly_hours', HOURLY_RETENTION))
+    DAILY_RETENTION = int(retention.get('daily_days', DAILY_RETENTION))
+    ALERT_RETENTION = float(retention.get('alert_hours', ALERT_RETENTION))
+    archive_days = retention.get('archive_days', ARCHIVE_RETENTION)
+    ARCHIVE_RETENTION = float(archive_days) if archive_days is not None else None
+    PURGE_INTERVAL = int(retention.get('purge_interval', PURGE_INTERVAL))
+    PURGE_BATCH_SIZE = int(retention.get('batch_size', PURGE_BATCH_SIZE))
+
+    BUDGET = create_credit_budget(forecast_config.get('budget'))
+
+    # Bias correction needs NumPy, so it is only imported when configured
+    CORRECTION = None
+    if (forecast_config.get('correction') or {}).get('enabled', False):
+        from forecast_correction import create_bias_correction
+        CORRECTION = create_bias_correction(forecast_config['correction'])
+
+    db_config = config['database']
+    STORAGE = create_storage(db_config)
+    DB_POOL_SIZE = int(db_config.get('pool_size', DB_POOL_SIZE))
+
+    unit_group = forecast_config.get('unit_group', 'metric')
+    for params in (API_PARAMS, DAILY_API_PARAMS, CURRENT_API_PARAMS):
+        params['key'] = API_KEY
+        params['unitGroup'] = unit_group
+
+    if pool is not None:
+        db_pool = pool
+
+def get_db_connection():
+    """Get a healthy connection from the shared pool.
+
+    The pool is created on first use. Each connection is pinged before it is
+    handed out and transparently reconnected if the server dropped it, so
+    update cycles no longer pay for a full connect/auth handshake.
+    Call close() on the returned connection to give it back to the pool.
+    """
+    global db_pool
+
+    with db_pool_lock:
+        if db_pool is None:
+            logger.info(f"Creating database connection pool (size {DB_POOL_SIZE})")
+            db_pool = STORAGE.create_pool("weather_updater", DB_POOL_SIZE)
+
+    connection = db_pool.get_connection()
+    try:
+        # Health check: reconnect stale pooled connections before use
+        connection.ping(reconnect=True, attempts=3, delay=2)
+    except STORAGE.Error:
+        connection.close()
+        raise
+    return connection
+
 def create_database_tables():
     """Create the necessary database tables if they don't exist."""
-    connection = mysql.connector.connect(**DB_CONFIG)
+    connection = get_db_connection()
     cursor = connection.cursor()
 
     try:
         # Create table for daily forecasts
-        cursor.execute('''
+        STORAGE.create_table(cursor, '''
             CREATE TABLE IF NOT EXISTS weather_daily (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 location VARCHAR(100) NOT NULL,
@@ -90,12 +268,13 @@ def create_database_tables():
                 description VARCHAR(500),
                 icon VARCHAR(50),
                 last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE KEY location_date (location, date)
+                UNIQUE KEY location_date (location, date),
+                KEY date_idx (date)
             )
         ''')
 
         # Create table for hourly forecasts
-        cursor.execute('''
+        STORAGE.create_table(cursor, '''
             CREATE TABLE IF NOT EXISTS weather_hourly (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 location VARCHAR(100) NOT NULL,
@@ -122,12 +301,51 @@ def create_database_tables():
                 conditions VARCHAR(255),
                 icon VARCHAR(50),
                 last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE KEY location_datetime (location, datetime),
+                KEY datetime_idx (datetime)
+            )
+        ''')
+
+        # Create append-only archive of hourly forecast issuances (used for verification)
+        STORAGE.create_table(cursor, '''
+            CREATE TABLE IF NOT EXISTS weather_hourly_archive (
+                location VARCHAR(100) NOT NULL,
+                issued_at DATETIME NOT NULL,
+                valid_at DATETIME NOT NULL,
+                lead_hours SMALLINT NOT NULL,
+                temp FLOAT,
+                humidity FLOAT,
+                dew FLOAT,
+                precip FLOAT,
+                windgust FLOAT,
+                windspeed FLOAT,
+                winddir FLOAT,
+                pressure FLOAT,
+                PRIMARY KEY (location, issued_at, valid_at),
+                KEY valid_at_idx (location, valid_at)
+            ) ROW_FORMAT=COMPRESSED
+        ''')
+
+        # Create table for the bias-corrected upcoming hours (see forecast_correction.py)
+        STORAGE.create_table(cursor, '''
+            CREATE TABLE IF NOT EXISTS weather_hourly_corrected (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                location VARCHAR(100) NOT NULL,
+                datetime DATETIME NOT NULL,
+                lead_hours SMALLINT NOT NULL,
+                temp FLOAT,
+                humidity FLOAT,
+                dew FLOAT,
+                pressure FLOAT,
+                windspeed FLOAT,
+                windgust FLOAT,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE KEY location_datetime (location, datetime)
             )
         ''')
 
         # Create table for current conditions
-        cursor.execute('''
+        STORAGE.create_table(cursor, '''
             CREATE TABLE IF NOT EXISTS weather_current (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 location VARCHAR(100) NOT NULL,
@@ -157,7 +375,7 @@ def create_database_tables():
         ''')
 
         # Create table for weather alerts
-        cursor.execute('''
+        STORAGE.create_table(cursor, '''
             CREATE TABLE IF NOT EXISTS weather_alerts (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 location VARCHAR(100) NOT NULL,
@@ -169,49 +387,83 @@ def create_database_tables():
                 onset DATETIME,
                 ends DATETIME,
                 last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE KEY alert_key (location, alert_id)
+                UNIQUE KEY alert_key (location, alert_id),
+                KEY ends_idx (ends)
+            )
+        ''')
+
+        # Create table for the API credits spent per (UTC) day
+        STORAGE.create_table(cursor, '''
+            CREATE TABLE IF NOT EXISTS weather_api_credits (
+                day DATE PRIMARY KEY,
+                credits INT NOT NULL
             )
         ''')
 
+        # Tables created before housekeeping existed lack its indexes
+        for table, name, columns in HOUSEKEEPING_INDEXES:
+            STORAGE.create_index(cursor, table, name, columns)
+
         connection.commit()
         logger.info("Database tables created or already exist")
+
+        # Resume today's credit count after a restart
+        if BUDGET is not None:
+            day = datetime.now(timezone.utc).date()
+            cursor.execute("SELECT credits FROM weather_api_credits WHERE day = %s", (day,))
+            row = cursor.fetchone()
+            BUDGET.restore(day, row[0] if row else 0)
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
     finally:
         cursor.close()
         connection.close()
 
-def get_weather_forecast(current_only=False):
+def get_weather_forecast(current_only=False, days=None, first_day=0, daily_only=False):
     """Retrieve weather forecast data from Visual Crossing API.
 
     Args:
         current_only (bool): If True, only fetch current conditions to save API credits
+        days (int): Last day to fetch, in days after today (FORECAST_DAYS when not given)
+        first_day (int): First day to fetch, in days after today
+        daily_only (bool): If True, fetch daily values only (no hours, current conditions or alerts)
     """
     base_url = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}'
 
     # Use different parameters based on what we're fetching
-    params = CURRENT_API_PARAMS if current_only else API_PARAMS
+    params = CURRENT_API_PARAMS if current_only else DAILY_API_PARAMS if daily_only else API_PARAMS
+    label = 'current only' if current_only else 'far horizon' if daily_only else 'full forecast'
 
     if not current_only:
-        # For full forecast, specify date range
-        today = datetime.now().strftime('%Y-%m-%d')
-        end_date = (datetime.now() + timedelta(days=FORECAST_DAYS)).strftime('%Y-%m-%d')
-        url = f'{base_url}/{today}/{end_date}'
+        # For forecasts, specify date range
+        days = FORECAST_DAYS if days is None else days
+        start_date = (datetime.now() + timedelta(days=first_day)).strftime('%Y-%m-%d')
+        end_date = (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+        url = f'{base_url}/{start_date}/{end_date}'
     else:
         # For current conditions only, no date range needed
         url = base_url
 
     try:
-        response = requests.get(url, params=params)
+        response = requests.get(url, params=params, timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
 
         if response.status_code == 200:
-            logger.info(f"Successfully retrieved weather data for {LOCATION} ({'current only' if current_only else 'full forecast'})")
-            return response.json()
+            logger.info(f"Successfully retrieved weather data for {LOCATION} ({label})")
+            metrics.incr('forecast.fetch.success')
+            data = response.json()
+            LOCATION_TZ.update({key: data[key] for key in ('timezone', 'tzoffset') if key in data})
+            if BUDGET is not None:
+                # Visual Crossing reports the records it billed; estimate if it does not
+                estimate = CURRENT_COST if current_only else estimate_cost(days - first_day + 1, hours=not daily_only)
+                BUDGET.record(data.get('queryCost', estimate))
+            return data
         else:
             logger.error(f"Error fetching data: HTTP {response.status_code} - {response.text}")
+            metrics.incr('forecast.fetch.failure')
             return None
     except Exception as e:
         logger.error(f"Exception while fetching weather data: {e}")
+        metrics.incr('forecast.fetch.failure')
         return None
 
 def update_daily_forecast(connection, data, location):
@@ -253,17 +505,8 @@ def update_daily_forecast(connection, data, location):
                 'icon': day.get('icon')
             }
 
-            # Create placeholders and values for SQL query
-            placeholders = ', '.join(['%s'] * len(values))
-            columns = ', '.join(values.keys())
-            update_stmt = ', '.join([f"{k} = VALUES({k})" for k in values.keys()])
-
-            # Prepare SQL query
-            query = f'''
-                INSERT INTO weather_daily ({columns})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_stmt}, last_updated = CURRENT_TIMESTAMP
-            '''
+            # Insert the row, or update it if it already exists
+            query = STORAGE.upsert('weather_daily', list(values), ('location', 'date'), touch='last_updated')
 
             cursor.execute(query, list(values.values()))
 
@@ -314,17 +557,8 @@ def update_hourly_forecast(connection, data, location):
                     'icon': hour.get('icon')
                 }
 
-                # Create placeholders and values for SQL query
-                placeholders = ', '.join(['%s'] * len(values))
-                columns = ', '.join(values.keys())
-                update_stmt = ', '.join([f"{k} = VALUES({k})" for k in values.keys()])
-
-                # Prepare SQL query
-                query = f'''
-                    INSERT INTO weather_hourly ({columns})
-                    VALUES ({placeholders})
-                    ON DUPLICATE KEY UPDATE {update_stmt}, last_updated = CURRENT_TIMESTAMP
-                '''
+                # Insert the row, or update it if it already exists
+                query = STORAGE.upsert('weather_hourly', list(values), ('location', 'datetime'), touch='last_updated')
 
                 cursor.execute(query, list(values.values()))
 
@@ -336,6 +570,84 @@ def update_hourly_forecast(connection, data, location):
     finally:
         cursor.close()
 
+def location_time(data, moment=None):
+    """moment (aware, default now) as a naive time in the forecast location's timezone.
+
+    Visual Crossing reports times in the location's local time; its response
+    names the timezone, with tzoffset (hours) as a fallback. Without either,
+    the host's timezone is used.
+    """
+    moment = moment or datetime.now(timezone.utc)
+    try:
+        zone = ZoneInfo(data['timezone'])
+    except (KeyError, TypeError, ValueError, ZoneInfoNotFoundError):
+        zone = timezone(timedelta(hours=float(data['tzoffset']))) if data.get('tzoffset') is not None else None
+    return moment.astimezone(zone).replace(tzinfo=None)
+
+# weather_hourly_archive columns in the order archive_hourly_forecast() builds rows
+ARCHIVE_COLUMNS = ['location', 'issued_at', 'valid_at', 'lead_hours', 'temp', 'humidity', 'dew',
+                   'precip', 'windgust', 'windspeed', 'winddir', 'pressure']
+
+def archive_hourly_forecast(connection, data, location, issued_at):
+    """Append this issuance of the hourly forecast to the archive table.
+
+    Unlike weather_hourly, rows are never updated: each forecast run is stored
+    under its own issued_at (an aware time, stored in the location's local
+    time like valid_at) so forecast skill can be verified later.
+    """
+    cursor = connection.cursor()
+
+    try:
+        # Truncate to the minute so the issuance key stays compact and stable
+        issued_at = issued_at.replace(second=0, microsecond=0)
+        issued_epoch = issued_at.timestamp()
+        issued_local = location_time(data, issued_at)
+        rows = []
+
+        for day in data.get('days', []):
+            date = day.get('datetime')
+
+            for hour in day.get('hours', []):
+                hour_time = hour.get('datetime', '00:00:00')
+                valid_at = datetime.strptime(f"{date} {hour_time}", '%Y-%m-%d %H:%M:%S')
+
+                # Lead times come from UTC epochs, so DST changes do not shift them
+                if hour.get('datetimeEpoch') is not None:
+                    lead_hours = int(round((hour['datetimeEpoch'] - issued_epoch) / 3600))
+                else:
+                    lead_hours = int(round((valid_at - issued_local).total_seconds() / 3600))
+
+                # Hours already in the past at issuance are not a forecast
+                if lead_hours < 0:
+                    continue
+
+                rows.append((
+                    location,
+                    issued_local,
+                    valid_at,
+                    lead_hours,
+                    hour.get('temp'),
+                    hour.get('humidity'),
+                    hour.get('dew'),
+                    hour.get('precip'),
+                    hour.get('windgust'),
+                    hour.get('windspeed'),
+                    hour.get('winddir'),
+                    hour.get('pressure')
+                ))
+
+        if rows:
+            # One batched insert per issuance; IGNORE keeps re-runs within the same minute idempotent
+            cursor.executemany(STORAGE.insert_ignore('weather_hourly_archive', ARCHIVE_COLUMNS), rows)
+
+        connection.commit()
+        logger.info(f"Archived {len(rows)} hourly forecast rows for {location} issued at {issued_local}")
+    except Exception as e:
+        logger.error(f"Error archiving hourly forecast: {e}")
+        connection.rollback()
+    finally:
+        cursor.close()
+
 def update_current_conditions(connection, data, location):
     """Update current weather conditions in the database."""
     cursor = connection.cursor()
@@ -370,17 +682,8 @@ def update_current_conditions(connection, data, location):
                 'icon': current.get('icon')
             }
 
-            # Create placeholders and values for SQL query
-            placeholders = ', '.join(['%s'] * len(values))
-            columns = ', '.join(values.keys())
-            update_stmt = ', '.join([f"{k} = VALUES({k})" for k in values.keys()])
-
-            # Prepare SQL query
-            query = f'''
-                INSERT INTO weather_current ({columns})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_stmt}, last_updated = CURRENT_TIMESTAMP
-            '''
+            # Insert the row, or update it if it already exists
+            query = STORAGE.upsert('weather_current', list(values), ('location',), touch='last_updated')
 
             cursor.execute(query, list(values.values()))
 
@@ -411,17 +714,8 @@ def update_weather_alerts(connection, data, location):
                     'ends': alert.get('ends', '')
                 }
 
-                # Create placeholders and values for SQL query
-                placeholders = ', '.join(['%s'] * len(values))
-                columns = ', '.join(values.keys())
-                update_stmt = ', '.join([f"{k} = VALUES({k})" for k in values.keys()])
-
-                # Prepare SQL query
-                query = f'''
-                    INSERT INTO weather_alerts ({columns})
-                    VALUES ({placeholders})
-                    ON DUPLICATE KEY UPDATE {update_stmt}, last_updated = CURRENT_TIMESTAMP
-                '''
+                # Insert the row, or update it if it already exists
+                query = STORAGE.upsert('weather_alerts', list(values), ('location', 'alert_id'), touch='last_updated')
 
                 cursor.execute(query, list(values.values()))
 
@@ -433,10 +727,36 @@ def update_weather_alerts(connection, data, location):
     finally:
         cursor.close()
 
+def notify_updated(tables):
+    """Tell the UPDATE_LISTENERS which tables an update refreshed"""
+    for listener in UPDATE_LISTENERS:
+        try:
+            listener(tables)
+        except Exception as e:
+            logger.error(f"Error in forecast update listener: {e}")
+
+def save_credits(connection):
+    """Persist today's credit count so a restart resumes from it"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(STORAGE.upsert('weather_api_credits', ['day', 'credits'], ('day',)),
+                       (BUDGET.day, BUDGET.spent))
+        connection.commit()
+    except Exception as e:
+        logger.error(f"Error saving API credit usage: {e}")
+        connection.rollback()
+    finally:
+        cursor.close()
+
 def update_current_only():
     """Update only the current weather conditions."""
     logger.info("Starting current conditions update...")
 
+    # Current conditions are deferred too once the pace of the daily budget is used up
+    if BUDGET is not None and not BUDGET.allow(CURRENT_COST):
+        logger.info("Credit budget exhausted for now, skipping current conditions update")
+        return
+
     try:
         # Get only current weather data from API
         weather_data = get_weather_forecast(current_only=True)
@@ -448,17 +768,21 @@ def update_current_only():
         # Get location name from the response
         location = weather_data.get('address', LOCATION)
 
-        # Connect to database
-        connection = mysql.connector.connect(**DB_CONFIG)
+        # Borrow a pooled database connection
+        connection = get_db_connection()
 
-        # Update current conditions only
-        update_current_conditions(connection, weather_data, location)
-
-        # Close database connection
-        connection.close()
+        try:
+            # Update current conditions only
+            update_current_conditions(connection, weather_data, location)
+            if BUDGET is not None:
+                save_credits(connection)
+        finally:
+            # Return the connection to the pool
+            connection.close()
+        notify_updated(('weather_current',))
 
         logger.info("Current conditions update completed successfully")
-    except mysql.connector.Error as err:
+    except STORAGE.Error as err:
         logger.error(f"Database error during current update: {err}")
     except Exception as e:
         logger.error(f"Unexpected error during current update: {e}")
@@ -468,8 +792,20 @@ def update_full_forecast():
     logger.info("Starting full weather data update...")
 
     try:
+        # Issuance time recorded in the forecast archive (converted to the location's time below)
+        issued_at = datetime.now(timezone.utc)
+
+        # With tiers only the near horizon is fetched here; update_far_forecast() covers the rest
+        days = FORECAST_DAYS if NEAR_DAYS is None else NEAR_DAYS
+
+        # Fit the horizon to the credit budget, dropping the far days first
+        if BUDGET is not None:
+            days = BUDGET.plan_days(days)
+            if days is None:
+                return
+
         # Get complete weather data from API
-        weather_data = get_weather_forecast(current_only=False)
+        weather_data = get_weather_forecast(current_only=False, days=days)
 
         if not weather_data:
             logger.error("Failed to retrieve weather data. Skipping database update.")
@@ -478,24 +814,158 @@ def update_full_forecast():
         # Get location name from the response
         location = weather_data.get('address', LOCATION)
 
-        # Connect to database
-        connection = mysql.connector.connect(**DB_CONFIG)
-
-        # Update all data types
-        update_daily_forecast(connection, weather_data, location)
-        update_hourly_forecast(connection, weather_data, location)
-        update_current_conditions(connection, weather_data, location)
-        update_weather_alerts(connection, weather_data, location)
-
-        # Close database connection
-        connection.close()
+        # Borrow a pooled database connection
+        connection = get_db_connection()
+
+        try:
+            # Update all data types
+            update_daily_forecast(connection, weather_data, location)
+            update_hourly_forecast(connection, weather_data, location)
+            archive_hourly_forecast(connection, weather_data, location, issued_at)
+            update_current_conditions(connection, weather_data, location)
+            update_weather_alerts(connection, weather_data, location)
+            if BUDGET is not None:
+                save_credits(connection)
+
+            # Correct the refreshed hours against recent local observations
+            if CORRECTION is not None:
+                CORRECTION.update(connection, STORAGE, location, location_time(weather_data, issued_at))
+        finally:
+            # Return the connection to the pool
+            connection.close()
+        tables = ('weather_daily', 'weather_hourly', 'weather_current', 'weather_alerts')
+        notify_updated(tables + (('weather_hourly_corrected',) if CORRECTION is not None else ()))
 
         logger.info("Full weather data update completed successfully")
-    except mysql.connector.Error as err:
+    except STORAGE.Error as err:
         logger.error(f"Database error during full update: {err}")
     except Exception as e:
         logger.error(f"Unexpected error during full update: {e}")
 
+def update_far_forecast():
+    """Update the daily forecast for the days beyond NEAR_DAYS (daily values only)."""
+    if NEAR_DAYS is None:
+        return
+
+    logger.info("Starting far horizon forecast update...")
+    first_day = NEAR_DAYS + 1
+
+    # The near horizon has priority, so the far one only runs when it fits the budget as a whole
+    if BUDGET is not None and not BUDGET.allow(estimate_cost(FORECAST_DAYS - NEAR_DAYS, hours=False)):
+        logger.info("Credit budget exhausted for now, skipping far horizon update")
+        return
+
+    try:
+        # Get the daily values for the far days from API
+        weather_data = get_weather_forecast(days=FORECAST_DAYS, first_day=first_day, daily_only=True)
+
+        if not weather_data:
+            logger.error("Failed to retrieve far horizon forecast. Skipping database update.")
+            return
+
+        # Get location name from the response
+        location = weather_data.get('address', LOCATION)
+
+        # Borrow a pooled database connection
+        connection = get_db_connection()
+
+        try:
+            update_daily_forecast(connection, weather_data, location)
+
+            # Hours this far out are no longer refreshed; drop any left by single-request runs.
+            # The first far day comes from the response, so the cutoff is in the location's local time
+            days = weather_data.get('days') or []
+            if days:
+                cutoff = f"{days[0].get('datetime')} 00:00:00"
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("DELETE FROM weather_hourly WHERE location = %s AND datetime >= %s",
+                                   (location, cutoff))
+                    connection.commit()
+                finally:
+                    cursor.close()
+
+            if BUDGET is not None:
+                save_credits(connection)
+        finally:
+            # Return the connection to the pool
+            connection.close()
+        notify_updated(('weather_daily', 'weather_hourly'))
+
+        logger.info("Far horizon forecast update completed successfully")
+    except STORAGE.Error as err:
+        logger.error(f"Database error during far horizon update: {err}")
+    except Exception as e:
+        logger.error(f"Unexpected error during far horizon update: {e}")
+
+def purge_table(connection, table, condition, order, params):
+    """Delete the rows matching condition in batches of PURGE_BATCH_SIZE and return how many were removed"""
+    query = STORAGE.delete_batch(table, condition, order, PURGE_BATCH_SIZE)
+    cursor = connection.cursor()
+    removed = 0
+
+    try:
+        while True:
+            cursor.execute(query, params)
+            deleted = cursor.rowcount
+            connection.commit()  # Commit each batch so readers and upserts are never blocked for long
+            removed += deleted
+            if deleted < PURGE_BATCH_SIZE:
+                return removed
+    finally:
+        cursor.close()
+
+def purge_expired_forecasts():
+    """Delete past forecast hours and days, ended alerts and (optionally) old archived issuances."""
+    logger.info("Starting forecast housekeeping...")
+    started = time.time()
+    now = location_time(LOCATION_TZ)  # The forecast tables hold the location's local times
+
+    # (table, condition, order, params) for each delete
+    purges = [
+        ('weather_hourly', 'datetime < %s', 'datetime', (now - timedelta(hours=HOURLY_RETENTION),)),
+        ('weather_daily', 'date < %s', 'date', ((now - timedelta(days=DAILY_RETENTION)).date(),)),
+        ('weather_alerts', 'ends < %s', 'ends', (now - timedelta(hours=ALERT_RETENTION),)),
+    ]
+
+    try:
+        # Borrow a pooled database connection
+        connection = get_db_connection()
+
+        try:
+            # The archive is keyed by location first, so it is purged one location at a time
+            if ARCHIVE_RETENTION is not None:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SELECT DISTINCT location FROM weather_hourly_archive")
+                    locations = [row[0] for row in cursor.fetchall()]
+                finally:
+                    cursor.close()
+                cutoff = now - timedelta(days=ARCHIVE_RETENTION)
+                purges.extend(('weather_hourly_archive', 'location = %s AND valid_at < %s', 'valid_at',
+                               (location, cutoff)) for location in locations)
+
+            removed = {}
+            for table, condition, order, params in purges:
+                removed[table] = removed.get(table, 0) + purge_table(connection, table, condition, order, params)
+        finally:
+            # Return the connection to the pool
+            connection.close()
+
+        for table, count in removed.items():
+            metrics.incr(f"forecast.purged.{table}", count)
+        metrics.observe('forecast.purge', time.time() - started)
+        summary = ", ".join(f"{table}: {count}" for table, count in removed.items())
+        logger.info(f"Forecast housekeeping removed rows ({summary}) in {time.time() - started:.1f}s")
+
+        changed = tuple(table for table, count in removed.items() if count)
+        if changed:
+            notify_updated(changed)
+    except STORAGE.Error as err:
+        logger.error(f"Database error during housekeeping: {err}")
+    except Exception as e:
+        logger.error(f"Unexpected error during housekeeping: {e}")
+
 def start_scheduler():
     """Set up and start the scheduler with different intervals."""
     # Schedule current conditions update every CURRENT_UPDATE_INTERVAL minutes
@@ -504,11 +974,22 @@ def start_scheduler():
     # Schedule full forecast update every FORECAST_UPDATE_INTERVAL minutes
     schedule.every(FORECAST_UPDATE_INTERVAL).minutes.do(update_full_forecast)
 
-    # Run full update immediately on startup
+    # Schedule the far horizon update every FAR_UPDATE_INTERVAL minutes (tiered refresh only)
+    if NEAR_DAYS is not None:
+        schedule.every(FAR_UPDATE_INTERVAL).minutes.do(update_far_forecast)
+
+    # Schedule housekeeping of past forecasts every PURGE_INTERVAL minutes
+    schedule.every(PURGE_INTERVAL).minutes.do(purge_expired_forecasts)
+
+    # Run the forecast updates immediately on startup
     update_full_forecast()
+    update_far_forecast()
 
+    far_schedule = f"Far horizon every {FAR_UPDATE_INTERVAL} minutes, " if NEAR_DAYS is not None else ""
     logger.info(f"Scheduler started: Current conditions every {CURRENT_UPDATE_INTERVAL} minutes, "
-                f"Full forecast every {FORECAST_UPDATE_INTERVAL} minutes")
+                f"Full forecast every {FORECAST_UPDATE_INTERVAL} minutes, "
+                f"{far_schedule}"
+                f"Housekeeping every {PURGE_INTERVAL} minutes")
 
     # Keep the scheduler running
     while True:
@@ -517,6 +998,20 @@ def start_scheduler():
 
 def run_as_service():
     """Run the application as a service with proper initialization."""
+    configure_logging()
+
+    try:
+        config = load_config()
+    except (FileNotFoundError, yaml.YAMLError) as e:
+        logger.error(f"Error loading configuration: {e}. Exiting.")
+        sys.exit(1)
+
+    if not validate_config(config):
+        logger.error("Configuration validation failed. Exiting.")
+        sys.exit(1)
+
+    configure(config)
+
     try:
         # Create database tables if they don't exist
         create_database_tables()
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+import threading
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'station' config section
+DEFAULT_RATE_WINDOW = 10  # minutes of tips used for the rain rate
+
+# Incremental daily/hourly rain totals and rain rate.
+# dataentry.CREATED values are naive times in the database timezone; totals
+# reset at midnight in the station timezone and all internal times are UTC.
+class RainAccumulator:
+    def __init__(self, station_tz=None, db_tz=None, rate_window=DEFAULT_RATE_WINDOW, max_amount=None):
+        self.station_tz = station_tz  # None = system local time
+        self.db_tz = db_tz  # None = system local time
+        self.rate_window = timedelta(minutes=rate_window)
+        self.max_amount = max_amount  # tips above this are sensor glitches
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.tips = deque()  # (UTC time, mm) for the last hour
+        self.hourly = 0.0
+        self.daily = 0.0
+        self.day = None
+
+    def to_utc(self, created):
+        """Convert a naive database time to an aware UTC datetime"""
+        if self.db_tz is not None:
+            created = created.replace(tzinfo=self.db_tz)
+        return created.astimezone(timezone.utc)
+
+    def to_db(self, when):
+        """Convert an aware datetime to a naive database time"""
+        return when.astimezone(self.db_tz).replace(tzinfo=None)
+
+    def station_day(self, when):
+        return when.astimezone(self.station_tz).date()
+
+    def day_start(self, when):
+        """Station-local midnight before when, as a naive database time"""
+        local = when.astimezone(self.station_tz)
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        if self.station_tz is not None:
+            midnight = midnight.replace(tzinfo=self.station_tz)
+        return self.to_db(midnight.astimezone(timezone.utc))
+
+    def _roll(self, when):
+        """Reset the daily total at station midnight and expire tips older than an hour"""
+        day = self.station_day(when)
+        if self.day is None or day > self.day:
+            self.day = day
+            self.daily = 0.0
+
+        cutoff = when - timedelta(hours=1)
+        while self.tips and self.tips[0][0] < cutoff:
+            self.hourly -= self.tips.popleft()[1]
+
+    def add(self, created, amount):
+        """Add one dataentry reading (naive database time, mm)"""
+        if not amount:
+            return
+        if amount < 0 or (self.max_amount is not None and amount > self.max_amount):
+            metrics.incr('rain.rejected')
+            return
+
+        when = self.to_utc(created)
+        with self.lock:
+            self._roll(when)
+            if self.station_day(when) == self.day:
+                self.daily += amount
+            self.tips.append((when, amount))
+            self.hourly += amount
+
+    def totals(self, when):
+        """Return (daily, hourly, rate in mm/h) at the aware datetime when"""
+        with self.lock:
+            self._roll(when)
+            rate_cutoff = when - self.rate_window
+            recent = sum(amount for tip_time, amount in reversed(self.tips) if tip_time >= rate_cutoff)
+            rate = recent * timedelta(hours=1) / self.rate_window
+            return max(0.0, self.daily), max(0.0, self.hourly), rate
+
+# Keeps a RainAccumulator up to date from dataentry with incremental ID-range reads
+class RainTracker:
+    SEED_QUERY = "SELECT ID, CREATED, RAINFALL FROM dataentry WHERE CREATED >= %s ORDER BY ID;"
+    SEED_QUERY_AT = "SELECT ID, CREATED, RAINFALL FROM dataentry WHERE CREATED BETWEEN %s AND %s ORDER BY ID;"
+    NEW_QUERY = "SELECT ID, CREATED, RAINFALL FROM dataentry WHERE ID > %s ORDER BY ID;"
+    NEW_QUERY_AT = "SELECT ID, CREATED, RAINFALL FROM dataentry WHERE CREATED > %s AND CREATED <= %s ORDER BY ID;"
+    MAX_ID_QUERY = "SELECT COALESCE(MAX(ID), 0) FROM dataentry;"
+
+    def __init__(self, accumulator):
+        self.rain = accumulator
+        self.last_id = None
+        self.last_ref = None
+
+    def refresh(self, cursor, ref=None):
+        """Read rows added since the last call and return (daily, hourly, rate) at ref.
+
+        ref is a naive database time when replaying history, or None for now.
+        """
+        when = datetime.now(timezone.utc) if ref is None else self.rain.to_utc(ref)
+
+        if self.last_id is None or (self.last_ref is not None and when < self.last_ref):
+            # First call, or the replay clock moved backwards: reload today and the last hour
+            self.rain.reset()
+            since = min(self.rain.day_start(when), self.rain.to_db(when - timedelta(hours=1)))
+            if ref is None:
+                cursor.execute(self.SEED_QUERY, (since,))
+            else:
+                cursor.execute(self.SEED_QUERY_AT, (since, ref))
+            self.last_id = 0
+            metrics.incr('rain.seeded')
+        elif ref is None:
+            cursor.execute(self.NEW_QUERY, (self.last_id,))
+        else:
+            # Replay moves forward in time rather than by ID
+            cursor.execute(self.NEW_QUERY_AT, (self.rain.to_db(self.last_ref), ref))
+
+        for row_id, created, rainfall in cursor.fetchall():
+            self.rain.add(created, float(rainfall or 0))
+            self.last_id = max(self.last_id, row_id)
+
+        if self.last_id == 0 and ref is None:
+            # No rows today yet: start the incremental reads from the current end of the table
+            cursor.execute(self.MAX_ID_QUERY)
+            self.last_id = cursor.fetchone()[0]
+
+        self.last_ref = when
+        return self.rain.totals(when)
+
+def create_rain_accumulator(station_config, max_amount=None):
+    """Create a RainAccumulator from the 'station' config section"""
+    station_config = station_config or {}
+    station_tz = station_config.get('timezone')
+    db_tz = station_config.get('db_timezone')
+    return RainAccumulator(
+        station_tz=ZoneInfo(station_tz) if station_tz else None,
+        db_tz=ZoneInfo(db_tz) if db_tz else None,
+        rate_window=float(station_config.get('rain_rate_window', DEFAULT_RATE_WINDOW)),
+        max_amount=max_amount
+    )
@@ -0,0 +1,307 @@
+#!/usr/bin/python3
+import json
+import queue
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from station_metrics import metrics
+from snapshot import Snapshot
+from rain_engine import create_rain_accumulator
+from derived_metrics import derived_values
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'ingest' config section
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8750
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 10  # seconds between batched inserts
+DEFAULT_MAX_AGE = 120  # seconds before in-memory data is considered stale
+DEFAULT_MAX_BACKLOG = 10000  # readings kept in memory while the database is unavailable
+
+# dataentry columns accepted by the ingestion endpoint (JSON keys are case-insensitive)
+READING_COLUMNS = [
+    'HUMIDITY', 'AIR_TEMP', 'FEELS_LIKE', 'DEW_POINT', 'PRESSURE_SEA', 'RAINFALL',
+    'WIND_SPEED', 'WIND_GUST', 'WIND_DIRECTION', 'WIND_CARDINAL', 'UV_INDEX', 'TEMP_CASE'
+]
+
+# Fields that must be present in every reading
+REQUIRED_COLUMNS = ['AIR_TEMP', 'FEELS_LIKE', 'PRESSURE_SEA', 'HUMIDITY', 'DEW_POINT']
+
+def parse_reading(payload, rain):
+    """Normalise a JSON reading into a dataentry row dict with a CREATED datetime.
+
+    CREATED is a naive database time (rain.to_db converts aware timestamps and the current time).
+    """
+    fields = {key.upper(): value for key, value in payload.items()}
+
+    missing = [column for column in REQUIRED_COLUMNS if fields.get(column) is None]
+    if missing:
+        raise ValueError(f"missing fields: {', '.join(missing)}")
+
+    reading = {}
+    for column in READING_COLUMNS:
+        value = fields.get(column)
+        if column == 'WIND_CARDINAL':
+            reading[column] = str(value) if value is not None else '0'
+        else:
+            reading[column] = float(value) if value is not None else 0.0
+
+    created = datetime.fromisoformat(fields['CREATED']) if fields.get('CREATED') else datetime.now(timezone.utc)
+    reading['CREATED'] = rain.to_db(created) if created.tzinfo is not None else created
+    return reading
+
+# Rolling in-memory aggregates matching the windows used by get_weather_data()
+class RollingAggregator:
+    def __init__(self, rain, max_age=DEFAULT_MAX_AGE):
+        self.lock = threading.Lock()
+        self.readings = deque()  # (CREATED, reading) for the last hour
+        self.rain = rain  # RainAccumulator with the running rain totals
+        self.max_age = max_age
+
+    def add(self, reading):
+        """Add one reading and update the running rain totals"""
+        created = reading['CREATED']
+        self.rain.add(created, reading['RAINFALL'])
+        with self.lock:
+            self.readings.append((created, reading))
+            self._evict(created)
+
+    def seed(self, readings):
+        """Load today's rows from the database so totals survive a restart"""
+        for reading in readings:
+            self.add(reading)
+        logger.info(f"Seeded ingestion aggregates with {len(readings)} rows")
+
+    def _evict(self, now):
+        cutoff = now - timedelta(hours=1)
+        while self.readings and self.readings[0][0] < cutoff:
+            self.readings.popleft()
+
+    def recent_rows(self, columns):
+        """Return (CREATED, value, ...) tuples for the readings held in memory, oldest first"""
+        with self.lock:
+            return [(created,) + tuple(reading[column] for column in columns) for created, reading in self.readings]
+
+    def _window(self, now, minutes):
+        cutoff = now - timedelta(minutes=minutes)
+        # Newest readings are on the right; stop at the first one outside the window
+        window = []
+        for created, reading in reversed(self.readings):
+            if created < cutoff:
+                break
+            window.append(reading)
+        return window
+
+    def snapshot(self):
+        """Return a Snapshot like get_weather_data(), or None if stale"""
+        now = self.rain.to_db(datetime.now(timezone.utc))  # CREATED values are database times
+        with self.lock:
+            if not self.readings:
+                return None
+            newest_time, latest = self.readings[-1]
+            if (now - newest_time).total_seconds() > self.max_age:
+                return None
+
+            self._evict(now)
+            windows = {minutes: self._window(now, minutes) for minutes in (2, 5, 10)}
+
+        timestamp = datetime.now(timezone.utc)
+        daily_rain, hourly_rain, rain_rate = self.rain.totals(timestamp)
+
+        def average(rows, column):
+            return sum(row[column] for row in rows) / len(rows) if rows else 0.0
+
+        def maximum(rows, column):
+            return max(row[column] for row in rows) if rows else 0.0
+
+        def gust_direction(rows):
+            return max(rows, key=lambda row: row['WIND_GUST'])['WIND_DIRECTION'] if rows else 0.0
+
+        wind_speed_10min = average(windows[10], 'WIND_SPEED')
+        heat_index, wind_chill = derived_values(latest['AIR_TEMP'], latest['HUMIDITY'], wind_speed_10min)
+
+        return Snapshot(
+            temperature=latest['AIR_TEMP'],
+            feels_like=latest['FEELS_LIKE'],
+            pressure_sea=latest['PRESSURE_SEA'],
+            humidity=latest['HUMIDITY'],
+            dew_point=latest['DEW_POINT'],
+            uv_index=latest['UV_INDEX'],
+            wind_speed=latest['WIND_SPEED'],
+            wind_dir=latest['WIND_DIRECTION'],
+            case_temp=latest['TEMP_CASE'],
+            wind_cardinal=latest['WIND_CARDINAL'],
+            wind_dir_2min=average(windows[2], 'WIND_DIRECTION'),
+            wind_speed_2min=average(windows[2], 'WIND_SPEED'),
+            wind_speed_10min=wind_speed_10min,
+            wind_gust_10min=maximum(windows[10], 'WIND_GUST'),
+            wind_dir_10min=average(windows[10], 'WIND_DIRECTION'),
+            wind_speed_5min=average(windows[5], 'WIND_SPEED'),
+            wind_gust_5min=maximum(windows[5], 'WIND_GUST'),
+            wind_dir_5min=average(windows[5], 'WIND_DIRECTION'),
+            wind_speed_hi=maximum(windows[10], 'WIND_SPEED'),
+            wind_gust_dir=gust_direction(windows[10]),
+            daily_rain=daily_rain,
+            hourly_rain=hourly_rain,
+            rain_rate=rain_rate,
+            heat_index=heat_index,
+            wind_chill=wind_chill,
+            source_id=None,
+            source_time=self.rain.to_utc(newest_time),
+            timestamp=timestamp
+        )
+
+# Writes ingested readings to dataentry in batched inserts off the hot path
+class BatchWriter:
+    def __init__(self, db, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_backlog=DEFAULT_MAX_BACKLOG):
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backlog = max_backlog
+        self.queue = queue.Queue()
+        self.pending = []
+
+    def submit(self, reading):
+        self.queue.put(reading)
+
+    def run(self):
+        """Collect readings and flush them every flush_interval or batch_size rows"""
+        columns = ['CREATED'] + READING_COLUMNS
+        query = (f"INSERT INTO dataentry ({', '.join(columns)}) "
+                 f"VALUES ({', '.join(['%s'] * len(columns))})")
+        deadline = time.time() + self.flush_interval
+
+        while True:
+            try:
+                reading = self.queue.get(timeout=max(0, deadline - time.time()))
+                self.pending.append(tuple(reading[column] for column in columns))
+            except queue.Empty:
+                pass
+
+            if len(self.pending) < self.batch_size and time.time() < deadline:
+                continue
+
+            deadline = time.time() + self.flush_interval
+            if not self.pending:
+                continue
+
+            try:
+                connection = self.db.connect()
+                cursor = connection.cursor()
+                try:
+                    cursor.executemany(query, self.pending)
+                    connection.commit()
+                finally:
+                    cursor.close()
+                metrics.incr('ingest.rows_written', len(self.pending))
+                logger.debug(f"Wrote {len(self.pending)} ingested rows to dataentry")
+                self.pending = []
+            except Exception as e:
+                logger.error(f"Error writing ingested rows ({len(self.pending)} pending): {str(e)}")
+                metrics.incr('ingest.write_errors')
+                # Keep the newest rows for the next attempt, bounded to avoid unbounded memory use
+                if len(self.pending) > self.max_backlog:
+                    dropped = len(self.pending) - self.max_backlog
+                    self.pending = self.pending[-self.max_backlog:]
+                    metrics.incr('ingest.rows_dropped', dropped)
+            metrics.set_gauge('ingest.pending_rows', len(self.pending))
+
+def make_handler(aggregator, writer, notifier):
+    """Build the request handler class bound to the ingestion state"""
+    class IngestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip('/') != '/readings':
+                self.send_error(404)
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length))
+                readings = [parse_reading(item, aggregator.rain) for item in (payload if isinstance(payload, list) else [payload])]
+            except (ValueError, TypeError, AttributeError) as e:
+                metrics.incr('ingest.rejected')
+                self.send_error(400, str(e))
+                return
+
+            for reading in readings:
+                aggregator.add(reading)
+                writer.submit(reading)
+            metrics.incr('ingest.readings', len(readings))
+
+            self.send_response(204)
+            self.end_headers()
+
+            if notifier is not None:
+                notifier.notify()
+
+        def log_message(self, format, *args):
+            logger.debug(f"Ingest request from {self.address_string()}: {format % args}")
+
+    return IngestHandler
+
+def load_today(db, since):
+    """Read dataentry rows since the given database time to seed the rolling aggregates"""
+    connection = db.connect()
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            f"SELECT CREATED, {', '.join(READING_COLUMNS)} FROM dataentry WHERE CREATED >= %s ORDER BY ID;",
+            (since,)
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    for row in rows:
+        for column in READING_COLUMNS:
+            if column != 'WIND_CARDINAL':
+                row[column] = float(row[column] or 0)
+    return rows
+
+def start_ingest_server(ingest_config, db_factory, notifier=None, rain=None):
+    """Start the ingestion endpoint and batch writer.
+
+    Args:
+        ingest_config (dict): The 'ingest' config section
+        db_factory: Callable returning a Database for seeding and batched inserts
+        notifier: Optional NewDataNotifier woken on every accepted reading
+        rain: RainAccumulator for the station timezone (system local time if not given)
+
+    Returns:
+        RollingAggregator, or None when ingestion is disabled
+    """
+    if not ingest_config or not ingest_config.get('enabled', False):
+        return None
+
+    rain = rain or create_rain_accumulator(None)
+    aggregator = RollingAggregator(rain, max_age=int(ingest_config.get('max_age', DEFAULT_MAX_AGE)))
+    db = db_factory()
+
+    # Today in the station timezone plus the last hour, so rain totals survive a restart
+    now = datetime.now(timezone.utc)
+    since = min(rain.day_start(now), rain.to_db(now - timedelta(hours=1)))
+    try:
+        aggregator.seed(load_today(db, since))
+    except Exception as e:
+        logger.warning(f"Could not seed ingestion aggregates from dataentry: {str(e)}")
+
+    writer = BatchWriter(
+        db,
+        batch_size=int(ingest_config.get('batch_size', DEFAULT_BATCH_SIZE)),
+        flush_interval=float(ingest_config.get('flush_interval', DEFAULT_FLUSH_INTERVAL))
+    )
+    threading.Thread(target=writer.run, name="ingest_writer_thread", daemon=True).start()
+
+    host = ingest_config.get('host', DEFAULT_HOST)
+    port = int(ingest_config.get('port', DEFAULT_PORT))
+    server = ThreadingHTTPServer((host, port), make_handler(aggregator, writer, notifier))
+    threading.Thread(target=server.serve_forever, name="ingest_server_thread", daemon=True).start()
+    logger.info(f"Sensor ingestion endpoint listening on http://{host}:{port}/readings")
+
+    return aggregator
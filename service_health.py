@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+import random
+import threading
+import time
+import logging
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Upload outcomes returned by the submit_to_* functions
+SUCCESS = 'success'
+TRANSIENT = 'transient'  # Network errors and 5xx: retry with backoff
+RATE_LIMITED = 'rate_limited'  # 429: back off immediately
+PERMANENT = 'permanent'  # Bad credentials or request: needs operator action
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Defaults for the optional 'health' config section
+DEFAULT_FAILURE_THRESHOLD = 3  # consecutive transient failures before opening
+DEFAULT_BASE_BACKOFF = 60  # seconds the breaker stays open the first time
+DEFAULT_MAX_BACKOFF = 3600  # upper bound on the open period
+
+# Response body fragments that mean the credentials were rejected, even with HTTP 200
+PERMANENT_BODY_MARKERS = {
+    'wunderground': ['INVALIDPASSWORDID', 'Password incorrect', 'Password or key and/or id are incorrect'],
+    'pwsweather': ['Invalid StationID', 'Invalid Station ID', 'Invalid password', 'Invalid API key', 'not authorized'],
+    'metoffice': ['Unauthorised', 'Unauthorized'],
+    'weathercloud': [],
+    'windy': []
+}
+
+def classify_response(service_name, response):
+    """Classify an HTTP response from an upload service"""
+    status = response.status_code
+
+    if status == 429:
+        return RATE_LIMITED
+    if status >= 500:
+        return TRANSIENT
+    if status >= 400:
+        return PERMANENT
+
+    body = response.text or ''
+    for marker in PERMANENT_BODY_MARKERS.get(service_name, []):
+        if marker.lower() in body.lower():
+            return PERMANENT
+
+    return SUCCESS if status == 200 else TRANSIENT
+
+# Per-service circuit breaker with exponential backoff and jitter
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 base_backoff=DEFAULT_BASE_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0  # consecutive failures while closed
+        self.open_count = 0  # consecutive times opened without a success
+        self.open_until = 0.0
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(f"breaker.{self.name}.state", self.state)
+
+    def allow_request(self):
+        """Return True if an upload may be attempted now"""
+        with self.lock:
+            if self.state == OPEN and time.time() >= self.open_until:
+                # Let one probe request through
+                self.state = HALF_OPEN
+                self._publish()
+                logger.info(f"[{self.name}] Circuit half-open, probing service")
+            return self.state != OPEN
+
+    def retry_after(self):
+        """Seconds until the breaker will allow another attempt"""
+        with self.lock:
+            return max(0.0, self.open_until - time.time()) if self.state == OPEN else 0.0
+
+    def record(self, outcome):
+        """Update the breaker with the outcome of an upload"""
+        if outcome == SUCCESS:
+            self.record_success()
+        else:
+            self.record_failure(outcome)
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info(f"[{self.name}] Service recovered, circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.open_count = 0
+            self._publish()
+
+    def record_failure(self, outcome=TRANSIENT):
+        with self.lock:
+            self.failures += 1
+
+            # Transient errors are tolerated up to the threshold while closed
+            if outcome == TRANSIENT and self.state == CLOSED and self.failures < self.failure_threshold:
+                return
+
+            if outcome == PERMANENT:
+                # Retrying quickly cannot fix credentials, so wait the longest period
+                backoff = self.max_backoff
+            else:
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** self.open_count))
+
+            # Equal jitter: spread retries so services don't all probe at once
+            delay = backoff / 2 + random.uniform(0, backoff / 2)
+            self.open_count += 1
+            self.state = OPEN
+            self.open_until = time.time() + delay
+            self._publish()
+
+        metrics.incr(f"breaker.{self.name}.opened")
+        logger.warning(f"[{self.name}] Circuit open after {outcome} failure, retrying in {delay:.0f} seconds")
+
+def create_breakers(service_names, health_config):
+    """Create one circuit breaker per service from the 'health' config section"""
+    health_config = health_config or {}
+    return {
+        name: CircuitBreaker(
+            name,
+            failure_threshold=int(health_config.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD)),
+            base_backoff=float(health_config.get('base_backoff', DEFAULT_BASE_BACKOFF)),
+            max_backoff=float(health_config.get('max_backoff', DEFAULT_MAX_BACKOFF))
+        )
+        for name in service_names
+    }
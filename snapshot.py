@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+import json
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+# Immutable weather observation snapshot shared by every upload service.
+# A NamedTuple is tuple-backed (no per-instance __dict__), cheap to create
+# and safe to hand between threads without copying.
+class Snapshot(NamedTuple):
+    temperature: float  # °C
+    feels_like: float  # °C
+    pressure_sea: float  # hPa
+    humidity: float  # %
+    dew_point: float  # °C
+    uv_index: float
+    wind_speed: float  # km/h, latest reading
+    wind_dir: float  # degrees, latest reading
+    case_temp: float  # °C, enclosure temperature
+    wind_cardinal: str  # e.g. 'SW', latest reading
+    wind_dir_2min: float  # degrees
+    wind_speed_2min: float  # km/h
+    wind_speed_10min: float  # km/h
+    wind_gust_10min: float  # km/h
+    wind_dir_10min: float  # degrees
+    wind_speed_5min: float  # km/h
+    wind_gust_5min: float  # km/h
+    wind_dir_5min: float  # degrees
+    wind_speed_hi: float  # km/h, highest reading in 10 minutes
+    wind_gust_dir: float  # degrees, direction of the 10-minute gust
+    daily_rain: float  # mm since station-local midnight
+    hourly_rain: float  # mm in the last 60 minutes
+    rain_rate: float  # mm/h
+    heat_index: float  # °C
+    wind_chill: float  # °C
+    source_id: Optional[int]  # dataentry.ID of the newest reading (None for ingested readings)
+    source_time: Optional[datetime]  # UTC time of the newest reading
+    timestamp: datetime  # UTC
+
+    def to_dict(self):
+        """Plain dict of the fields (e.g. for metrics or encoders)"""
+        return self._asdict()
+
+    def to_json(self):
+        """Serialise for queues and outboxes (times as ISO 8601)"""
+        values = self._asdict()
+        values['timestamp'] = self.timestamp.isoformat()
+        if self.source_time is not None:
+            values['source_time'] = self.source_time.isoformat()
+        return json.dumps(values)
+
+    @classmethod
+    def from_json(cls, text):
+        values = json.loads(text)
+        values['timestamp'] = datetime.fromisoformat(values['timestamp'])
+        if values.get('source_time') is not None:
+            values['source_time'] = datetime.fromisoformat(values['source_time'])
+        return cls(**values)
+
+# Measurement fields (everything except the source reading and the timestamp)
+MEASUREMENT_FIELDS = Snapshot._fields[:-3]
+
+# Newest dataentry reading the snapshot was built from
+SOURCE_FIELDS = ('source_id', 'source_time')
+
+# Fields maintained by the rain engine rather than the aggregate query
+RAIN_FIELDS = ('daily_rain', 'hourly_rain', 'rain_rate')
+
+# Non-numeric measurement fields
+TEXT_FIELDS = ('wind_cardinal',)
@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+import json
+import time
+import hashlib
+import threading
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'api' config section
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8751
+DEFAULT_CURRENT_MAX_AGE = 60  # seconds before /current is re-read if no upload cycle refreshed it
+DEFAULT_FORECAST_MAX_AGE = 300  # seconds before forecast tables are re-read without an update event
+DEFAULT_CLIMATE_MAX_AGE = 300  # seconds before climatology tables are re-read without an update
+RETRY_DELAY = 5  # seconds between attempts to rebuild an entry whose loader failed
+DEFAULT_HISTORY_DAYS = 7  # range of /history when no start is given
+
+# Forecast tables served by the API: the query for the rows worth showing on a
+# dashboard, and the cutoff it takes (the current hour, today or now)
+FORECAST_QUERIES = {
+    'forecast/current': ("SELECT * FROM weather_current ORDER BY location;", None),
+    'forecast/hourly': ("SELECT * FROM weather_hourly WHERE datetime >= %s ORDER BY location, datetime;", 'hour'),
+    'forecast/corrected': ("SELECT * FROM weather_hourly_corrected WHERE datetime >= %s ORDER BY location, datetime;",
+                           'hour'),
+    'forecast/daily': ("SELECT * FROM weather_daily WHERE date >= %s ORDER BY location, date;", 'day'),
+    'forecast/alerts': ("SELECT * FROM weather_alerts WHERE ends IS NULL OR ends >= %s ORDER BY location, onset;",
+                        'now'),
+}
+
+# Climatology tables served when the 'climate' section is enabled (see station_climate.py)
+CLIMATE_QUERIES = {
+    'climate/daily': ("SELECT * FROM climate_daily WHERE day >= %s ORDER BY day;", 'year'),
+    'climate/monthly': ("SELECT * FROM climate_monthly ORDER BY month;", None),
+    'climate/records': ("SELECT * FROM climate_records ORDER BY record;", None),
+}
+
+# Forecast tables behind each endpoint, for invalidation by the forecast loaders
+FORECAST_TABLES = {
+    'weather_current': 'forecast/current',
+    'weather_hourly': 'forecast/hourly',
+    'weather_hourly_corrected': 'forecast/corrected',
+    'weather_daily': 'forecast/daily',
+    'weather_alerts': 'forecast/alerts',
+}
+
+def json_default(value):
+    """Encode database values the json module does not know"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+# One cached response: the encoded body and its ETag, rebuilt by its loader
+class CacheEntry:
+    __slots__ = ('loader', 'max_age', 'response', 'loaded_at', 'attempted_at', 'stale')
+
+    def __init__(self, loader, max_age):
+        self.loader = loader  # Callable returning the JSON text, or None if nothing is available
+        self.max_age = max_age
+        self.response = None  # (body, etag)
+        self.loaded_at = 0.0
+        self.attempted_at = None
+        self.stale = True
+
+    def fresh(self, now):
+        return self.response is not None and not self.stale and now - self.loaded_at < self.max_age
+
+# Encoded responses for the read API. Requests are answered from memory; an
+# entry is only rebuilt after it was invalidated or has expired, and only by
+# one thread at a time, so bursts of requests cost at most one query.
+class ReadCache:
+    def __init__(self):
+        self.entries = {}
+        self.reload_lock = threading.Lock()
+
+    def add(self, name, loader, max_age):
+        self.entries[name] = CacheEntry(loader, max_age)
+
+    def publish(self, name, text):
+        """Replace an entry's response with new JSON text"""
+        entry = self.entries[name]
+        body = text.encode()
+        entry.response = (body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+        entry.loaded_at = time.monotonic()
+        entry.stale = False
+
+    def invalidate(self, *names):
+        """Rebuild these entries on their next request"""
+        for name in names:
+            if name in self.entries:
+                self.entries[name].stale = True
+                self.entries[name].attempted_at = None
+
+    def get(self, name):
+        """Return (body, etag) for an entry, None if it has no data, or KeyError if unknown"""
+        entry = self.entries[name]
+        if entry.fresh(time.monotonic()):
+            return entry.response
+
+        with self.reload_lock:
+            now = time.monotonic()
+            retry = entry.attempted_at is None or now - entry.attempted_at >= RETRY_DELAY
+            if not entry.fresh(now) and retry:
+                entry.attempted_at = now
+                metrics.incr('api.reloads')
+                try:
+                    text = entry.loader()
+                    if text is not None:
+                        self.publish(name, text)
+                except Exception as e:
+                    # Keep serving the previous response rather than failing the request
+                    logger.error(f"Error refreshing API cache for /{name}: {str(e)}")
+                    metrics.incr('api.reload_errors')
+        return entry.response
+
+def make_handler(cache, history=None):
+    """Build the request handler class serving the cache (and /history if a loader is given)"""
+    class ReadHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, so polling clients reuse connections
+        disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+        def do_GET(self):
+            metrics.incr('api.requests')
+            url = urlsplit(self.path)
+            name = url.path.strip('/')
+
+            # History is computed per request; everything else comes from the cache
+            if name == 'history' and history is not None:
+                try:
+                    body = history(dict(parse_qsl(url.query))).encode()
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                except Exception as e:
+                    logger.error(f"Error reading history: {str(e)}")
+                    metrics.incr('api.history_errors')
+                    self.send_error(500)
+                    return
+                self.send_json(body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+                return
+
+            try:
+                response = cache.get(name)
+            except KeyError:
+                self.send_error(404)
+                return
+            if response is None:
+                self.send_error(503, "No data available yet")
+                return
+            self.send_json(*response)
+
+        def send_json(self, body, etag):
+            if_none_match = self.headers.get('If-None-Match', '')
+            if etag in if_none_match or if_none_match.strip() == '*':
+                metrics.incr('api.not_modified')
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"API request from {self.address_string()}: {format % args}")
+
+    return ReadHandler
+
+def forecast_loader(db, db_lock, query, cutoff):
+    """Build a loader reading one forecast or climatology table through the shared connection"""
+    def load():
+        now = datetime.now()
+        params = {
+            None: (),
+            'hour': (now.replace(minute=0, second=0, microsecond=0),),
+            'day': (now.date(),),
+            'now': (now,),
+            'year': (now.date() - timedelta(days=366),)
+        }[cutoff]
+        with db_lock:
+            connection = db.connect()
+            cursor = connection.cursor(dictionary=True)
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                connection.commit()  # End the read so the next one sees new rows
+            finally:
+                cursor.close()
+        return json.dumps(rows, default=json_default)
+    return load
+
+def history_loader(db, db_lock):
+    """Build the /history handler: ?column=&start=&end=&points=&method= (times in ISO 8601)"""
+    def load(params):
+        from station_history import DEFAULT_POINTS, LTTB, downsample_history
+
+        end = datetime.fromisoformat(params['end']) if params.get('end') else datetime.now()
+        start = (datetime.fromisoformat(params['start']) if params.get('start')
+                 else end - timedelta(days=DEFAULT_HISTORY_DAYS))
+        with db_lock:
+            result = downsample_history(db, params.get('column', 'AIR_TEMP').upper(), start, end,
+                                        points=int(params.get('points', DEFAULT_POINTS)),
+                                        method=params.get('method', LTTB))
+        return json.dumps(result, separators=(',', ':'))
+    return load
+
+def start_read_api(api_config, current_loader, db_factory, forecasts=True, climate=False):
+    """Start the local read API serving current conditions and forecasts.
+
+    Args:
+        api_config (dict): The 'api' config section
+        current_loader: Callable returning the current Snapshot (or None)
+        db_factory: Callable returning a Database for reading the forecast tables
+        forecasts (bool): Serve the forecast tables (False when forecasts are not configured)
+        climate (bool): Serve the climatology tables
+
+    Returns:
+        ReadCache to publish snapshots and invalidate forecasts, or None when disabled
+    """
+    if not api_config or not api_config.get('enabled', False):
+        return None
+
+    cache = ReadCache()
+
+    def load_current():
+        data = current_loader()
+        return data.to_json() if data is not None else None
+
+    cache.add('current', load_current, float(api_config.get('current_max_age', DEFAULT_CURRENT_MAX_AGE)))
+
+    # Forecast and climatology tables share one connection of their own
+    history_enabled = bool(api_config.get('history', True))
+    if forecasts or climate:
+        db = db_factory()
+        db_lock = threading.Lock()
+    if forecasts:
+        forecast_max_age = float(api_config.get('forecast_max_age', DEFAULT_FORECAST_MAX_AGE))
+        for name, (query, cutoff) in FORECAST_QUERIES.items():
+            cache.add(name, forecast_loader(db, db_lock, query, cutoff), forecast_max_age)
+    if climate:
+        climate_max_age = float(api_config.get('climate_max_age', DEFAULT_CLIMATE_MAX_AGE))
+        for name, (query, cutoff) in CLIMATE_QUERIES.items():
+            cache.add(name, forecast_loader(db, db_lock, query, cutoff), climate_max_age)
+
+    host = api_config.get('host', DEFAULT_HOST)
+    port = int(api_config.get('port', DEFAULT_PORT))
+
+    # History gets its own, so a long range being downsampled does not hold up the cache refreshes
+    history = history_loader(db_factory(), threading.Lock()) if history_enabled else None
+    server = ThreadingHTTPServer((host, port), make_handler(cache, history))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="api_server_thread", daemon=True).start()
+    endpoints = list(cache.entries) + (['history'] if history is not None else [])
+    logger.info(f"Read API listening on http://{host}:{port}/ ({', '.join(endpoints)})")
+
+    return cache
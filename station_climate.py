@@ -0,0 +1,394 @@
+#!/usr/bin/python3
+# Incrementally maintained climatology: daily and monthly aggregates of
+# dataentry plus all-time records, so station statistics never scan the table.
+# Run directly for the one-time parallel backfill of existing history:
+#   python station_climate.py --backfill [--workers 4] [--config weather_services_config.yaml]
+import argparse
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from station_metrics import metrics
+from storage import create_storage
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'climate' config section
+DEFAULT_INTERVAL = 60  # seconds between incremental updates
+DEFAULT_DEGREE_DAY_BASE = 15.5  # degrees C for heating/cooling degree days
+DEFAULT_WORKERS = 4  # backfill processes
+RAIN_DAY = 1.0  # mm of rain that makes a rain day
+
+# climate_daily column -> dataentry aggregate for the day
+DAILY_AGGREGATES = {
+    'readings': 'COUNT(*)',
+    'temp_min': 'MIN(AIR_TEMP)',
+    'temp_max': 'MAX(AIR_TEMP)',
+    'temp_mean': 'AVG(AIR_TEMP)',
+    'humidity_min': 'MIN(HUMIDITY)',
+    'humidity_max': 'MAX(HUMIDITY)',
+    'pressure_min': 'MIN(PRESSURE_SEA)',
+    'pressure_max': 'MAX(PRESSURE_SEA)',
+    'wind_mean': 'AVG(WIND_SPEED)',
+    'wind_max': 'MAX(WIND_SPEED)',
+    'gust_max': 'MAX(WIND_GUST)',
+    'rain_total': 'SUM(RAINFALL)',
+    'uv_max': 'MAX(UV_INDEX)',
+}
+DAILY_COLUMNS = ['day'] + list(DAILY_AGGREGATES) + ['heating_dd', 'cooling_dd']
+MONTHLY_COLUMNS = ['month', 'days', 'temp_min', 'temp_max', 'temp_mean', 'gust_max', 'rain_total', 'rain_days',
+                   'heating_dd', 'cooling_dd']
+
+# climate_records name -> (climate_daily column, 1 for the highest value or -1 for the lowest)
+RECORDS = {
+    'highest_temp': ('temp_max', 1),
+    'lowest_temp': ('temp_min', -1),
+    'highest_wind': ('wind_max', 1),
+    'highest_gust': ('gust_max', 1),
+    'wettest_day': ('rain_total', 1),
+    'highest_pressure': ('pressure_max', 1),
+    'lowest_pressure': ('pressure_min', -1),
+    'highest_uv': ('uv_max', 1),
+}
+
+# One station day: its bounds are station-local midnights converted to database time
+DAY_QUERY = f"SELECT {', '.join(DAILY_AGGREGATES.values())} FROM dataentry WHERE CREATED >= %s AND CREATED < %s"
+
+TABLES = [
+    f'''
+    CREATE TABLE IF NOT EXISTS climate_daily (
+        day DATE PRIMARY KEY,
+        readings INT NOT NULL,
+        {', '.join(f'{column} FLOAT' for column in DAILY_COLUMNS[2:])}
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS climate_monthly (
+        month DATE PRIMARY KEY,
+        days INT NOT NULL,
+        temp_min FLOAT,
+        temp_max FLOAT,
+        temp_mean FLOAT,
+        gust_max FLOAT,
+        rain_total FLOAT,
+        rain_days INT,
+        heating_dd FLOAT,
+        cooling_dd FLOAT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS climate_records (
+        record VARCHAR(32) PRIMARY KEY,
+        value FLOAT,
+        day DATE
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS climate_state (
+        id INT PRIMARY KEY,
+        last_id BIGINT NOT NULL
+    )
+    ''',
+]
+
+def as_date(value):
+    """Date of a DATE column (SQLite returns text)"""
+    if isinstance(value, datetime):
+        return value.date()
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def as_datetime(value):
+    """Datetime of a MIN/MAX(CREATED) result (SQLite returns text)"""
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+# Days end at midnight in the station timezone, like the daily rain total.
+# zones is (station_tz, db_tz) from the 'station' section; None is the system timezone.
+def station_day(created, zones):
+    """Station-local date of a naive database time"""
+    station_tz, db_tz = zones
+    moment = created.replace(tzinfo=db_tz) if db_tz is not None else created.astimezone()
+    return moment.astimezone(station_tz).date()
+
+def day_start(day, zones):
+    """Station-local midnight at the start of day, as a naive database time"""
+    station_tz, db_tz = zones
+    midnight = datetime.combine(day, datetime.min.time())
+    midnight = midnight.replace(tzinfo=station_tz) if station_tz is not None else midnight.astimezone()
+    return midnight.astimezone(db_tz).replace(tzinfo=None)
+
+def as_float(value):
+    return round(float(value), 2) if isinstance(value, (float, int, Decimal)) else None
+
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month(month):
+    return (month + timedelta(days=32)).replace(day=1)
+
+def aggregate_days(cursor, start, end, base=DEFAULT_DEGREE_DAY_BASE, zones=(None, None)):
+    """climate_daily rows (dicts) for the station days in [start, end), computed from dataentry"""
+    days = []
+    for offset in range((end - start).days):
+        day = start + timedelta(days=offset)
+        cursor.execute(DAY_QUERY, (day_start(day, zones), day_start(day + timedelta(days=1), zones)))
+        row = cursor.fetchone()
+        if not row[0]:
+            continue  # No readings that day
+        values = dict(zip(DAILY_AGGREGATES, row))
+        values = {column: as_float(value) for column, value in values.items()}
+        values['day'] = day
+        values['readings'] = int(row[0])
+
+        # Degree days from the mean of the day's extremes
+        if values['temp_min'] is not None and values['temp_max'] is not None:
+            mean = (values['temp_min'] + values['temp_max']) / 2
+            values['heating_dd'] = round(max(0.0, base - mean), 2)
+            values['cooling_dd'] = round(max(0.0, mean - base), 2)
+        else:
+            values['heating_dd'] = values['cooling_dd'] = None
+        days.append(values)
+    return days
+
+def summarize_month(month, days):
+    """climate_monthly row (dict) from the month's climate_daily rows"""
+    def values(column):
+        return [day[column] for day in days if day[column] is not None]
+
+    means = values('temp_mean')
+    rain = values('rain_total')
+    return {
+        'month': month,
+        'days': len(days),
+        'temp_min': min(values('temp_min'), default=None),
+        'temp_max': max(values('temp_max'), default=None),
+        'temp_mean': round(sum(means) / len(means), 2) if means else None,
+        'gust_max': max(values('gust_max'), default=None),
+        'rain_total': round(sum(rain), 2) if rain else None,
+        'rain_days': sum(1 for amount in rain if amount >= RAIN_DAY),
+        'heating_dd': round(sum(values('heating_dd')), 2),
+        'cooling_dd': round(sum(values('cooling_dd')), 2),
+    }
+
+def backfill_range(db_config, start, end, base, zones):
+    """Aggregate [start, end) over a connection of its own (runs in a backfill worker process)"""
+    connection = create_storage(db_config).connect()
+    cursor = connection.cursor()
+    try:
+        return aggregate_days(cursor, start, end, base, zones)
+    finally:
+        cursor.close()
+        connection.close()
+
+# Daily/monthly aggregates and records, kept up to date from new dataentry rows.
+# Each update recomputes the days its new rows fall on (usually just today) in
+# full, so writes are idempotent and a run interrupted part way is simply redone.
+class ClimateStore:
+    def __init__(self, storage, base=DEFAULT_DEGREE_DAY_BASE, zones=(None, None)):
+        self.storage = storage
+        self.base = base
+        self.zones = zones  # (station_tz, db_tz) setting the day boundary
+        self.last_id = None  # Highest dataentry ID included (None until loaded)
+        self.records = {}  # name -> (value, day)
+        self.listeners = []  # Callables run after each update that changed the tables
+        self.lock = threading.Lock()
+
+    def create_tables(self, cursor):
+        for ddl in TABLES:
+            self.storage.create_table(cursor, ddl)
+
+    def load_state(self, cursor):
+        cursor.execute("SELECT last_id FROM climate_state WHERE id = 1")
+        row = cursor.fetchone()
+        self.last_id = row[0] if row else 0
+        cursor.execute("SELECT record, value, day FROM climate_records")
+        self.records = {name: (value, as_date(day)) for name, value, day in cursor.fetchall()}
+
+    def write_days(self, cursor, days):
+        """Upsert climate_daily rows and refresh the monthly rows and records they touch"""
+        if not days:
+            return
+        cursor.executemany(self.storage.upsert('climate_daily', DAILY_COLUMNS, ('day',)),
+                           [[day[column] for column in DAILY_COLUMNS] for day in days])
+
+        # Months are re-summarized from their daily rows
+        months = sorted({month_start(day['day']) for day in days})
+        names = DAILY_COLUMNS[1:]
+        summaries = []
+        for month in months:
+            cursor.execute(f"SELECT {', '.join(names)} FROM climate_daily WHERE day >= %s AND day < %s",
+                           (month, next_month(month)))
+            summaries.append(summarize_month(month, [dict(zip(names, row)) for row in cursor.fetchall()]))
+        cursor.executemany(self.storage.upsert('climate_monthly', MONTHLY_COLUMNS, ('month',)),
+                           [[summary[column] for column in MONTHLY_COLUMNS] for summary in summaries])
+
+        # Records only ever move outwards
+        changed = []
+        for name, (column, sign) in RECORDS.items():
+            for day in days:
+                value = day[column]
+                current = self.records.get(name)
+                if value is not None and (current is None or current[0] is None or value * sign > current[0] * sign):
+                    self.records[name] = (value, day['day'])
+                    changed.append(name)
+        if changed:
+            cursor.executemany(self.storage.upsert('climate_records', ['record', 'value', 'day'], ('record',)),
+                               [(name,) + self.records[name] for name in dict.fromkeys(changed)])
+
+    def save_state(self, cursor, last_id):
+        cursor.execute(self.storage.upsert('climate_state', ['id', 'last_id'], ('id',)), (1, last_id))
+        self.last_id = last_id
+
+    def update(self, db):
+        """Fold dataentry rows added since the last update into the climatology. Returns the days refreshed."""
+        started = time.perf_counter()
+        with self.lock:
+            connection = db.connect()
+            cursor = connection.cursor(buffered=True)
+            try:
+                if self.last_id is None:
+                    self.load_state(cursor)
+
+                cursor.execute("SELECT MIN(CREATED), MAX(CREATED), MAX(ID) FROM dataentry WHERE ID > %s",
+                               (self.last_id,))
+                first, last, max_id = cursor.fetchone()
+                if max_id is None:
+                    connection.commit()  # End the read so the next one sees new rows
+                    return 0
+
+                # Recompute every station day the new rows fall on
+                days = aggregate_days(cursor, station_day(as_datetime(first), self.zones),
+                                      station_day(as_datetime(last), self.zones) + timedelta(days=1),
+                                      self.base, self.zones)
+                self.write_days(cursor, days)
+                self.save_state(cursor, max_id)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        metrics.incr('climate.updates')
+        metrics.observe('climate.update', time.perf_counter() - started)
+        for listener in self.listeners:
+            listener()
+        return len(days)
+
+    def run(self, db, interval):
+        """Update every interval seconds (the climate thread)"""
+        while True:
+            try:
+                days = self.update(db)
+                if days:
+                    logger.debug(f"Climatology updated ({days} day(s) refreshed)")
+            except Exception as e:
+                logger.error(f"Error updating climatology: {str(e)}")
+                metrics.incr('climate.errors')
+            time.sleep(interval)
+
+    def backfill(self, db_config, workers=DEFAULT_WORKERS):
+        """Rebuild the climatology from all of dataentry, split by date range across worker processes"""
+        started = time.perf_counter()
+        connection = self.storage.connect()
+        cursor = connection.cursor()
+        try:
+            self.create_tables(cursor)
+            cursor.execute("SELECT MIN(CREATED), MAX(CREATED), MAX(ID) FROM dataentry")
+            first, last, max_id = cursor.fetchone()
+            if max_id is None:
+                logger.info("dataentry is empty, nothing to backfill")
+                return 0
+
+            # Contiguous date ranges, a few per worker so uneven ranges still balance
+            first_day = station_day(as_datetime(first), self.zones)
+            end_day = station_day(as_datetime(last), self.zones) + timedelta(days=1)
+            total = (end_day - first_day).days
+            chunks = min(workers * 4, total)
+            bounds = sorted({first_day + timedelta(days=total * index // chunks) for index in range(chunks)} | {end_day})
+            ranges = list(zip(bounds[:-1], bounds[1:]))
+
+            logger.info(f"Backfilling climatology for {first_day} to {end_day - timedelta(days=1)} "
+                        f"in {len(ranges)} ranges over {workers} processes")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(backfill_range, [db_config] * len(ranges),
+                                       [start for start, _ in ranges], [end for _, end in ranges],
+                                       [self.base] * len(ranges), [self.zones] * len(ranges))
+                days = [day for result in results for day in result]
+
+            # Records are rebuilt from scratch; rows added meanwhile are picked up by the next update
+            cursor.execute("DELETE FROM climate_records")
+            self.records = {}
+            self.write_days(cursor, days)
+            self.save_state(cursor, max_id)
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+
+        logger.info(f"Backfilled {len(days)} days in {time.perf_counter() - started:.1f} s")
+        return len(days)
+
+def create_climate_store(climate_config, storage, zones=(None, None)):
+    """Create the ClimateStore from the 'climate' config section (None when disabled)"""
+    if not climate_config or not climate_config.get('enabled', False):
+        return None
+    return ClimateStore(storage, base=float(climate_config.get('degree_day_base', DEFAULT_DEGREE_DAY_BASE)),
+                        zones=zones)
+
+def start_climate(climate_config, db_factory, storage, zones=(None, None)):
+    """Create the climate tables and start the incremental updates.
+
+    Args:
+        climate_config (dict): The 'climate' config section
+        db_factory: Callable returning the Database the updates run on
+        storage: Storage backend of that database
+        zones: (station_tz, db_tz) of the rain totals, so days end at station midnight
+
+    Returns:
+        ClimateStore, or None when disabled
+    """
+    store = create_climate_store(climate_config, storage, zones)
+    if store is None:
+        return None
+
+    db = db_factory()
+    cursor = db.connect().cursor()
+    try:
+        store.create_tables(cursor)
+    finally:
+        cursor.close()
+
+    interval = float(climate_config.get('interval', DEFAULT_INTERVAL))
+    threading.Thread(target=store.run, args=(db, interval), name="climate_thread", daemon=True).start()
+    logger.info(f"Climatology updates every {interval:.0f} s")
+    return store
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Build the station climatology from existing readings")
+    parser.add_argument('--backfill', action='store_true', help="Rebuild the climatology from all of dataentry")
+    parser.add_argument('--config', default='weather_services_config.yaml', help="Path to the config file")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Backfill processes")
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.print_help()
+        sys.exit(1)
+
+    from weather_services import load_config
+    from rain_engine import create_rain_accumulator
+    config = load_config(args.config)
+    climate_config = config.get('climate') or {}
+    rain = create_rain_accumulator(config.get('station'))
+    store = ClimateStore(create_storage(config['database']),
+                         base=float(climate_config.get('degree_day_base', DEFAULT_DEGREE_DAY_BASE)),
+                         zones=(rain.station_tz, rain.db_tz))
+    store.backfill(config['database'], workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+import logging
+
+import numpy as np
+
+from station_metrics import metrics
+from sensor_ingest import READING_COLUMNS
+
+logger = logging.getLogger("WeatherStation")
+
+# Downsampling methods
+LTTB = 'lttb'  # Largest-Triangle-Three-Buckets: keeps the visual shape, one point per bucket
+MINMAX = 'minmax'  # Lowest and highest reading per bucket: keeps every extreme (e.g. gusts)
+METHODS = (LTTB, MINMAX)
+
+DEFAULT_POINTS = 1000
+MAX_POINTS = 10000
+CHUNK_SIZE = 10000  # rows fetched from the cursor at a time
+
+# dataentry columns that can be charted
+HISTORY_COLUMNS = tuple(column for column in READING_COLUMNS if column != 'WIND_CARDINAL')
+
+EMPTY = np.empty(0)
+
+def stream_history(cursor, storage, column, start, end, chunk_size=CHUNK_SIZE):
+    """Yield (offsets, values) float arrays for the rows in [start, end), oldest first.
+
+    Offsets are wall-clock seconds since start. Rows are fetched chunk_size at a
+    time from an unbuffered cursor, so memory does not grow with the range.
+    """
+    cursor.execute(
+        f"SELECT {storage.seconds_between('%s', 'CREATED')}, {column} FROM dataentry "
+        f"WHERE CREATED >= %s AND CREATED < %s AND {column} IS NOT NULL ORDER BY CREATED;",
+        (start, start, end)
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        chunk = np.array(rows, dtype=float)
+        yield chunk[:, 0], chunk[:, 1]
+
+def segments(ids):
+    """Start and end (exclusive) indices of the runs of equal bucket ids"""
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    return starts, np.r_[starts[1:], len(ids)]
+
+# Streaming min/max-per-bucket downsampling. Only the rows of the last,
+# possibly incomplete bucket are carried from one chunk to the next.
+class MinMaxDownsampler:
+    def __init__(self, buckets, span):
+        self.buckets = buckets
+        self.width = span / buckets
+        self.carry = (EMPTY, EMPTY)
+        self.output = []
+
+    def feed(self, offsets, values):
+        offsets = np.concatenate((self.carry[0], offsets))
+        values = np.concatenate((self.carry[1], values))
+        ids = np.minimum((offsets // self.width).astype(np.int64), self.buckets - 1)
+        done = ids < ids[-1]
+        self._reduce(offsets[done], values[done], ids[done])
+        self.carry = (offsets[~done], values[~done])
+
+    def _reduce(self, offsets, values, ids):
+        if not len(ids):
+            return
+        # Sorted by bucket, then value: each bucket's first row is its minimum, its last the maximum
+        order = np.lexsort((values, ids))
+        starts, ends = segments(ids[order])
+        picked = np.unique(np.concatenate((order[starts], order[ends - 1])))  # time order, min == max once
+        self.output.append((offsets[picked], values[picked]))
+
+    def finish(self):
+        offsets, values = self.carry
+        if len(offsets):
+            self._reduce(offsets, values, np.minimum((offsets // self.width).astype(np.int64), self.buckets - 1))
+        if not self.output:
+            return EMPTY, EMPTY
+        return np.concatenate([chunk[0] for chunk in self.output]), np.concatenate([chunk[1] for chunk in self.output])
+
+# Streaming Largest-Triangle-Three-Buckets over time buckets. The point picked in
+# a bucket depends on the previous pick and the mean of the next non-empty bucket,
+# so the rows of the last two buckets are carried between chunks.
+class LTTBDownsampler:
+    def __init__(self, buckets, span):
+        self.buckets = buckets
+        self.width = span / buckets
+        self.pending = (EMPTY, EMPTY)
+        self.previous = None  # last picked (offset, value)
+        self.output_offsets = []
+        self.output_values = []
+
+    def _pick(self, offset, value):
+        self.previous = (offset, value)
+        self.output_offsets.append(offset)
+        self.output_values.append(value)
+
+    def feed(self, offsets, values):
+        # The first row is always kept
+        if self.previous is None:
+            self._pick(offsets[0], values[0])
+            offsets, values = offsets[1:], values[1:]
+
+        offsets = np.concatenate((self.pending[0], offsets))
+        values = np.concatenate((self.pending[1], values))
+        if not len(offsets):
+            return
+        ids = np.minimum((offsets // self.width).astype(np.int64), self.buckets - 1)
+        starts, ends = segments(ids)
+
+        # A bucket is complete once a later one has started; each pick needs the next complete bucket
+        ready = len(starts) - 2
+        if ready > 0:
+            self._select(offsets, values, starts[:ready + 1], ends[:ready + 1], ready)
+        keep = starts[max(ready, 0)]
+        self.pending = (offsets[keep:], values[keep:])
+
+    def _select(self, offsets, values, starts, ends, count, last=None):
+        """Pick one point in each of the first count buckets (last: the point after the final bucket)"""
+        lengths = ends - starts
+        mean_offsets = np.add.reduceat(offsets[:ends[-1]], starts) / lengths
+        mean_values = np.add.reduceat(values[:ends[-1]], starts) / lengths
+        for index in range(count):
+            start, end = starts[index], ends[index]
+            if index + 1 < len(starts):
+                next_offset, next_value = mean_offsets[index + 1], mean_values[index + 1]
+            else:
+                next_offset, next_value = last
+            previous_offset, previous_value = self.previous
+
+            # Twice the area of the triangle (previous pick, candidate, next bucket mean)
+            areas = np.abs((previous_offset - next_offset) * (values[start:end] - previous_value) -
+                           (previous_offset - offsets[start:end]) * (next_value - previous_value))
+            chosen = start + int(np.argmax(areas))
+            self._pick(offsets[chosen], values[chosen])
+
+    def finish(self):
+        offsets, values = self.pending
+        if len(offsets):
+            # The last row is always kept; the buckets before it pick against it
+            last = (offsets[-1], values[-1])
+            offsets, values = offsets[:-1], values[:-1]
+            if len(offsets):
+                starts, ends = segments(np.minimum((offsets // self.width).astype(np.int64), self.buckets - 1))
+                self._select(offsets, values, starts, ends, len(starts), last=last)
+            self._pick(*last)
+        return np.array(self.output_offsets), np.array(self.output_values)
+
+def downsample_history(db, column, start, end, points=DEFAULT_POINTS, method=LTTB, chunk_size=CHUNK_SIZE):
+    """Read a dataentry column over [start, end) and downsample it for charting.
+
+    Args:
+        db: Database to read from
+        column (str): One of HISTORY_COLUMNS
+        start, end (datetime): Range in database time
+        points (int): Target number of points (at most MAX_POINTS)
+        method (str): LTTB or MINMAX
+
+    Returns:
+        dict with the column, method, range and the compact 'offsets' (seconds
+        since start) and 'values' arrays as lists
+    """
+    if column not in HISTORY_COLUMNS:
+        raise ValueError(f"Unknown column '{column}' (expected one of: {', '.join(HISTORY_COLUMNS)})")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}' (expected one of: {', '.join(METHODS)})")
+    if end <= start:
+        raise ValueError("end must be after start")
+
+    points = max(3, min(int(points), MAX_POINTS))
+    span = (end - start).total_seconds()
+    if method == LTTB:
+        sampler = LTTBDownsampler(points - 2, span)  # plus the first and last rows
+    else:
+        sampler = MinMaxDownsampler(points // 2, span)
+
+    rows = 0
+    connection = db.connect()
+    cursor = connection.cursor(buffered=False)
+    try:
+        for offsets, values in stream_history(cursor, db.storage, column, start, end, chunk_size):
+            sampler.feed(offsets, values)
+            rows += len(offsets)
+    finally:
+        cursor.close()
+    offsets, values = sampler.finish()
+
+    metrics.incr('history.queries')
+    metrics.incr('history.rows', rows)
+    logger.debug(f"Downsampled {rows} {column} rows to {len(offsets)} points ({method})")
+
+    return {
+        'column': column,
+        'method': method,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'rows': rows,
+        'offsets': offsets.astype(np.int64).tolist(),
+        'values': np.round(values, 2).tolist()
+    }
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+import threading
+import time
+from collections import deque
+
+# Recent samples kept per timing for percentile estimates
+SAMPLE_SIZE = 500
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+# Thread-safe in-process metrics shared by the upload and forecast services
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+        self.samples = {}
+        self.started = time.time()
+
+    def incr(self, name, value=1):
+        """Increment a counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Set a gauge to its current value"""
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        """Record a duration in seconds"""
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+                self.samples[name] = deque(maxlen=SAMPLE_SIZE)
+            timing['count'] += 1
+            timing['total'] += seconds
+            timing['max'] = max(timing['max'], seconds)
+            self.samples[name].append(seconds)
+
+    def percentile(self, name, pct):
+        """Return the pct-th percentile of recent samples, or None if there are none"""
+        with self.lock:
+            samples = sorted(self.samples.get(name, ()))
+        return _percentile(samples, pct) if samples else None
+
+    def sample_count(self, name):
+        """Number of recent samples available for percentiles"""
+        with self.lock:
+            return len(self.samples.get(name, ()))
+
+    def snapshot(self):
+        """Return a point-in-time copy of all metrics"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            timings = {name: dict(timing) for name, timing in self.timings.items()}
+            samples = {name: sorted(values) for name, values in self.samples.items()}
+
+        # Add recent-sample percentiles to each timing
+        for name, values in samples.items():
+            if values:
+                for pct in (50, 95, 99):
+                    timings[name][f"p{pct}"] = _percentile(values, pct)
+
+        return {
+            'uptime': time.time() - self.started,
+            'counters': counters,
+            'gauges': gauges,
+            'timings': timings
+        }
+
+    def summary(self):
+        """Format counters, gauges and p95 timings as a single log line"""
+        return format_summary(self.snapshot())
+
+def format_summary(snap):
+    """Format a snapshot's counters, gauges and p95 timings as a single log line"""
+    parts = [f"{name}={value}" for name, value in sorted(snap['counters'].items())]
+    parts += [f"{name}={value}" for name, value in sorted(snap['gauges'].items())]
+    parts += [f"{name}.p95={timing['p95']:.3f}s" for name, timing in sorted(snap['timings'].items()) if 'p95' in timing]
+    return ', '.join(parts) if parts else "no metrics recorded"
+
+# Global metrics registry
+metrics = Metrics()
@@ -0,0 +1,226 @@
+#!/usr/bin/python3
+import threading
+import logging
+
+import numpy as np
+
+from station_metrics import metrics
+from derived_metrics import derived_values
+
+logger = logging.getLogger("WeatherStation")
+
+# QC actions
+SUPPRESS = 'suppress'  # Replace flagged values before encoding
+FLAG = 'flag'  # Only log and count flagged values
+
+# Default limits per dataentry column:
+# (min, max, max change per minute, minutes unchanged before the sensor is considered stuck)
+DEFAULT_LIMITS = {
+    'AIR_TEMP': (-60.0, 60.0, 3.0, None),
+    'FEELS_LIKE': (-80.0, 70.0, 5.0, None),
+    'DEW_POINT': (-70.0, 40.0, 4.0, None),
+    'HUMIDITY': (1.0, 100.0, 20.0, None),
+    'PRESSURE_SEA': (870.0, 1085.0, 1.0, None),
+    'WIND_SPEED': (0.0, 250.0, 60.0, None),
+    'WIND_GUST': (0.0, 300.0, 80.0, None),
+    'WIND_DIRECTION': (0.0, 360.0, None, None),
+    'UV_INDEX': (0.0, 20.0, None, None),
+    'RAINFALL': (0.0, 50.0, None, None),
+}
+
+CHECKS = ('range', 'step', 'persistence')
+MIN_WINDOW = 60  # minutes of recent rows checked on every snapshot
+MIN_PERSISTENCE_ROWS = 5  # unchanged rows needed before a sensor counts as stuck
+
+# Snapshot fields taken from the latest reading (required unless a default is given)
+LATEST_FIELDS = {
+    'temperature': ('AIR_TEMP', None),
+    'feels_like': ('FEELS_LIKE', None),
+    'pressure_sea': ('PRESSURE_SEA', None),
+    'humidity': ('HUMIDITY', None),
+    'dew_point': ('DEW_POINT', None),
+    'uv_index': ('UV_INDEX', 0.0),
+    'wind_speed': ('WIND_SPEED', 0.0),
+    'wind_dir': ('WIND_DIRECTION', 0.0),
+}
+
+# Windowed snapshot fields: (column, minutes, aggregate)
+WINDOW_FIELDS = {
+    'wind_dir_2min': ('WIND_DIRECTION', 2, 'mean'),
+    'wind_speed_2min': ('WIND_SPEED', 2, 'mean'),
+    'wind_speed_5min': ('WIND_SPEED', 5, 'mean'),
+    'wind_gust_5min': ('WIND_GUST', 5, 'max'),
+    'wind_dir_5min': ('WIND_DIRECTION', 5, 'mean'),
+    'wind_speed_10min': ('WIND_SPEED', 10, 'mean'),
+    'wind_gust_10min': ('WIND_GUST', 10, 'max'),
+    'wind_dir_10min': ('WIND_DIRECTION', 10, 'mean'),
+    'wind_speed_hi': ('WIND_SPEED', 10, 'max'),
+}
+
+# Snapshot fields the derived values are computed from
+DERIVED_INPUTS = ('temperature', 'humidity', 'wind_speed_10min')
+
+def window_arrays(rows):
+    """Convert (CREATED, value, ...) rows into a datetime64 array and a float matrix (NULL -> NaN)"""
+    times = np.array([row[0] for row in rows], dtype='datetime64[us]')
+    values = np.array([[np.nan if value is None else float(value) for value in row[1:]] for row in rows],
+                      dtype=float)
+    return times, values
+
+# Vectorized range, step and persistence checks over the recent dataentry window
+class QualityGate:
+    def __init__(self, limits, action=SUPPRESS):
+        self.columns = list(limits)
+        self.action = action
+        self.lock = threading.Lock()
+        self.counted_until = None  # newest row already counted in the qc.* metrics
+
+        def column_limits(index):
+            return np.array([np.nan if limits[column][index] is None else float(limits[column][index])
+                             for column in self.columns])
+
+        self.minimum = column_limits(0)
+        self.maximum = column_limits(1)
+        self.max_step = column_limits(2)
+        self.persistence = column_limits(3)
+
+        # Fetch enough history for the longest persistence check
+        longest = np.nanmax(self.persistence) if not np.isnan(self.persistence).all() else 0
+        self.window = int(max(MIN_WINDOW, longest + 5))
+
+    def check(self, times, values):
+        """Return {check: bool matrix} flagging values (rows x columns) that fail each check"""
+        rows = len(times)
+        minutes = (times - times[0]) / np.timedelta64(1, 'm')
+
+        with np.errstate(invalid='ignore'):
+            range_bad = (values < self.minimum) | (values > self.maximum)
+
+            # Steps are measured between in-range values only
+            clean = np.where(range_bad, np.nan, values)
+            step_bad = np.zeros_like(range_bad)
+            if rows > 1:
+                change = np.diff(clean, axis=0)
+                elapsed = np.maximum(np.diff(minutes), 1.0)[:, None]
+                jump = np.abs(change) / elapsed > self.max_step
+                # A spike jumps in from the previous reading and straight back out again
+                # The newest reading has no successor yet, so a real step (a front, a squall)
+                # cannot be told from a spike; it is only range-checked until the next row arrives
+                step_bad[1:-1] = jump[:-1] & jump[1:] & (np.sign(change[:-1]) != np.sign(change[1:]))
+
+            # Length of the trailing run of identical values per column
+            changed = np.ones_like(range_bad)
+            changed[1:] = values[1:] != values[:-1]
+            last_change = rows - 1 - np.argmax(changed[::-1], axis=0)
+            run_minutes = minutes[-1] - minutes[last_change]
+            stuck = (run_minutes >= self.persistence) & (rows - last_change >= MIN_PERSISTENCE_ROWS)
+            persistence_bad = (np.arange(rows)[:, None] >= last_change) & stuck
+
+        return {'range': range_bad, 'step': step_bad, 'persistence': persistence_bad}
+
+    def apply(self, snapshot, times, values, ref):
+        """Run the checks and return the snapshot with flagged values suppressed.
+
+        ref is the snapshot time as a naive database time, like the row times.
+        A required latest-reading field with no valid value in the window is
+        sent unchanged and counted (qc.<column>.unverified).
+        """
+        if len(times) == 0:
+            return snapshot
+
+        flags = self.check(times, values)
+        bad = flags['range'] | flags['step'] | flags['persistence']
+        self._count(times, values, flags)
+
+        if self.action != SUPPRESS or not bad.any():
+            return snapshot
+
+        index = {column: position for position, column in enumerate(self.columns)}
+        age = (np.datetime64(ref, 'us') - times) / np.timedelta64(1, 'm')
+        changes = {}
+
+        # Latest-reading fields fall back to the newest valid reading in the window
+        for field, (column, default) in LATEST_FIELDS.items():
+            j = index.get(column)
+            if j is None or not bad[-1, j]:
+                continue
+            good = ~bad[:, j] & ~np.isnan(values[:, j])
+            if good.any():
+                changes[field] = float(values[good, j][-1])
+            elif default is not None:
+                changes[field] = default
+            else:
+                # One bad sensor must not stop every upload, so the value goes out unverified
+                logger.warning(f"No valid {field} reading in the last {self.window} minutes, sending it unchanged")
+                metrics.incr(f"qc.{column.lower()}.unverified")
+
+        # Windowed aggregates are recomputed from the valid readings only
+        for field, (column, window, aggregate) in WINDOW_FIELDS.items():
+            j = index.get(column)
+            if j is None:
+                continue
+            in_window = age <= window
+            if not bad[in_window, j].any():
+                continue
+            good = values[in_window & ~bad[:, j] & ~np.isnan(values[:, j]), j]
+            if len(good) == 0:
+                changes[field] = 0.0
+            else:
+                changes[field] = float(good.mean() if aggregate == 'mean' else good.max())
+
+        # The strongest remaining gust sets the gust direction
+        if 'wind_gust_10min' in changes and 'WIND_GUST' in index and 'WIND_DIRECTION' in index:
+            gust, direction = values[:, index['WIND_GUST']], values[:, index['WIND_DIRECTION']]
+            valid = (age <= 10) & ~bad[:, index['WIND_GUST']] & ~np.isnan(gust)
+            changes['wind_gust_dir'] = float(direction[valid][np.argmax(gust[valid])]) if valid.any() else 0.0
+
+        if not changes:
+            return snapshot
+
+        metrics.incr('qc.snapshots_corrected')
+        snapshot = snapshot._replace(**changes)
+        if any(field in changes for field in DERIVED_INPUTS):
+            heat_index, wind_chill = derived_values(*(getattr(snapshot, field) for field in DERIVED_INPUTS))
+            snapshot = snapshot._replace(heat_index=heat_index, wind_chill=wind_chill)
+        return snapshot
+
+    def apply_rows(self, snapshot, rows, ref):
+        """apply() for (CREATED, value, ...) rows in self.columns order"""
+        return self.apply(snapshot, *window_arrays(rows), ref=ref)
+
+    def _count(self, times, values, flags):
+        """Count and log each flagged value once, the first time its row is checked"""
+        with self.lock:
+            new = times > self.counted_until if self.counted_until is not None else np.ones(len(times), dtype=bool)
+            self.counted_until = times[-1] if self.counted_until is None else max(self.counted_until, times[-1])
+
+        for check in CHECKS:
+            mask = flags[check] & new[:, None]
+            if not mask.any():
+                continue
+            for j in np.flatnonzero(mask.any(axis=0)):
+                column = self.columns[j]
+                count = int(mask[:, j].sum())
+                metrics.incr(f"qc.{column.lower()}.{check}", count)
+                logger.warning(f"QC {check} check rejected {count} {column} value(s), "
+                               f"latest {values[mask[:, j], j][-1]}")
+
+def create_quality_gate(qc_config):
+    """Create the QualityGate from the 'qc' config section, or None when disabled"""
+    qc_config = qc_config or {}
+    if not qc_config.get('enabled', True):
+        return None
+
+    limits = dict(DEFAULT_LIMITS)
+    for column, overrides in (qc_config.get('limits') or {}).items():
+        column = column.upper()
+        minimum, maximum, max_step, persistence = limits.get(column, (None, None, None, None))
+        overrides = overrides or {}
+        limits[column] = (
+            overrides.get('min', minimum),
+            overrides.get('max', maximum),
+            overrides.get('step', max_step),
+            overrides.get('persistence', persistence)
+        )
+
+    return QualityGate(limits, action=qc_config.get('action', SUPPRESS))
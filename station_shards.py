@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the sharded mode ('supervisor.shards' greater than 1)
+DEFAULT_REPLICAS = 64  # points per shard on the hash ring
+DEFAULT_SHARD_POOL_SIZE = 2  # database connections per worker process
+REPORT_INTERVAL = 15  # seconds between metrics reports from each worker
+RESTART_DELAY = 10  # minimum seconds between restarts of one shard
+
+def ring_hash(key):
+    """Stable 64-bit hash (Python's hash() differs between processes)"""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+# Consistent hashing of upload keys onto shards: changing the number of shards
+# only moves the keys between the affected points of the ring
+class HashRing:
+    def __init__(self, shards, replicas=DEFAULT_REPLICAS):
+        points = sorted((ring_hash(f"shard-{shard}-{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.shards = [shard for _, shard in points]
+
+    def shard_for(self, key):
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+        return self.shards[index]
+
+def merge_snapshots(snapshots):
+    """Combine metrics snapshots: counters and timing totals add up, later gauges win"""
+    merged = {'uptime': 0.0, 'counters': {}, 'gauges': {}, 'timings': {}}
+    for snapshot in snapshots:
+        merged['uptime'] = max(merged['uptime'], snapshot['uptime'])
+        for name, value in snapshot['counters'].items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + value
+        merged['gauges'].update(snapshot['gauges'])
+        for name, timing in snapshot['timings'].items():
+            total = merged['timings'].setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            total['count'] += timing['count']
+            total['total'] += timing['total']
+            total['max'] = max(total['max'], timing['max'])
+            # Percentiles cannot be combined; the worst shard's is reported
+            for pct in ('p50', 'p95', 'p99'):
+                if pct in timing:
+                    total[pct] = max(total.get(pct, 0.0), timing[pct])
+    return merged
+
+def run_shard(config_path, shard, services, reports, workers, drain_timeout):
+    """Worker process: run the upload jobs of one shard until SIGTERM"""
+    # Imported here so the parent's modules are not needed to unpickle the target
+    import weather_services
+    from weather_supervisor import SharedScheduler, create_connection_pool, upload_job
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent handles Ctrl+C and stops the workers
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    weather_services.configure_logging()
+    app = weather_services.get_app(config_path)
+    app.set_connection_pool(create_connection_pool(app.db_config, DEFAULT_SHARD_POOL_SIZE))
+
+    scheduler = SharedScheduler(workers)
+    for service_name in services:
+        scheduler.add_job(service_name, int(app.services[service_name].get('interval', 300)), upload_job(service_name))
+    threading.Thread(target=scheduler.run, name="scheduler", daemon=True).start()
+    logger.info(f"Shard {shard} running {', '.join(services)}")
+
+    # Every worker has breakers for all services; only report the ones it runs
+    foreign = {f"breaker.{name}.state" for name in app.breakers if name not in services}
+    while True:
+        stopping = stop_event.wait(REPORT_INTERVAL)
+        snapshot = metrics.snapshot()
+        snapshot['gauges'] = {name: value for name, value in snapshot['gauges'].items() if name not in foreign}
+        reports.put((shard, snapshot))
+        if stopping:
+            break
+
+    scheduler.stop(drain_timeout)
+    logger.info(f"Shard {shard} stopped")
+
+# Runs the upload services in worker processes, each with its own database
+# pool, HTTP sessions and scheduler, so encoding and logging are not bound by
+# one interpreter lock. Services are assigned to shards by consistent hashing.
+class ShardManager:
+    def __init__(self, config_path, shards, workers, drain_timeout, replicas=DEFAULT_REPLICAS):
+        self.config_path = config_path
+        self.ring = HashRing(shards, replicas)
+        self.shards = shards
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.context = multiprocessing.get_context('spawn')  # The parent already runs threads
+        self.reports = self.context.Queue()
+        self.processes = {}  # shard -> Process
+        self.services = {}  # shard -> [service names]
+        self.started_at = {}  # shard -> last start time
+        self.snapshots = {}  # shard -> latest metrics snapshot
+
+    def assign(self, service_names):
+        """Group the enabled services by shard"""
+        assignment = {}
+        for service_name in service_names:
+            assignment.setdefault(self.ring.shard_for(service_name), []).append(service_name)
+        return assignment
+
+    def start(self, shard):
+        process = self.context.Process(
+            target=run_shard,
+            args=(self.config_path, shard, self.services[shard], self.reports, self.workers, self.drain_timeout),
+            name=f"shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        self.processes[shard] = process
+        self.started_at[shard] = time.time()
+        logger.info(f"Started shard {shard} (pid {process.pid}): {', '.join(self.services[shard])}")
+
+    def stop_shard(self, shard, timeout):
+        process = self.processes.pop(shard, None)
+        if process is None:
+            return
+        process.terminate()  # SIGTERM: the worker drains its in-flight uploads
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"Shard {shard} did not stop within {timeout}s, killing it")
+            process.kill()
+            process.join()
+        self.snapshots.pop(shard, None)
+
+    def apply(self, service_names):
+        """Start, stop or restart shards so they run exactly service_names"""
+        assignment = self.assign(service_names)
+        for shard in sorted(set(self.services) | set(assignment)):
+            services = assignment.get(shard, [])
+            if services == self.services.get(shard, []) and shard in self.processes:
+                continue
+            self.stop_shard(shard, self.drain_timeout)
+            if services:
+                self.services[shard] = services
+                self.start(shard)
+            else:
+                self.services.pop(shard, None)
+        metrics.set_gauge('shards.running', len(self.processes))
+
+    def restart(self, service_names):
+        """Restart the shards running these services, so they re-read the config"""
+        for shard in {self.ring.shard_for(name) for name in service_names} & set(self.processes):
+            self.stop_shard(shard, self.drain_timeout)
+            self.start(shard)
+
+    def check(self):
+        """Collect worker reports and restart workers that have died"""
+        while True:
+            try:
+                shard, snapshot = self.reports.get_nowait()
+            except queue.Empty:
+                break
+            if shard in self.processes:
+                self.snapshots[shard] = snapshot
+
+        for shard, process in list(self.processes.items()):
+            if process.is_alive() or time.time() - self.started_at[shard] < RESTART_DELAY:
+                continue
+            logger.warning(f"Shard {shard} exited with code {process.exitcode}. Restarting...")
+            metrics.incr('shards.restarts')
+            self.start(shard)
+        metrics.set_gauge('shards.running', sum(process.is_alive() for process in self.processes.values()))
+
+    def snapshot(self):
+        """The parent's metrics combined with the latest report of every shard"""
+        return merge_snapshots([metrics.snapshot()] + [self.snapshots[shard] for shard in sorted(self.snapshots)])
+
+    def stop(self):
+        for shard in list(self.processes):
+            self.processes[shard].terminate()
+        for shard in list(self.processes):
+            self.stop_shard(shard, self.drain_timeout)
+
+def start_shards(config_path, shards, workers, drain_timeout, service_names):
+    """Start one worker process per non-empty shard and return the ShardManager"""
+    manager = ShardManager(config_path, shards, workers, drain_timeout)
+    manager.apply(service_names)
+    logger.info(f"Sharded uploads: {len(manager.processes)} worker process(es) for {shards} shard(s)")
+    return manager
@@ -0,0 +1,254 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import logging
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional 'trace' config section
+DEFAULT_BUFFER_SIZE = 20000  # most recent spans kept for dumps
+DEFAULT_TRACE_DIR = 'traces'
+DEFAULT_PROFILE_INTERVAL = 0.01  # seconds between profiler samples
+
+# A finished span is recorded as a Chrome trace "complete" event
+class Span:
+    __slots__ = ('tracer', 'name', 'args', 'root', 'start')
+
+    def __init__(self, tracer, name, args, root=False):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.root = root
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.record(self, time.perf_counter_ns(), exc_type)
+        return False
+
+# Returned by span() while tracing is off, so instrumented code costs almost nothing
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_SPAN = NullSpan()
+
+# Span recorder for the upload pipeline. Spans nest per thread by time, which
+# is how Chrome trace viewers (chrome://tracing, Perfetto) display them.
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=DEFAULT_BUFFER_SIZE)
+        self.trace_dir = DEFAULT_TRACE_DIR
+        self.slow_cycle = None  # seconds; slower root spans are dumped automatically
+        self.origin = time.perf_counter_ns()
+        self.started = datetime.now()
+
+    def span(self, name, **args):
+        """Time a block: with tracer.span('query.snapshot'): ..."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def cycle(self, name, **args):
+        """Like span(), for a whole upload cycle (dumped when slower than slow_cycle)"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args, root=True)
+
+    def record(self, span, end, exc_type=None):
+        duration = end - span.start
+        event = {
+            'name': span.name,
+            'cat': span.name.split('.')[0],
+            'ph': 'X',
+            'ts': (span.start - self.origin) / 1000,
+            'dur': duration / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': dict(span.args, error=exc_type.__name__) if exc_type else span.args
+        }
+        with self.lock:
+            self.events.append(event)
+        metrics.observe(f"span.{span.name}", duration / 1e9)
+
+        if span.root and self.slow_cycle is not None and duration / 1e9 > self.slow_cycle:
+            logger.warning(f"Slow cycle {span.name} took {duration / 1e9:.1f}s, writing trace")
+            metrics.incr('trace.slow_cycles')
+            # Write the file off the upload thread, which is already late
+            threading.Thread(target=self.dump_quietly, args=(span.name, event['ts']),
+                             name="trace_dump_thread", daemon=True).start()
+
+    def chrome_trace(self, since=None):
+        """Return the buffered spans (optionally only those ending after since, in µs) as Chrome trace JSON"""
+        with self.lock:
+            events = [event for event in self.events if since is None or event['ts'] + event['dur'] >= since]
+
+        # Name each thread so the viewer shows e.g. "wunderground_thread" instead of an ID
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                     'args': {'name': names.get(tid, str(tid))}}
+                    for tid in {event['tid'] for event in events}]
+
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'started': self.started.isoformat()}
+        }
+
+    def dump(self, reason='manual', since=None):
+        """Write the buffered spans to trace_dir and return the file path"""
+        os.makedirs(self.trace_dir, exist_ok=True)
+        path = os.path.join(self.trace_dir, f"trace-{reason}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.json")
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(since), trace_file)
+        logger.info(f"Wrote trace to {path}")
+        return path
+
+    def dump_quietly(self, reason, since=None):
+        """dump() for background threads: errors are logged instead of raised"""
+        try:
+            self.dump(reason, since)
+        except Exception as e:
+            logger.error(f"Error writing trace: {str(e)}")
+
+# Periodically samples every thread's stack; written in the "folded" format
+# read by flamegraph.pl and speedscope
+class SamplingProfiler:
+    def __init__(self, interval=DEFAULT_PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="profiler_thread", daemon=True)
+        self.thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.0f} ms interval)")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        logger.info("Sampling profiler stopped")
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                samples.append(';'.join([names.get(ident, str(ident))] + stack[::-1]))
+            with self.lock:
+                self.stacks.update(samples)
+
+    def write(self, path):
+        """Write and clear the collected samples"""
+        with self.lock:
+            stacks, self.stacks = self.stacks, Counter()
+        with open(path, 'w') as profile_file:
+            for stack, count in stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        logger.info(f"Wrote {sum(stacks.values())} profiler samples to {path}")
+
+# Global tracer (disabled until start_tracing() enables it)
+tracer = Tracer()
+
+@contextmanager
+def traced_lock(lock, name):
+    """Acquire lock inside a span measuring the wait, then hold it for the block"""
+    with tracer.span(name):
+        lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+def start_tracing(trace_config):
+    """Enable span tracing and the optional sampling profiler from the 'trace' config section.
+
+    SIGUSR1 writes the buffered spans (and profiler samples) to trace_dir;
+    SIGUSR2 starts or stops the sampling profiler.
+
+    Returns:
+        SamplingProfiler, or None when tracing is disabled
+    """
+    trace_config = trace_config or {}
+    if not trace_config.get('enabled', False):
+        return None
+
+    tracer.trace_dir = trace_config.get('trace_dir', DEFAULT_TRACE_DIR)
+    tracer.events = deque(maxlen=int(trace_config.get('buffer_size', DEFAULT_BUFFER_SIZE)))
+    slow_cycle = trace_config.get('slow_cycle')
+    tracer.slow_cycle = float(slow_cycle) if slow_cycle is not None else None
+    tracer.enabled = True
+
+    profiler = SamplingProfiler(float(trace_config.get('profile_interval', DEFAULT_PROFILE_INTERVAL)))
+    if trace_config.get('profile', False):
+        profiler.start()
+
+    # Signal handlers only set flags; dumping runs on its own thread
+    dump_requested = threading.Event()
+    toggle_requested = threading.Event()
+
+    def handle_requests():
+        while True:
+            dump_requested.wait()
+            dump_requested.clear()
+            try:
+                if toggle_requested.is_set():
+                    toggle_requested.clear()
+                    if profiler.running:
+                        profiler.stop()
+                    else:
+                        profiler.start()
+                        continue
+                path = tracer.dump('signal')
+                if profiler.stacks:
+                    profiler.write(path.replace('.json', '.folded'))
+            except Exception as e:
+                logger.error(f"Error writing trace: {str(e)}")
+
+    def request_dump(signum, frame):
+        dump_requested.set()
+
+    def request_toggle(signum, frame):
+        toggle_requested.set()
+        dump_requested.set()
+
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, request_dump)
+        signal.signal(signal.SIGUSR2, request_toggle)
+
+    threading.Thread(target=handle_requests, name="trace_thread", daemon=True).start()
+    logger.info(f"Tracing enabled (dumps in {tracer.trace_dir}, profiler {'on' if profiler.running else 'off'})")
+    return profiler
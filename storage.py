@@ -0,0 +1,390 @@
+#!/usr/bin/python3
+# Storage backends for the station database.
+# Both backends hand out DB-API connections used with the repo's usual
+# cursor()/execute('... %s ...')/fetchall()/commit() calls, and provide the
+# few SQL fragments that differ between MySQL/MariaDB and SQLite, so every
+# query computes the same aggregates on either database.
+import re
+import threading
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the 'database' config section
+DEFAULT_BACKEND = 'mysql'
+DEFAULT_MYSQL_PORT = 3306
+DEFAULT_SQLITE_TIMEOUT = 10  # seconds to wait for a write lock
+
+# Required 'database' fields per backend
+REQUIRED_FIELDS = {
+    'mysql': ['host', 'user', 'password', 'database'],
+    'sqlite': ['path'],
+}
+
+# Station tables for the embedded backend (the MySQL schema is weather_db_template.sql)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dataentry (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CREATED TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    HUMIDITY REAL NOT NULL DEFAULT 0.0,
+    AIR_TEMP REAL NOT NULL DEFAULT 0.0,
+    FEELS_LIKE REAL NOT NULL DEFAULT 0.0,
+    DEW_POINT REAL NOT NULL DEFAULT 0.0,
+    PRESSURE_SEA REAL NOT NULL DEFAULT 0.0,
+    RAINFALL REAL NOT NULL DEFAULT 0.0,
+    WIND_SPEED REAL NOT NULL DEFAULT 0.0,
+    WIND_GUST REAL NOT NULL DEFAULT 0.0,
+    WIND_DIRECTION INTEGER NOT NULL DEFAULT 0,
+    WIND_CARDINAL TEXT NOT NULL DEFAULT '0',
+    UV_INDEX REAL NOT NULL DEFAULT 0.0,
+    TEMP_CASE REAL NOT NULL DEFAULT 0.0
+);
+CREATE INDEX IF NOT EXISTS idx_created ON dataentry (CREATED);
+
+CREATE TABLE IF NOT EXISTS dataentry_notify (
+    id INTEGER PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    updated TIMESTAMP
+);
+INSERT OR IGNORE INTO dataentry_notify (id, last_id) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS dataentry_after_insert AFTER INSERT ON dataentry
+BEGIN
+    UPDATE dataentry_notify SET last_id = NEW.ID, updated = datetime('now', 'localtime') WHERE id = 1;
+END;
+"""
+
+# MySQL/MariaDB server backend
+class MySQLBackend:
+    name = 'mysql'
+    now = "now()"
+
+    def __init__(self, db_config):
+        self.config = db_config
+
+    @property
+    def Error(self):
+        import mysql.connector
+        return mysql.connector.Error
+
+    def connection_args(self):
+        return {
+            'host': self.config['host'],
+            'user': self.config['user'],
+            'password': self.config['password'],
+            'database': self.config['database'],
+            'port': int(self.config.get('port', DEFAULT_MYSQL_PORT)),
+            'connection_timeout': 10
+        }
+
+    def connect(self):
+        import mysql.connector
+        return mysql.connector.connect(autocommit=True, **self.connection_args())
+
+    def create_pool(self, pool_name, pool_size, autocommit=False):
+        import mysql.connector.pooling
+        return mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=pool_size,
+            pool_reset_session=False,
+            autocommit=autocommit,
+            **self.connection_args()
+        )
+
+    def minutes_before(self, expr, minutes):
+        return f"date_add({expr}, interval -{minutes} minute)"
+
+    def modulo(self, expr, divisor):
+        return f"MOD({expr}, {divisor})"
+
+    def timestamp_column(self, expr, alias):
+        """Select a computed datetime so it is returned as a datetime"""
+        return f"{expr} AS {alias}"
+
+    def unindexed(self, column):
+        """column in a filter that should not drive index selection"""
+        return column
+
+    def seconds_between(self, start, end):
+        """Wall-clock seconds from start to end (DATETIME expressions or placeholders)"""
+        return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+    def hour_bucket(self, expr, offset=0):
+        """Whole hours since the epoch of expr + offset seconds"""
+        return f"FLOOR((UNIX_TIMESTAMP({expr}) + {offset}) / 3600)"
+
+    def upsert(self, table, columns, keys, touch=None):
+        """INSERT that updates the existing row on a duplicate unique key (keys)"""
+        updates = [f"{column} = VALUES({column})" for column in columns]
+        if touch:
+            updates.append(f"{touch} = CURRENT_TIMESTAMP")
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+    def insert_ignore(self, table, columns):
+        """INSERT that skips rows with a duplicate key"""
+        return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def delete_batch(self, table, condition, order, limit):
+        """DELETE of at most limit rows matching condition, lowest order first"""
+        return f"DELETE FROM {table} WHERE {condition} ORDER BY {order} LIMIT {int(limit)}"
+
+    def create_table(self, cursor, ddl):
+        cursor.execute(ddl)
+
+    def create_index(self, cursor, table, name, columns):
+        """Add a secondary index to an existing table unless it already has one of that name"""
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+            (table, name)
+        )
+        if cursor.fetchall()[0][0] == 0:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+@lru_cache(maxsize=256)
+def sqlite_query(query):
+    """Convert a query from the %s paramstyle used throughout the repo to SQLite's ?"""
+    return query.replace('%s', '?')
+
+def sqlite_value(value):
+    """Adapt a query parameter the way mysql.connector would store it"""
+    if isinstance(value, datetime):
+        return value.isoformat(' ', timespec='seconds')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def sqlite_datetime(text):
+    """Read TIMESTAMP/DATETIME columns back as datetimes (other text is returned as is)"""
+    text = text.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+def sqlite_date(text):
+    text = text.decode()
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        return text
+
+# Cursor over an SQLite cursor with the mysql.connector calling conventions.
+# Buffered cursors fetch everything straight away so no statement keeps a WAL
+# read snapshot open; unbuffered ones stream rows like a server-side cursor.
+class SQLiteCursor:
+    def __init__(self, cursor, buffered=True, dictionary=False):
+        self.cursor = cursor
+        self.buffered = buffered
+        self.dictionary = dictionary
+        self.rows = []
+        self.position = 0
+
+    def execute(self, query, params=()):
+        self.cursor.execute(sqlite_query(query), [sqlite_value(value) for value in params or ()])
+        if self.buffered:
+            self._buffer()
+
+    def executemany(self, query, rows):
+        self.cursor.executemany(sqlite_query(query), ([sqlite_value(value) for value in row] for row in rows))
+        if self.buffered:
+            self._buffer()
+
+    def _buffer(self):
+        self.rows = self._convert(self.cursor.fetchall()) if self.cursor.description is not None else []
+        self.position = 0
+
+    def _convert(self, rows):
+        if self.dictionary and rows:
+            names = [column[0] for column in self.cursor.description]
+            return [dict(zip(names, row)) for row in rows]
+        return rows
+
+    def fetchone(self):
+        if not self.buffered:
+            rows = self._convert(self.cursor.fetchmany(1))
+            return rows[0] if rows else None
+        if self.position >= len(self.rows):
+            return None
+        self.position += 1
+        return self.rows[self.position - 1]
+
+    def fetchmany(self, size=1):
+        if not self.buffered:
+            return self._convert(self.cursor.fetchmany(size))
+        rows = self.rows[self.position:self.position + size]
+        self.position += len(rows)
+        return rows
+
+    def fetchall(self):
+        if not self.buffered:
+            return self._convert(self.cursor.fetchall())
+        rows = self.rows[self.position:]
+        self.position = len(self.rows)
+        return rows
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+# SQLite connection with the mysql.connector methods the services call
+class SQLiteConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.autocommit = True  # Accepted for compatibility; writes are committed explicitly
+        self.closed = False
+
+    def cursor(self, buffered=True, dictionary=False):
+        return SQLiteCursor(self.connection.cursor(), buffered=buffered, dictionary=dictionary)
+
+    def is_connected(self):
+        return not self.closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def commit(self):
+        self.connection.commit()
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.closed = True
+        self.connection.close()
+
+# Opening an SQLite connection is cheap, so the "pool" opens one per borrower
+class SQLitePool:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_connection(self):
+        return self.backend.connect()
+
+# Embedded SQLite database in WAL mode (readers never block the writer)
+class SQLiteBackend:
+    name = 'sqlite'
+    now = "datetime('now', 'localtime')"
+
+    def __init__(self, db_config):
+        self.path = db_config['path']
+        self.timeout = float(db_config.get('timeout', DEFAULT_SQLITE_TIMEOUT))
+        self.cache_size = db_config.get('cache_size')  # KiB of page cache per connection
+        self.schema_lock = threading.Lock()
+        self.schema_ready = False
+
+    @property
+    def Error(self):
+        import sqlite3
+        return sqlite3.Error
+
+    def connect(self):
+        import sqlite3
+        sqlite3.register_converter('timestamp', sqlite_datetime)
+        sqlite3.register_converter('datetime', sqlite_datetime)
+        sqlite3.register_converter('date', sqlite_date)
+
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False  # Callers serialise access like with a MySQL connection
+        )
+        connection.execute("PRAGMA synchronous=NORMAL")
+        if self.cache_size is not None:
+            connection.execute(f"PRAGMA cache_size=-{int(self.cache_size)}")
+
+        with self.schema_lock:
+            if not self.schema_ready:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SQLITE_SCHEMA)
+                self.schema_ready = True
+                logger.info(f"Using SQLite database {self.path} (WAL mode)")
+        return SQLiteConnection(connection)
+
+    def create_pool(self, pool_name, pool_size, autocommit=False):
+        return SQLitePool(self)
+
+    def minutes_before(self, expr, minutes):
+        return f"datetime({expr}, '-{minutes} minutes')"
+
+    def modulo(self, expr, divisor):
+        return f"(({expr}) % {divisor})"
+
+    def timestamp_column(self, expr, alias):
+        # The [timestamp] column-name hint makes sqlite3 convert the computed value
+        return f'{expr} AS "{alias} [timestamp]"'
+
+    def unindexed(self, column):
+        # Unary + keeps SQLite from range-scanning an index over (nearly) every row
+        # when walking the primary key backwards is far cheaper
+        return f"+{column}"
+
+    def seconds_between(self, start, end):
+        return f"CAST(ROUND((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+
+    def hour_bucket(self, expr, offset=0):
+        return f"((CAST(ROUND((julianday({expr}) - 2440587.5) * 86400) AS INTEGER) + {offset}) / 3600)"
+
+    def upsert(self, table, columns, keys, touch=None):
+        updates = [f"{column} = excluded.{column}" for column in columns]
+        if touch:
+            updates.append(f"{touch} = {self.now}")
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {', '.join(updates)}")
+
+    def insert_ignore(self, table, columns):
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+
+    def delete_batch(self, table, condition, order, limit):
+        # DELETE ... LIMIT needs a compile-time option, so select the rowids instead
+        return (f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE {condition} ORDER BY {order} LIMIT {int(limit)})")
+
+    def create_table(self, cursor, ddl):
+        """Run a MySQL CREATE TABLE statement, translated to SQLite (secondary keys become indexes)"""
+        table = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", ddl).group(1)
+        indexes = re.findall(r",\s*KEY (\w+) \(([^)]*)\)", ddl)
+        ddl = re.sub(r",\s*KEY \w+ \([^)]*\)", "", ddl)
+        ddl = re.sub(r"INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", ddl)
+        ddl = re.sub(r"UNIQUE KEY \w+ \(", "UNIQUE (", ddl)
+        ddl = re.sub(r"\)\s*ROW_FORMAT=\w+", ")", ddl)
+        # SQLite's CURRENT_TIMESTAMP is UTC; MySQL stores the session's local time
+        ddl = ddl.replace("DEFAULT CURRENT_TIMESTAMP", f"DEFAULT ({self.now})")
+        cursor.execute(ddl)
+        for name, columns in indexes:
+            self.create_index(cursor, table, name, columns)
+
+    def create_index(self, cursor, table, name, columns):
+        # Index names are global in SQLite, so they are prefixed with the table
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({columns})")
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+}
+
+def create_storage(db_config):
+    """Create the storage backend selected by the 'database' config section"""
+    backend = db_config.get('backend', DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown database backend '{backend}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[backend](db_config)
+
+def missing_fields(db_config):
+    """Return the required 'database' fields missing for the configured backend"""
+    backend = db_config.get('backend', DEFAULT_BACKEND)
+    return [field for field in REQUIRED_FIELDS.get(backend, []) if field not in db_config]
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from station_metrics import metrics
+
+logger = logging.getLogger("WeatherStation")
+
+# Defaults for the optional per-service 'http' config section
+DEFAULT_CONNECT_TIMEOUT = 5  # seconds to establish the TCP/TLS connection
+DEFAULT_READ_TIMEOUT = 10  # seconds to wait between bytes of the response
+DEFAULT_DEADLINE = 20  # overall budget for one upload, including a hedged retry
+DEFAULT_HEDGE_AFTER = 3  # seconds before hedging until enough latency samples exist
+MIN_HEDGE_AFTER = 1
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+
+# GET protocols where sending the same update twice is harmless
+HEDGEABLE_SERVICES = {'wunderground', 'pwsweather', 'metoffice'}
+
+# Worker threads for HTTP requests, so callers can give up at the deadline
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="http")
+
+# One keep-alive session per worker thread (reuses TLS connections between updates)
+local = threading.local()
+
+def get_session():
+    session = getattr(local, 'session', None)
+    if session is None:
+        session = local.session = requests.Session()
+    return session
+
+def http_settings(service_name, service_config):
+    """Resolve the HTTP timeouts and hedging settings for a service"""
+    http_config = (service_config or {}).get('http') or {}
+    return {
+        'connect_timeout': float(http_config.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+        'read_timeout': float(http_config.get('read_timeout', DEFAULT_READ_TIMEOUT)),
+        'deadline': float(http_config.get('deadline', DEFAULT_DEADLINE)),
+        'hedge': bool(http_config.get('hedge', service_name in HEDGEABLE_SERVICES)),
+        'hedge_after': http_config.get('hedge_after')
+    }
+
+def hedge_delay(service_name, settings):
+    """Seconds to wait for the first request before sending a hedged duplicate"""
+    if settings['hedge_after'] is not None:
+        return float(settings['hedge_after'])
+
+    # Adapt to the observed latency once there is enough history
+    name = f"http.{service_name}"
+    if metrics.sample_count(name) >= HEDGE_MIN_SAMPLES:
+        return max(MIN_HEDGE_AFTER, metrics.percentile(name, HEDGE_PERCENTILE))
+    return DEFAULT_HEDGE_AFTER
+
+def timed_get(service_name, url, params, timeout):
+    start = time.time()
+    response = get_session().get(url, params=params, timeout=timeout)
+    metrics.observe(f"http.{service_name}", time.time() - start)
+    return response
+
+def deadline_get(service_name, url, params=None, settings=None):
+    """GET with split connect/read timeouts, an overall deadline and optional hedging.
+
+    Raises requests.exceptions.Timeout if no response arrives before the deadline,
+    or the last request error if every attempt failed.
+    """
+    settings = settings or http_settings(service_name, None)
+    timeout = (settings['connect_timeout'], settings['read_timeout'])
+    deadline = time.time() + settings['deadline']
+    hedge_at = time.time() + hedge_delay(service_name, settings) if settings['hedge'] else None
+
+    pending = {executor.submit(timed_get, service_name, url, params, timeout)}
+    last_error = None
+
+    while True:
+        wake_at = min(deadline, hedge_at) if hedge_at is not None else deadline
+        done, pending = wait(pending, timeout=max(0, wake_at - time.time()), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            last_error = future.exception()
+
+        now = time.time()
+        if now >= deadline:
+            metrics.incr(f"http.{service_name}.deadline_exceeded")
+            raise requests.exceptions.Timeout(f"{service_name} upload exceeded {settings['deadline']:.0f}s deadline")
+
+        # Hedge when the first request is slow, or retry once right away if it failed
+        if hedge_at is not None and (now >= hedge_at or not pending):
+            logger.debug(f"[{service_name}] Sending hedged request")
+            metrics.incr(f"http.{service_name}.hedged")
+            pending.add(executor.submit(timed_get, service_name, url, params, timeout))
+            hedge_at = None
+            continue
+
+        if not pending:
+            raise last_error
@@ -15,3 +15,16 @@ CREATE TABLE `dataentry` (
   `TEMP_CASE` decimal(6,1) NOT NULL DEFAULT 0.0 COMMENT 'Celcius',  
   PRIMARY KEY (`ID`)  
 );
+
+-- Optional: change-notification table for event-driven uploads (trigger mode 'table')
+CREATE TABLE `dataentry_notify` (
+  `id` tinyint(1) NOT NULL,
+  `last_id` bigint(20) NOT NULL DEFAULT 0,
+  `updated` timestamp(3) NOT NULL DEFAULT current_timestamp(3) ON UPDATE current_timestamp(3),
+  PRIMARY KEY (`id`)
+);
+
+INSERT INTO `dataentry_notify` (`id`, `last_id`) VALUES (1, 0);
+
+CREATE TRIGGER `dataentry_after_insert` AFTER INSERT ON `dataentry`
+  FOR EACH ROW UPDATE `dataentry_notify` SET `last_id` = NEW.`ID` WHERE `id` = 1;
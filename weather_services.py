@@ -1,34 +1,64 @@
 #!/usr/bin/python3
-import requests
 import time
 import threading
-import yaml
 import sys
-import mysql.connector
-from datetime import datetime
+import importlib.util
+from datetime import datetime, timezone
 import logging
 import traceback
+from station_metrics import metrics
+from station_trace import tracer, traced_lock, start_tracing
+from service_health import create_breakers, classify_response, SUCCESS, TRANSIENT
+from snapshot import Snapshot, MEASUREMENT_FIELDS, RAIN_FIELDS, TEXT_FIELDS, SOURCE_FIELDS
+from derived_metrics import DERIVED_FIELDS, derived_values
+from rain_engine import RainTracker, create_rain_accumulator
+from storage import BACKENDS, DEFAULT_BACKEND, create_storage, missing_fields
+from config_reload import STARTED, diff_services, restart_sections, start_config_watcher
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("weather_station.log")
-    ]
-)
 logger = logging.getLogger("WeatherStation")
 
-# Global database connection and cursor
-conn = None
-cursor = None
-db_lock = threading.Lock()  # Add lock for thread safety
+CONFIG_FILE = 'weather_services_config.yaml'
+
+# Defaults for the optional 'freshness' config section
+DEFAULT_MAX_STALENESS = 900  # seconds; older readings are not uploaded as current
+
+# Reasons an upload is skipped (also the uploads.<service>.<reason> counters)
+UNCHANGED = 'unchanged'  # the service already has the newest reading
+STALE = 'stale'  # the newest reading is older than max_staleness
+
+def lazy_import(name):
+    """Return a module that is only executed on first attribute access"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+# Heavy dependencies load on first use, so importing this module stays cheap
+requests = lazy_import('requests')
+yaml = lazy_import('yaml')
+
+def configure_logging():
+    """Log to the console and weather_station.log (called by the entry points, not on import)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler("weather_station.log")
+        ]
+    )
 
 # Database connection class with retry logic
 class Database:
-    def __init__(self, config):
+    def __init__(self, config, pool=None):
         self.config = config
+        self.storage = create_storage(config)
+        self.pool = pool  # Optional shared connection pool (used by weather_supervisor.py)
         self.connection = None
         self.max_retries = 3
         self.retry_delay = 5  # seconds
@@ -38,41 +68,46 @@ class Database:
             try:
                 if self.connection is None or not self.connection.is_connected():
                     logger.info(f"Establishing new database connection (attempt {attempt+1}/{self.max_retries})")
-                    self.connection = mysql.connector.connect(
-                        host=self.config['host'],
-                        user=self.config['user'],
-                        password=self.config['password'],
-                        database=self.config['database'],
-                        connection_timeout=10,
-                        autocommit=True  # Enable autocommit to avoid transaction issues
-                    )
+                    if self.pool is not None:
+                        # Borrow a long-lived connection from the shared pool
+                        self.connection = self.pool.get_connection()
+                        self.connection.ping(reconnect=True, attempts=1)
+                        self.connection.autocommit = True
+                        return self.connection
+                    self.connection = self.storage.connect()
                 return self.connection
-            except mysql.connector.Error as err:
+            except self.storage.Error as err:
                 logger.error(f"Database connection error (attempt {attempt+1}/{self.max_retries}): {err}")
                 if attempt < self.max_retries - 1:
                     time.sleep(self.retry_delay)
                 else:
                     raise
 
-# Load configuration from file
-def load_config():
+# Read and validate the configuration file (None if it is missing or invalid)
+def read_config(path=CONFIG_FILE):
+    logger.info(f"Loading configuration from {path}")
     try:
-        with open('weather_services_config.yaml', 'r') as config_file:
+        with open(path, 'r') as config_file:
             config = yaml.safe_load(config_file)
             if validate_config(config):
                 return config
             else:
-                logger.error("Configuration validation failed. Exiting.")
-                sys.exit(1)
+                logger.error("Configuration validation failed.")
     except FileNotFoundError:
-        logger.error("Configuration file 'weather_services_config.yaml' not found. Exiting.")
-        sys.exit(1)
+        logger.error(f"Configuration file '{path}' not found.")
     except yaml.YAMLError as e:
-        logger.error(f"Error parsing configuration file: {str(e)}. Exiting.")
-        sys.exit(1)
+        logger.error(f"Error parsing configuration file: {str(e)}.")
     except Exception as e:
-        logger.error(f"Unexpected error loading configuration: {str(e)}. Exiting.")
+        logger.error(f"Unexpected error loading configuration: {str(e)}.")
+    return None
+
+# Load configuration from file, exiting if it is missing or invalid
+def load_config(path=CONFIG_FILE):
+    config = read_config(path)
+    if config is None:
+        logger.error("Exiting.")
         sys.exit(1)
+    return config
 
 """Validate the loaded configuration"""
 def validate_config(config):
@@ -88,11 +123,12 @@ def validate_config(config):
 
     # Validate database configuration
     db_config = config['database']
-    required_db_fields = ['host', 'user', 'password', 'database']
-    for field in required_db_fields:
-        if field not in db_config:
-            logger.error(f"Missing required database field: {field}")
-            return False
+    if db_config.get('backend', DEFAULT_BACKEND) not in BACKENDS:
+        logger.error(f"Unknown database backend: {db_config.get('backend')}")
+        return False
+    for field in missing_fields(db_config):
+        logger.error(f"Missing required database field: {field}")
+        return False
 
     # List of required services
     required_services = ['weathercloud', 'wunderground', 'windy', 'pwsweather', 'metoffice']
@@ -144,12 +180,6 @@ def validate_config(config):
 
     return True
 
-# Load configuration
-logger.info("Loading configuration from weather_services_config.yaml")
-CONFIG = load_config()
-SERVICES = CONFIG['services']
-DB_CONFIG = CONFIG['database']
-
 # Conversion functions
 def kmh_to_ms(speed_in_kmh):
     return speed_in_kmh * 0.277778 * 10
@@ -166,204 +196,354 @@ def degc_to_degf(temperature_in_c):
 def kmh_to_mph(speed_in_kmh):
     return float(speed_in_kmh) * 0.621371
 
-# Initialize database connection
-db = Database(DB_CONFIG)
+# Snapshot fields in the column order of the aggregate query
+# (rain comes from the rain engine, derived fields are computed afterwards)
+SNAPSHOT_FIELDS = [field for field in MEASUREMENT_FIELDS if field not in RAIN_FIELDS + DERIVED_FIELDS]
+SNAPSHOT_INDEX = {field: position for position, field in enumerate(SNAPSHOT_FIELDS)}
+
+# Fields taken from the latest reading that must be present (with log labels)
+REQUIRED_SNAPSHOT_FIELDS = {
+    'temperature': 'temperature',
+    'feels_like': 'feels_like',
+    'pressure_sea': 'pressure',
+    'humidity': 'humidity',
+    'dew_point': 'dew point'
+}
+
+def build_snapshot_query(ref, storage):
+    """Build the single aggregate query behind get_weather_data().
+
+    ref is the SQL expression for the reference time: storage.now when live, or a
+    placeholder (bound twice) when replaying history against a virtual clock.
+    Windows are inclusive at both ends like the original per-field queries.
+    """
+    def window(minutes):
+        return f"d.CREATED >= {storage.minutes_before('r.ref', minutes)}"
+
+    gust_and_direction = f"MAX(CASE WHEN {window(10)} THEN ROUND(d.WIND_GUST * 10) * 1000 + d.WIND_DIRECTION END)"
+
+    return f"""
+        SELECT
+            MAX(latest.AIR_TEMP), MAX(latest.FEELS_LIKE), MAX(latest.PRESSURE_SEA),
+            MAX(latest.HUMIDITY), MAX(latest.DEW_POINT), MAX(latest.UV_INDEX),
+            MAX(latest.WIND_SPEED), MAX(latest.WIND_DIRECTION), MAX(latest.TEMP_CASE),
+            MAX(latest.WIND_CARDINAL),
+            COALESCE(AVG(CASE WHEN {window(2)} THEN d.WIND_DIRECTION END), 0),
+            COALESCE(AVG(CASE WHEN {window(2)} THEN d.WIND_SPEED END), 0),
+            COALESCE(AVG(CASE WHEN {window(10)} THEN d.WIND_SPEED END), 0),
+            COALESCE(MAX(CASE WHEN {window(10)} THEN d.WIND_GUST END), 0),
+            COALESCE(AVG(CASE WHEN {window(10)} THEN d.WIND_DIRECTION END), 0),
+            COALESCE(AVG(CASE WHEN {window(5)} THEN d.WIND_SPEED END), 0),
+            COALESCE(MAX(CASE WHEN {window(5)} THEN d.WIND_GUST END), 0),
+            COALESCE(AVG(CASE WHEN {window(5)} THEN d.WIND_DIRECTION END), 0),
+            COALESCE(MAX(CASE WHEN {window(10)} THEN d.WIND_SPEED END), 0),
+            -- Direction of the strongest gust: pack gust and direction into one sortable number
+            COALESCE({storage.modulo(gust_and_direction, 1000)}, 0),
+            -- Newest reading, so uploads can be skipped when nothing new has arrived
+            MAX(latest.ID), {storage.timestamp_column('MAX(latest.CREATED)', 'source_time')}
+        FROM (SELECT {ref} AS ref) r
+        JOIN (
+            SELECT ID, CREATED, AIR_TEMP, FEELS_LIKE, PRESSURE_SEA, HUMIDITY, DEW_POINT, UV_INDEX,
+                   WIND_SPEED, WIND_DIRECTION, TEMP_CASE, WIND_CARDINAL
+            FROM dataentry WHERE {storage.unindexed('CREATED')} <= {ref} ORDER BY ID DESC LIMIT 1
+        ) latest
+        LEFT JOIN dataentry d
+            ON d.CREATED BETWEEN {storage.minutes_before('r.ref', 10)} AND r.ref;
+    """
+
+def build_qc_query(ref, qc_gate, storage):
+    """Build the query for the raw rows the quality gate checks (ref as in build_snapshot_query)"""
+    return (f"SELECT CREATED, {', '.join(qc_gate.columns)} FROM dataentry "
+            f"WHERE CREATED BETWEEN {storage.minutes_before(ref, qc_gate.window)} AND {ref} ORDER BY ID;")
+
+# Uploader state built from the configuration on first use, so importing this
+# module has no side effects (no config file, logging setup or database handle)
+class WeatherApp:
+    def __init__(self, config, pool=None, config_path=CONFIG_FILE):
+        self.config = config
+        self.config_path = config_path
+        self.services = config['services']
+        self.db_config = config['database']
+        self.db = Database(self.db_config, pool=pool)
+        self.storage = self.db.storage
+
+        # Aggregate queries in the backend's SQL dialect
+        self.snapshot_query = build_snapshot_query(self.storage.now, self.storage)
+        self.snapshot_query_at = build_snapshot_query("%s", self.storage)
+        self.db_lock = threading.Lock()  # Serialises use of the shared connection and cursor
+        self.conn = None
+        self.cursor = None
+        self.breakers = create_breakers(SERVICE_FUNCTIONS, config.get('health'))
+
+        # Set when a config reload changes a service, to wake its runner early
+        self.wakeups = {service_name: threading.Event() for service_name in SERVICE_FUNCTIONS}
+
+        # Newest reading each service has accepted: (source_id, source_time)
+        self.published = {}
+
+        # New-data notifier for event-driven uploads (None when polling on a fixed interval)
+        self.notifier = None
+
+        # In-memory aggregates fed by the sensor ingestion endpoint (None when disabled)
+        self.ingest_aggregator = None
+
+        # Cached responses of the local read API (None when disabled)
+        self.read_cache = None
+
+        # Incrementally maintained climatology (None when disabled)
+        self.climate = None
+
+        # Data-quality gate applied to every snapshot before encoding (numpy loads only when enabled)
+        self.qc_gate = None
+        qc_config = config.get('qc') or {}
+        if qc_config.get('enabled', True):
+            from station_qc import create_quality_gate
+            self.qc_gate = create_quality_gate(qc_config)
+            self.qc_query = build_qc_query(self.storage.now, self.qc_gate, self.storage)
+            self.qc_query_at = build_qc_query("%s", self.qc_gate, self.storage)
+
+        # Incremental rain totals in the station timezone (tips failing the QC range check are ignored)
+        self.rain_max_amount = None
+        if self.qc_gate is not None:
+            self.rain_max_amount = float(self.qc_gate.maximum[self.qc_gate.columns.index('RAINFALL')])
+        self.rain = self.create_rain_accumulator()
+        self.rain_tracker = RainTracker(self.rain)
+
+    def create_rain_accumulator(self):
+        """New RainAccumulator with the station's timezone and QC settings"""
+        return create_rain_accumulator(self.config.get('station'), max_amount=self.rain_max_amount)
+
+    def set_connection_pool(self, pool):
+        """Use a shared connection pool instead of a dedicated connection"""
+        with self.db_lock:
+            self.db = Database(self.db_config, pool=pool)
+            self.conn = None
+            self.cursor = None
+
+    def reload(self):
+        """Re-read the config file and apply service changes in place.
+
+        Connections, caches and aggregates are kept. Returns {service_name: change}
+        (see config_reload.diff_services), or None if the new config is invalid
+        and the running one was kept.
+        """
+        config = read_config(self.config_path)
+        if config is None:
+            logger.error("Keeping the running configuration")
+            return None
+
+        ignored = restart_sections(self.config, config)
+        if ignored:
+            logger.warning(f"Changes to {', '.join(ignored)} need a restart to take effect")
+
+        # Replace entries rather than the dict, so encoders pick up new credentials on their next upload
+        changes = diff_services(self.services, config['services'])
+        for service_name, service_config in config['services'].items():
+            self.services[service_name] = service_config
+
+        # Freshness rules are read on every upload, so they apply from the next one
+        if config.get('freshness') != self.config.get('freshness'):
+            logger.info("Config reload: freshness updated")
+            self.config['freshness'] = config.get('freshness')
+
+        for service_name, change in changes.items():
+            logger.info(f"Config reload: {service_name} {change}")
+            if service_name in self.wakeups:
+                self.wakeups[service_name].set()
+
+        # Event-driven runners wait on the notifier rather than their wakeup event
+        if changes and self.notifier is not None:
+            self.notifier.wake()
+        return changes
+
+    def skip_reason(self, service_name, data):
+        """Return UNCHANGED or STALE if the snapshot should not be uploaded to the service, else None"""
+        freshness = self.config.get('freshness') or {}
+        max_staleness = self.services[service_name].get('max_staleness',
+                                                        freshness.get('max_staleness', DEFAULT_MAX_STALENESS))
+        if max_staleness is not None and data.source_time is not None:
+            if (data.timestamp - data.source_time).total_seconds() > float(max_staleness):
+                return STALE
+
+        last = self.published.get(service_name)
+        if last is None or not freshness.get('skip_unchanged', True):
+            return None
+
+        # IDs are only known for database snapshots; ingested readings compare by time
+        last_id, last_time = last
+        if data.source_id is not None and last_id is not None:
+            return UNCHANGED if data.source_id <= last_id else None
+        if data.source_time is not None and last_time is not None:
+            return UNCHANGED if data.source_time <= last_time else None
+        return None
+
+    def mark_published(self, service_name, data):
+        """Record the reading a service has accepted"""
+        self.published[service_name] = (data.source_id, data.source_time)
+
+    def start_event_sources(self, db_factory):
+        """Start the optional new-data trigger and sensor ingestion endpoint"""
+        trigger_config = self.config.get('trigger') or {}
+        if trigger_config.get('enabled', False):
+            from dataentry_events import start_trigger
+            self.notifier = start_trigger(trigger_config, db_factory)
+
+        ingest_config = self.config.get('ingest') or {}
+        if ingest_config.get('enabled', False):
+            from sensor_ingest import start_ingest_server
+            self.ingest_aggregator = start_ingest_server(ingest_config, db_factory, self.notifier,
+                                                         self.create_rain_accumulator())
+
+    def start_read_api(self, db_factory):
+        """Start the optional local read API for dashboards"""
+        api_config = self.config.get('api') or {}
+        if api_config.get('enabled', False):
+            from station_api import start_read_api
+            forecast_config = self.config.get('forecast')
+            self.read_cache = start_read_api(api_config, get_weather_data, db_factory,
+                                             forecasts=bool(forecast_config and forecast_config.get('enabled', True)),
+                                             climate=bool((self.config.get('climate') or {}).get('enabled', False)))
+
+    def start_climate(self, db_factory):
+        """Start the optional climatology updates (after start_read_api, so they refresh its cache)"""
+        climate_config = self.config.get('climate') or {}
+        if climate_config.get('enabled', False):
+            from station_climate import start_climate
+            self.climate = start_climate(climate_config, db_factory, self.storage,
+                                         zones=(self.rain.station_tz, self.rain.db_tz))
+            if self.climate is not None and self.read_cache is not None:
+                from station_api import CLIMATE_QUERIES
+                self.climate.listeners.append(lambda: self.read_cache.invalidate(*CLIMATE_QUERIES))
+
+# The application, created by get_app()
+app = None
+app_lock = threading.Lock()
+
+def get_app(config_path=CONFIG_FILE):
+    """Return the application, loading and validating the config on first use"""
+    global app
+    if app is None:
+        with app_lock:
+            if app is None:
+                app = WeatherApp(load_config(config_path), config_path=config_path)
+                # Finish loading requests before the upload threads share it
+                # (LazyLoader is not thread-safe before Python 3.12)
+                requests.Session
+    return app
 
 # Central data retrieval function
-def get_weather_data():
-    global conn, cursor
-    data = {}
+def get_weather_data(now=None):
+    """Return the current weather Snapshot, or None if data is unavailable.
+
+    Args:
+        now (datetime): Reference time for the aggregation windows. Defaults to the
+            database clock; the simulation mode passes its virtual clock here.
+    """
+    app = get_app()
+    with tracer.span('get_weather_data'):
+        data = _get_weather_data(app, now)
+
+    # Every live snapshot refreshes the read API, so dashboards never query the database
+    if app.read_cache is not None and data is not None and now is None:
+        app.read_cache.publish('current', data.to_json())
+    return data
+
+def _get_weather_data(app, now):
+    qc_gate = app.qc_gate
+
+    # Serve from the in-memory ingestion aggregates while they are fresh
+    if app.ingest_aggregator is not None and now is None:
+        data = app.ingest_aggregator.snapshot()
+        if data is not None:
+            metrics.incr('ingest.snapshots')
+            if qc_gate is not None:
+                with tracer.span('qc.apply'):
+                    data = qc_gate.apply_rows(data, app.ingest_aggregator.recent_rows(qc_gate.columns),
+                                              ref=app.rain.to_db(data.timestamp))
+            return data
+        logger.warning("Ingested data is stale, falling back to the database")
 
-    with db_lock:  # Use lock to ensure thread safety
+    with traced_lock(app.db_lock, 'db_lock'):  # Use lock to ensure thread safety
         try:
             # Ensure the connection is active
-            if conn is None or not conn.is_connected():
+            if app.conn is None or not app.conn.is_connected():
                 logger.info("Connecting to database...")
-                conn = db.connect()
-                cursor = conn.cursor(buffered=True)  # Use buffered cursor
+                app.conn = app.db.connect()
+                app.cursor = app.conn.cursor(buffered=True)  # Use buffered cursor
+            cursor = app.cursor
 
             logger.debug("Retrieving current weather data from database")
+            metrics.incr('db.snapshot_queries')
 
-            # Temperature
-            cursor.execute("SELECT AIR_TEMP FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No temperature data available")
-                return None
-            data['temperature'] = float(result[0])
-
-            # Feels like temperature
-            cursor.execute("SELECT FEELS_LIKE FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No feels_like data available")
-                return None
-            data['feels_like'] = float(result[0])
-
-            # Sea level pressure
-            cursor.execute("SELECT PRESSURE_SEA FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No pressure data available")
-                return None
-            data['pressure_sea'] = float(result[0])
-
-            # Humidity
-            cursor.execute("SELECT HUMIDITY FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No humidity data available")
-                return None
-            data['humidity'] = float(result[0])
-
-            # Dew point
-            cursor.execute("SELECT DEW_POINT FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No dew point data available")
-                return None
-            data['dew_point'] = float(result[0])
-
-            # UV index
-            cursor.execute("SELECT UV_INDEX FROM dataentry ORDER BY id DESC LIMIT 1;")
-            result = cursor.fetchone()
-            if result is None or result[0] is None:
-                logger.warning("No UV index data available")
-                data['uv_index'] = 0.0  # Default to 0 if not available
-            else:
-                data['uv_index'] = float(result[0])
-
-            # Wind direction (2 min avg)
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_DIRECTION),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -2 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind direction (2min) data available")
-                data['wind_dir_2min'] = 0.0
-            else:
-                data['wind_dir_2min'] = float(result[0])
-
-            # Wind speed (2 min avg)
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_SPEED),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -2 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind speed (2min) data available")
-                data['wind_speed_2min'] = 0.0
-            else:
-                data['wind_speed_2min'] = float(result[0])
-
-            # Wind speed (10 min avg)
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_SPEED),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -10 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind speed (10min) data available")
-                data['wind_speed_10min'] = 0.0
-            else:
-                data['wind_speed_10min'] = float(result[0])
-
-            # Wind gust (10 min max)
-            cursor.execute(
-                "SELECT COALESCE(max(WIND_GUST),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -10 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind gust (10min) data available")
-                data['wind_gust_10min'] = 0.0
-            else:
-                data['wind_gust_10min'] = float(result[0])
-
-            # Wind direction (10 min avg)
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_DIRECTION),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -10 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind direction (10min) data available")
-                data['wind_dir_10min'] = 0.0
-            else:
-                data['wind_dir_10min'] = float(result[0])
-
-            # Daily rainfall
-            cursor.execute(
-                "SELECT COALESCE(sum(RAINFALL),0) FROM dataentry WHERE CREATED BETWEEN curdate() AND now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No daily rainfall data available")
-                data['daily_rain'] = 0.0
-            else:
-                data['daily_rain'] = float(result[0])
-
-            # Hourly rainfall
-            cursor.execute(
-                "SELECT COALESCE(sum(RAINFALL),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -1 hour) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No hourly rainfall data available")
-                data['hourly_rain'] = 0.0
-            else:
-                data['hourly_rain'] = float(result[0])
-
-            # Wind speed (5 min avg) - for services that need it
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_SPEED),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -5 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind speed (5min) data available")
-                data['wind_speed_5min'] = 0.0
-            else:
-                data['wind_speed_5min'] = float(result[0])
-
-            # Wind gust (5 min max) - for services that need it
-            cursor.execute(
-                "SELECT COALESCE(max(WIND_GUST),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -5 minute) and now();"
-            )
-            result = cursor.fetchone()
-            if result is None:
-                logger.warning("No wind gust (5min) data available")
-                data['wind_gust_5min'] = 0.0
-            else:
-                data['wind_gust_5min'] = float(result[0])
-
-            # Wind direction (5 min avg) - for services that need it
-            cursor.execute(
-                "SELECT COALESCE(avg(WIND_DIRECTION),0) FROM dataentry WHERE CREATED BETWEEN date_add(now(), interval -5 minute) and now();"
-            )
-            result = cursor.fetchone()
+            # All fields come from a single aggregate query
+            with tracer.span('query.snapshot'):
+                if now is None:
+                    cursor.execute(app.snapshot_query)
+                else:
+                    cursor.execute(app.snapshot_query_at, (now, now))
+                result = cursor.fetchone()
             if result is None:
-                logger.warning("No wind direction (5min) data available")
-                data['wind_dir_5min'] = 0.0
-            else:
-                data['wind_dir_5min'] = float(result[0])
-
-            # Current timestamp
-            data['timestamp'] = datetime.now()
-
-            conn.commit()
+                result = [None] * (len(SNAPSHOT_FIELDS) + len(SOURCE_FIELDS))
+            row = dict(zip(SNAPSHOT_FIELDS, result))
+
+            # Latest-reading fields are required
+            for field, label in REQUIRED_SNAPSHOT_FIELDS.items():
+                if row[field] is None:
+                    logger.warning(f"No {label} data available")
+                    return None
+
+            # UV index and windowed aggregates default to 0 if not available
+            values = [(value or '') if field in TEXT_FIELDS else 0.0 if value is None else float(value)
+                      for field, value in zip(SNAPSHOT_FIELDS, result)]
+
+            # Rain totals from the rows added since the last snapshot
+            with tracer.span('query.rain'):
+                values.extend(app.rain_tracker.refresh(cursor, now))
+
+            # Heat index and wind chill
+            values.extend(derived_values(values[SNAPSHOT_INDEX['temperature']], values[SNAPSHOT_INDEX['humidity']],
+                                         values[SNAPSHOT_INDEX['wind_speed_10min']]))
+
+            # Newest dataentry row (ID and CREATED, the last two query columns)
+            source_id, source_time = result[-2:]
+            values.append(source_id)
+            values.append(app.rain.to_utc(source_time) if source_time is not None else None)
+
+            # Snapshot timestamp in UTC (the virtual clock in simulation mode); positional
+            # construction in Snapshot field order avoids the keyword-argument cost
+            values.append(datetime.now(timezone.utc) if now is None else app.rain.to_utc(now))
+            data = Snapshot._make(values)
+
+            # Range, step and persistence checks over the recent raw rows
+            if qc_gate is not None:
+                with tracer.span('query.qc'):
+                    if now is None:
+                        cursor.execute(app.qc_query)
+                    else:
+                        cursor.execute(app.qc_query_at, (now, now))
+                    rows = cursor.fetchall()
+                with tracer.span('qc.apply'):
+                    data = qc_gate.apply_rows(data, rows, ref=app.rain.to_db(data.timestamp))
+
+            app.conn.commit()
 
             # Log summary of retrieved data
-            logger.info(f"Retrieved weather data: Temp: {data['temperature']}°C, Pressure: {data['pressure_sea']} hPa, " +
-                      f"Humidity: {data['humidity']}%, Wind: {data['wind_speed_10min']} km/h @ {data['wind_dir_10min']}°")
+            logger.info(f"Retrieved weather data: Temp: {data.temperature}°C, Pressure: {data.pressure_sea} hPa, " +
+                      f"Humidity: {data.humidity}%, Wind: {data.wind_speed_10min} km/h @ {data.wind_dir_10min}°")
 
             return data
 
-        except mysql.connector.Error as err:
+        except app.storage.Error as err:
             logger.error(f"Database error: {err}")
+            metrics.incr('db.errors')
             # Try to reconnect
             try:
-                if conn is not None and conn.is_connected():
-                    conn.close()
+                if app.conn is not None and app.conn.is_connected():
+                    app.conn.close()
             except:
                 pass
-            conn = None
-            cursor = None
+            app.conn = None
+            app.cursor = None
             return None
 
         except Exception as e:
@@ -376,253 +556,305 @@ def get_weather_data():
             # Don't close the connection here, keep it open for reuse
             pass
 
+def service_get(service_name, url, params=None):
+    """Send an upload request using the service's timeouts, deadline and hedging settings"""
+    from upload_http import deadline_get, http_settings
+    with tracer.span(f"http.{service_name}"):
+        return deadline_get(service_name, url, params, http_settings(service_name, get_app().services[service_name]))
+
 # Service-specific submission functions
 def submit_to_weathercloud(data):
-    config = SERVICES['weathercloud']['credentials']
+    config = get_app().services['weathercloud']['credentials']
 
     logger.info("Preparing data for Weathercloud submission")
 
-    # Format timestamp
-    dt = int(data['timestamp'].timestamp())
-
-    # Format temperature as int (C*10)
-    temperature = int(data['temperature'] * 10)
-    feels_like = int(data['feels_like'] * 10)
-
-    # Format pressure as int (hPa*10)
-    pressure = int(data['pressure_sea'] * 10)
-
-    # Format humidity as int (0-100)
-    humidity = int(data['humidity'])
-
-    # Format wind data
-    wind_speed = kmh_to_ms(data['wind_speed_10min'])  # m/s * 10
-    wind_gust = kmh_to_ms(data['wind_gust_10min'])   # m/s * 10
-    wind_dir = int(data['wind_dir_10min'])
-
-    # Format rainfall in mm*10
-    daily_rain = int(data['daily_rain'] * 10)
-
-    # Format UV index
-    uv_index = int(data['uv_index'] * 10)
-
-    # Build parameters for Weathercloud
-    params = {
-        'wid': config['id'],
-        'key': config['key'],
-        'date': dt,
-        'temp': temperature,
-        'hum': humidity,
-        'wdir': wind_dir,
-        'wspd': int(wind_speed),
-        'wgst': int(wind_gust),
-        'bar': pressure,
-        'rain': daily_rain,
-        'uvi': uv_index,
-        'tempf': feels_like
-    }
+    with tracer.span('encode.weathercloud'):
+        # Format date (yyyymmdd) and time (hhmm) in UTC
+        date = int(data.timestamp.strftime("%Y%m%d"))
+        time_utc = int(data.timestamp.strftime("%H%M"))
+
+        # Format temperature as int (C*10)
+        temperature = int(data.temperature * 10)
+        feels_like = int(data.feels_like * 10)
+
+        # Format pressure as int (hPa*10)
+        pressure = int(data.pressure_sea * 10)
+
+        # Format humidity as int (0-100)
+        humidity = int(data.humidity)
+
+        # Format wind data (current reading plus 10-minute average and high)
+        wind_speed = kmh_to_ms(data.wind_speed)  # m/s * 10
+        wind_speed_avg = kmh_to_ms(data.wind_speed_10min)  # m/s * 10
+        wind_speed_hi = kmh_to_ms(data.wind_speed_hi)  # m/s * 10
+        wind_gust = kmh_to_ms(data.wind_gust_10min)   # m/s * 10
+        wind_dir = int(data.wind_dir) % 360
+        wind_dir_avg = int(data.wind_dir_10min) % 360
+
+        # Format heat index and wind chill as int (C*10)
+        heat = int(data.heat_index * 10)
+        chill = int(data.wind_chill * 10)
+
+        # Format rainfall in mm*10 and rain rate in mm/h*10
+        daily_rain = int(data.daily_rain * 10)
+        rain_rate = int(data.rain_rate * 10)
+
+        # Format UV index
+        uv_index = int(data.uv_index * 10)
+
+        # Build parameters for Weathercloud
+        params = {
+            'wid': config['id'],
+            'key': config['key'],
+            'date': date,
+            'time': time_utc,
+            'temp': temperature,
+            'hum': humidity,
+            'wdir': wind_dir,
+            'wdiravg': wind_dir_avg,
+            'wspd': int(wind_speed),
+            'wspdavg': int(wind_speed_avg),
+            'wspdhi': int(wind_speed_hi),
+            'wgst': int(wind_gust),
+            'heat': heat,
+            'chill': chill,
+            'bar': pressure,
+            'rain': daily_rain,
+            'rainrate': rain_rate,
+            'uvi': uv_index,
+            'tempf': feels_like
+        }
 
     try:
         logger.debug(f"Sending request to Weathercloud with params: {params}")
-        r = requests.get(config['url'], params=params, timeout=15)
+        r = service_get('weathercloud', config['url'], params=params)
         logger.info(f"Weathercloud update: {r.status_code} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        if r.status_code != 200:
-            logger.warning(f"Weathercloud returned non-200 status: {r.status_code}, response: {r.text}")
+        outcome = classify_response('weathercloud', r)
+        if outcome != SUCCESS:
+            logger.warning(f"Weathercloud update rejected ({outcome}): {r.status_code}, response: {r.text}")
         else:
             logger.info(f"Successfully updated Weathercloud")
-        return True
+        return outcome
     except requests.exceptions.RequestException as e:
         logger.error(f"Weathercloud update failed: {str(e)}")
-        return False
+        return TRANSIENT
     except Exception as e:
         logger.error(f"Unexpected error updating Weathercloud: {str(e)}")
-        return False
+        return TRANSIENT
 
 def submit_to_wunderground(data):
-    config = SERVICES['wunderground']['credentials']
+    config = get_app().services['wunderground']['credentials']
 
     logger.info("Preparing data for Weather Underground submission")
 
-    # Format timestamp in ISO8601 format
-    dt = data['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-
-    # Convert temperature to Fahrenheit
-    temp_f = round(degc_to_degf(data['temperature']), 1)
-
-    # Convert pressure to inches
-    pressure_in = round(hpa_to_inches(data['pressure_sea']), 2)
-
-    # Convert rainfall to inches
-    hourly_rain_in = round(mm_to_inches(data['hourly_rain']), 2)
-    daily_rain_in = round(mm_to_inches(data['daily_rain']), 2)
-
-    # Convert wind speed to mph
-    wind_speed_mph = round(kmh_to_mph(data['wind_speed_2min']), 1)
-    wind_gust_mph = round(kmh_to_mph(data['wind_gust_10min']), 1)
-
-    # Get integer wind direction
-    wind_dir = int(data['wind_dir_2min'])
-
-    # Format humidity as integer
-    humidity = int(data['humidity'])
-
-    # Convert dew point to Fahrenheit
-    dewpoint_f = round(degc_to_degf(data['dew_point']), 1)
-
-    # Build API URL
-    url = (
-        config['url'] +
-        "?ID=" + config['id'] +
-        "&PASSWORD=" + config['password'] +
-        "&dateutc=" + dt +
-        "&tempf=" + str(temp_f) +
-        "&baromin=" + str(pressure_in) +
-        "&humidity=" + str(humidity) +
-        "&dewptf=" + str(dewpoint_f) +
-        "&windspeedmph=" + str(wind_speed_mph) +
-        "&windgustmph=" + str(wind_gust_mph) +
-        "&winddir=" + str(wind_dir) +
-        "&rainin=" + str(hourly_rain_in) +
-        "&dailyrainin=" + str(daily_rain_in) +
-        "&action=updateraw"
-    )
+    with tracer.span('encode.wunderground'):
+        # Format the UTC timestamp for dateutc (YYYY-MM-DD HH:MM:SS)
+        dt = data.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+        # Convert temperature to Fahrenheit
+        temp_f = round(degc_to_degf(data.temperature), 1)
+
+        # Convert pressure to inches
+        pressure_in = round(hpa_to_inches(data.pressure_sea), 2)
+
+        # Convert rainfall to inches
+        hourly_rain_in = round(mm_to_inches(data.hourly_rain), 2)
+        daily_rain_in = round(mm_to_inches(data.daily_rain), 2)
+
+        # Convert wind speeds to mph (current reading, 2-minute average and 10-minute gust)
+        wind_speed_mph = round(kmh_to_mph(data.wind_speed), 1)
+        wind_speed_avg2m_mph = round(kmh_to_mph(data.wind_speed_2min), 1)
+        wind_gust_mph = round(kmh_to_mph(data.wind_gust_10min), 1)
+
+        # Get integer wind directions
+        wind_dir = int(data.wind_dir)
+        wind_dir_avg2m = int(data.wind_dir_2min)
+        wind_gust_dir = int(data.wind_gust_dir)
+
+        # Convert wind chill to Fahrenheit
+        windchill_f = round(degc_to_degf(data.wind_chill), 1)
+
+        # Format humidity as integer
+        humidity = int(data.humidity)
+
+        # Convert dew point to Fahrenheit
+        dewpoint_f = round(degc_to_degf(data.dew_point), 1)
+
+        # Build API URL
+        url = (
+            config['url'] +
+            "?ID=" + config['id'] +
+            "&PASSWORD=" + config['password'] +
+            "&dateutc=" + dt +
+            "&tempf=" + str(temp_f) +
+            "&baromin=" + str(pressure_in) +
+            "&humidity=" + str(humidity) +
+            "&dewptf=" + str(dewpoint_f) +
+            "&windspeedmph=" + str(wind_speed_mph) +
+            "&windgustmph=" + str(wind_gust_mph) +
+            "&winddir=" + str(wind_dir) +
+            "&windgustdir=" + str(wind_gust_dir) +
+            "&windspdmph_avg2m=" + str(wind_speed_avg2m_mph) +
+            "&winddir_avg2m=" + str(wind_dir_avg2m) +
+            "&windgustmph_10m=" + str(wind_gust_mph) +
+            "&windgustdir_10m=" + str(wind_gust_dir) +
+            "&windchillf=" + str(windchill_f) +
+            "&rainin=" + str(hourly_rain_in) +
+            "&dailyrainin=" + str(daily_rain_in) +
+            "&UV=" + str(round(data.uv_index, 1)) +
+            "&action=updateraw"
+        )
+
+        # Rapid-fire mode reports the upload interval as the update frequency
+        if get_app().services['wunderground'].get('realtime', False):
+            url += "&realtime=1&rtfreq=" + str(int(get_app().services['wunderground'].get('interval', 300)))
 
     try:
         # Hide password in debug logs
         masked_url = url.replace(config['password'], "PWD_HIDDEN")
         logger.debug(f"Sending request to Weather Underground: {masked_url}")
 
-        r = requests.get(url, timeout=15)
+        r = service_get('wunderground', url)
         logger.info(f"Weather Underground update: {r.status_code} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        if r.status_code != 200:
-            logger.warning(f"Weather Underground returned non-200 status: {r.status_code}, response: {r.text}")
+        outcome = classify_response('wunderground', r)
+        if outcome != SUCCESS:
+            logger.warning(f"Weather Underground update rejected ({outcome}): {r.status_code}, response: {r.text}")
         else:
             logger.info(f"Successfully updated Weather Underground")
-        return True
+        return outcome
     except requests.exceptions.RequestException as e:
         logger.error(f"Weather Underground update failed: {str(e)}")
-        return False
+        return TRANSIENT
     except Exception as e:
         logger.error(f"Unexpected error updating Weather Underground: {str(e)}")
-        return False
+        return TRANSIENT
 
 def submit_to_windy(data):
-    config = SERVICES['windy']['credentials']
+    config = get_app().services['windy']['credentials']
 
     logger.info("Preparing data for Windy submission")
 
-    # Use the URL directly from configuration - this should include the JWT token
-    # The URL should look like: "https://stations.windy.com/pws/update/eyJhbGc...?")
-    if not config['url'].endswith('?'):
-        base_url = config['url'] + '?'
-    else:
-        base_url = config['url']
-
-    # Format timestamp in the format Windy expects (Y-m-d+H:M:S) if using dateutc param
-    date = data['timestamp'].strftime("%Y-%m-%d")
-    hours = data['timestamp'].strftime("%H")
-    minutes = data['timestamp'].strftime("%M")
-    seconds = data['timestamp'].strftime("%S")
-    localdt = date + "+" + hours + ":" + minutes + ":" + seconds
-
-    # Format values exactly as in your original script
-    temperature_WI = "{:.1f}".format(data['temperature'])
-    uv_index_WI = "{:.1f}".format(data['uv_index'])
-    pressure_WI = "{:.1f}".format(data['pressure_sea'])
-    humidity_WI = "{:.0f}".format(data['humidity'])
-    dewpoint_WI = "{:.1f}".format(data['dew_point'])
-
-    # For precipitation, use hourly rain
-    precip_WI = "{:.2f}".format(data['hourly_rain'])
-
-    # Convert wind speeds to mph as in your original script
-    wind_speed_WI = "{:.1f}".format(kmh_to_mph(data['wind_speed_10min']))
-    wind_gust_WI = "{:.1f}".format(kmh_to_mph(data['wind_gust_10min']))
-    wind_direction_WI = "{:.0f}".format(data['wind_dir_10min'])
-
-    # Build the URL with query parameters
-    url = (
-        base_url +
-        "&temp=" + temperature_WI +
-        "&uv=" + uv_index_WI +
-        "&mbar=" + pressure_WI +
-        "&rh=" + humidity_WI +
-        "&dewpoint=" + dewpoint_WI +
-        "&precip=" + precip_WI +
-        "&windspeedmph=" + wind_speed_WI +
-        "&windgustmph=" + wind_gust_WI +
-        "&winddir=" + wind_direction_WI
-    )
+    with tracer.span('encode.windy'):
+        # Use the URL directly from configuration - this should include the JWT token
+        # The URL should look like: "https://stations.windy.com/pws/update/eyJhbGc...?")
+        if not config['url'].endswith('?'):
+            base_url = config['url'] + '?'
+        else:
+            base_url = config['url']
+
+        # Format the UTC timestamp the way Windy expects for dateutc (Y-m-d+H:M:S)
+        dateutc_WI = data.timestamp.strftime("%Y-%m-%d+%H:%M:%S")
+
+        # Format values exactly as in your original script
+        temperature_WI = "{:.1f}".format(data.temperature)
+        uv_index_WI = "{:.1f}".format(data.uv_index)
+        pressure_WI = "{:.1f}".format(data.pressure_sea)
+        humidity_WI = "{:.0f}".format(data.humidity)
+        dewpoint_WI = "{:.1f}".format(data.dew_point)
+
+        # For precipitation, use hourly rain
+        precip_WI = "{:.2f}".format(data.hourly_rain)
+
+        # Convert wind speeds to mph as in your original script
+        wind_speed_WI = "{:.1f}".format(kmh_to_mph(data.wind_speed_10min))
+        wind_gust_WI = "{:.1f}".format(kmh_to_mph(data.wind_gust_10min))
+        wind_direction_WI = "{:.0f}".format(data.wind_dir_10min)
+
+        # Build the URL with query parameters
+        url = (
+            base_url +
+            "&temp=" + temperature_WI +
+            "&uv=" + uv_index_WI +
+            "&mbar=" + pressure_WI +
+            "&rh=" + humidity_WI +
+            "&dewpoint=" + dewpoint_WI +
+            "&precip=" + precip_WI +
+            "&windspeedmph=" + wind_speed_WI +
+            "&windgustmph=" + wind_gust_WI +
+            "&winddir=" + wind_direction_WI +
+            "&dateutc=" + dateutc_WI
+        )
 
     try:
         logger.debug(f"Sending request to Windy with URL: {url}")
-        r = requests.get(url, timeout=15)
+        r = service_get('windy', url)
         logger.info(f"Windy update: {r.status_code} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-        if r.status_code != 200:
-            logger.warning(f"Windy returned non-200 status: {r.status_code}, response: {r.text}")
+        outcome = classify_response('windy', r)
+        if outcome != SUCCESS:
+            logger.warning(f"Windy update rejected ({outcome}): {r.status_code}, response: {r.text}")
         else:
             logger.info(f"Successfully updated Windy")
 
         # For debugging
         logger.debug(f"Windy request URL: {r.request.url}")
 
-        return True
+        return outcome
     except requests.exceptions.RequestException as e:
         logger.error(f"Windy update failed: {str(e)}")
-        return False
+        return TRANSIENT
     except Exception as e:
         logger.error(f"Unexpected error updating Windy: {str(e)}")
-        return False
+        return TRANSIENT
 
 def submit_to_pwsweather(data):
-    config = SERVICES['pwsweather']['credentials']
+    config = get_app().services['pwsweather']['credentials']
 
     logger.info("Preparing data for PWSWeather submission")
 
-    # Format timestamp in ISO8601 format
-    dt = data['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-
-    # Convert temperature to Fahrenheit
-    temp_f = round(degc_to_degf(data['temperature']), 1)
-
-    # Convert pressure to inches
-    pressure_in = round(hpa_to_inches(data['pressure_sea']), 2)
-
-    # Convert rainfall to inches
-    hourly_rain_in = round(mm_to_inches(data['hourly_rain']), 2)
-    daily_rain_in = round(mm_to_inches(data['daily_rain']), 2)
-
-    # Convert wind speed to mph
-    wind_speed_mph = round(kmh_to_mph(data['wind_speed_2min']), 1)
-    wind_gust_mph = round(kmh_to_mph(data['wind_gust_10min']), 1)
-
-    # Get integer wind direction
-    wind_dir = int(data['wind_dir_2min'])
-
-    # Format humidity as integer
-    humidity = int(data['humidity'])
-
-    # Convert dew point to Fahrenheit
-    dewpoint_f = round(degc_to_degf(data['dew_point']), 1)
-
-    # Build parameters for GET request
-    params = {
-        "ID": config['id'],
-        "PASSWORD": config['password'],
-        "dateutc": dt,
-        "tempf": temp_f,
-        "humidity": humidity,
-        "dewptf": dewpoint_f,
-        "baromin": pressure_in,
-        "windspeedmph": wind_speed_mph,
-        "windgustmph": wind_gust_mph,
-        "winddir": wind_dir,
-        "rainin": hourly_rain_in,
-        "dailyrainin": daily_rain_in,
-        "softwaretype": config['software'],
-        "action": "updateraw"
-    }
+    with tracer.span('encode.pwsweather'):
+        # Format the UTC timestamp for dateutc (YYYY-MM-DD HH:MM:SS)
+        dt = data.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+        # Convert temperature to Fahrenheit
+        temp_f = round(degc_to_degf(data.temperature), 1)
+
+        # Convert pressure to inches
+        pressure_in = round(hpa_to_inches(data.pressure_sea), 2)
+
+        # Convert rainfall to inches
+        hourly_rain_in = round(mm_to_inches(data.hourly_rain), 2)
+        daily_rain_in = round(mm_to_inches(data.daily_rain), 2)
+
+        # Convert wind speeds to mph (current reading, 2-minute average and 10-minute gust)
+        wind_speed_mph = round(kmh_to_mph(data.wind_speed), 1)
+        wind_speed_avg2m_mph = round(kmh_to_mph(data.wind_speed_2min), 1)
+        wind_gust_mph = round(kmh_to_mph(data.wind_gust_10min), 1)
+
+        # Get integer wind directions
+        wind_dir = int(data.wind_dir)
+        wind_dir_avg2m = int(data.wind_dir_2min)
+        wind_gust_dir = int(data.wind_gust_dir)
+
+        # Format humidity as integer
+        humidity = int(data.humidity)
+
+        # Convert dew point to Fahrenheit
+        dewpoint_f = round(degc_to_degf(data.dew_point), 1)
+
+        # Build parameters for GET request
+        params = {
+            "ID": config['id'],
+            "PASSWORD": config['password'],
+            "dateutc": dt,
+            "tempf": temp_f,
+            "humidity": humidity,
+            "dewptf": dewpoint_f,
+            "baromin": pressure_in,
+            "windspeedmph": wind_speed_mph,
+            "windgustmph": wind_gust_mph,
+            "winddir": wind_dir,
+            "windgustdir": wind_gust_dir,
+            "windspdmph_avg2m": wind_speed_avg2m_mph,
+            "winddir_avg2m": wind_dir_avg2m,
+            "windgustmph_10m": wind_gust_mph,
+            "windgustdir_10m": wind_gust_dir,
+            "rainin": hourly_rain_in,
+            "dailyrainin": daily_rain_in,
+            "UV": round(data.uv_index, 1),
+            "softwaretype": config['software'],
+            "action": "updateraw"
+        }
 
     try:
         # Hide password in debug logs
@@ -630,67 +862,69 @@ def submit_to_pwsweather(data):
         debug_params['PASSWORD'] = 'PWD_HIDDEN'
         logger.debug(f"Sending request to PWSWeather: {debug_params}")
 
-        r = requests.get(config['url'], params=params, timeout=15)
+        r = service_get('pwsweather', config['url'], params=params)
         logger.info(f"PWSWeather update: {r.status_code} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        if r.status_code != 200:
-            logger.warning(f"PWSWeather returned non-200 status: {r.status_code}, response: {r.text}")
+        outcome = classify_response('pwsweather', r)
+        if outcome != SUCCESS:
+            logger.warning(f"PWSWeather update rejected ({outcome}): {r.status_code}, response: {r.text}")
         else:
             logger.info(f"Successfully updated PWSWeather")
-        return True
+        return outcome
     except requests.exceptions.RequestException as e:
         logger.error(f"PWSWeather update failed: {str(e)}")
-        return False
+        return TRANSIENT
     except Exception as e:
         logger.error(f"Unexpected error updating PWSWeather: {str(e)}")
-        return False
+        return TRANSIENT
 
 def submit_to_metoffice(data):
-    config = SERVICES['metoffice']['credentials']
+    config = get_app().services['metoffice']['credentials']
 
     logger.info("Preparing data for Met Office submission")
 
-    # Format timestamp
-    dt = data['timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-
-    # Format temperature (°C)
-    temperature = round(data['temperature'], 1)
-
-    # Format dew point (°C)
-    dew_point = round(data['dew_point'], 1)
-
-    # Format pressure (hPa)
-    pressure = round(data['pressure_sea'], 1)
-
-    # Format humidity (%)
-    humidity = int(data['humidity'])
-
-    # Format wind data
-    wind_dir = int(data['wind_dir_10min'])
-    wind_speed_kmh = round(data['wind_speed_10min'], 1)  # km/h
-    wind_gust_kmh = round(data['wind_gust_10min'], 1)    # km/h
-
-    # Format rainfall (mm)
-    hourly_rain = round(data['hourly_rain'], 1)
-
-    # Format UV index
-    uv_index = round(data['uv_index'], 1)
-
-    # Format parameters for Met Office
-    params = {
-        "siteid": config['siteid'],
-        "siteAuthenticationKey": config['auth_key'],
-        "dateutc": dt,
-        "tempf": round(degc_to_degf(temperature), 1),  # Met Office wants Fahrenheit
-        "humidity": humidity,
-        "dewptf": round(degc_to_degf(dew_point), 1),  # Met Office wants Fahrenheit
-        "baromin": round(hpa_to_inches(pressure), 2),  # Met Office wants inches
-        "windspeedmph": round(kmh_to_mph(wind_speed_kmh), 1),  # Met Office wants mph
-        "windgustmph": round(kmh_to_mph(wind_gust_kmh), 1),  # Met Office wants mph
-        "winddir": wind_dir,
-        "rainin": round(mm_to_inches(hourly_rain), 2),  # Met Office wants inches
-        "UV": uv_index,
-        "softwaretype": config['software']
-    }
+    with tracer.span('encode.metoffice'):
+        # Format the UTC timestamp for dateutc
+        dt = data.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+
+        # Format temperature (°C)
+        temperature = round(data.temperature, 1)
+
+        # Format dew point (°C)
+        dew_point = round(data.dew_point, 1)
+
+        # Format pressure (hPa)
+        pressure = round(data.pressure_sea, 1)
+
+        # Format humidity (%)
+        humidity = int(data.humidity)
+
+        # Format wind data
+        wind_dir = int(data.wind_dir_10min)
+        wind_speed_kmh = round(data.wind_speed_10min, 1)  # km/h
+        wind_gust_kmh = round(data.wind_gust_10min, 1)    # km/h
+
+        # Format rainfall (mm)
+        hourly_rain = round(data.hourly_rain, 1)
+
+        # Format UV index
+        uv_index = round(data.uv_index, 1)
+
+        # Format parameters for Met Office
+        params = {
+            "siteid": config['siteid'],
+            "siteAuthenticationKey": config['auth_key'],
+            "dateutc": dt,
+            "tempf": round(degc_to_degf(temperature), 1),  # Met Office wants Fahrenheit
+            "humidity": humidity,
+            "dewptf": round(degc_to_degf(dew_point), 1),  # Met Office wants Fahrenheit
+            "baromin": round(hpa_to_inches(pressure), 2),  # Met Office wants inches
+            "windspeedmph": round(kmh_to_mph(wind_speed_kmh), 1),  # Met Office wants mph
+            "windgustmph": round(kmh_to_mph(wind_gust_kmh), 1),  # Met Office wants mph
+            "winddir": wind_dir,
+            "rainin": round(mm_to_inches(hourly_rain), 2),  # Met Office wants inches
+            "UV": uv_index,
+            "softwaretype": config['software']
+        }
 
     try:
         # Hide auth key in debug logs
@@ -698,84 +932,149 @@ def submit_to_metoffice(data):
         debug_params['siteAuthenticationKey'] = 'AUTH_KEY_HIDDEN'
         logger.debug(f"Sending request to Met Office: {debug_params}")
 
-        r = requests.get(config['url'], params=params, timeout=15)
+        r = service_get('metoffice', config['url'], params=params)
         logger.info(f"Met Office update: {r.status_code} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        if r.status_code != 200:
-            logger.warning(f"Met Office returned non-200 status: {r.status_code}, response: {r.text}")
+        outcome = classify_response('metoffice', r)
+        if outcome != SUCCESS:
+            logger.warning(f"Met Office update rejected ({outcome}): {r.status_code}, response: {r.text}")
         else:
             logger.info(f"Successfully updated Met Office")
-        return True
+        return outcome
     except requests.exceptions.RequestException as e:
         logger.error(f"Met Office update failed: {str(e)}")
-        return False
+        return TRANSIENT
     except Exception as e:
         logger.error(f"Unexpected error updating Met Office: {str(e)}")
+        return TRANSIENT
+
+# Dictionary mapping service names to their submission functions
+SERVICE_FUNCTIONS = {
+    'weathercloud': submit_to_weathercloud,
+    'wunderground': submit_to_wunderground,
+    'windy': submit_to_windy,
+    'pwsweather': submit_to_pwsweather,
+    'metoffice': submit_to_metoffice
+}
+
+def run_service_once(service_name):
+    """Retrieve the latest weather data and submit it to a single service"""
+    with tracer.cycle(f"cycle.{service_name}"):
+        return _run_service_once(service_name)
+
+def _run_service_once(service_name):
+    app = get_app()
+    breaker = app.breakers[service_name]
+
+    # Don't query the database or block on HTTP while the service is failing
+    if not breaker.allow_request():
+        logger.info(f"[{service_name}] Circuit open, skipping update for another {breaker.retry_after():.0f} seconds")
+        metrics.incr(f"uploads.{service_name}.circuit_open")
+        return False
+
+    # Log the service activity
+    logger.info(f"[{service_name}] Retrieving weather data")
+
+    # Get the weather data
+    data = get_weather_data()
+
+    if data is None:
+        logger.warning(f"[{service_name}] No weather data available for update")
+        metrics.incr(f"uploads.{service_name}.no_data")
+        return False
+
+    # Don't re-publish a reading the service already has, or one too old to pass as current
+    skip = app.skip_reason(service_name, data)
+    if skip is not None:
+        age = (data.timestamp - data.source_time).total_seconds() if data.source_time is not None else 0
+        logger.info(f"[{service_name}] Newest reading is {skip} (ID {data.source_id}, {age:.0f}s old), skipping update")
+        metrics.incr(f"uploads.{service_name}.{skip}")
         return False
 
+    # Submit data to the service
+    start = time.time()
+    with tracer.span(f"upload.{service_name}"):
+        outcome = SERVICE_FUNCTIONS[service_name](data)
+    metrics.observe(f"uploads.{service_name}", time.time() - start)
+    metrics.incr(f"uploads.{service_name}.{outcome}")
+    breaker.record(outcome)
+    if outcome == SUCCESS:
+        app.mark_published(service_name, data)
+    return outcome == SUCCESS
+
+def next_run_delay(service_name, interval):
+    """Seconds until the next attempt, honouring an open circuit breaker"""
+    return max(interval, get_app().breakers[service_name].retry_after())
+
 # Service runner
 def service_runner(service_name, interval):
     """Run the service in a loop with specified interval"""
     logger.info(f"Starting {service_name} service runner with {interval} second interval")
-
-    # Dictionary mapping service names to their submission functions
-    service_functions = {
-        'weathercloud': submit_to_weathercloud,
-        'wunderground': submit_to_wunderground,
-        'windy': submit_to_windy,
-        'pwsweather': submit_to_pwsweather,
-        'metoffice': submit_to_metoffice
-    }
-
-    # Get the submission function for this service
-    submit_func = service_functions[service_name]
+    app = get_app()
+    wakeup = app.wakeups[service_name]
+    wakeup.clear()
 
     # Run the service loop
     next_run = 0  # Run immediately on first iteration
+    last_run = 0
+    last_sequence = None  # Last new-data event handled (event-driven mode)
 
     while True:
         try:
-            # Sleep until next scheduled run
+            # Sleep until next scheduled run, waking early if a config reload changed this service
             sleep_time = max(0, next_run - time.time())
-            if sleep_time > 0:
-                time.sleep(sleep_time)
-
-            # Log the service activity
-            logger.info(f"[{service_name}] Retrieving weather data")
-
-            # Get the weather data
-            data = get_weather_data()
-
-            if data is None:
-                logger.warning(f"[{service_name}] No weather data available for update")
-            else:
-                # Submit data to the service
-                submit_func(data)
-
-            # Calculate next run time
-            next_run = time.time() + interval
+            if wakeup.wait(sleep_time):
+                wakeup.clear()
+                service_config = app.services[service_name]
+                if not service_config.get('enabled', False):
+                    logger.info(f"[{service_name}] Disabled by config reload, stopping service runner")
+                    return
+                new_interval = int(service_config.get('interval', 300))
+                if new_interval != interval:
+                    logger.info(f"[{service_name}] Interval changed from {interval} to {new_interval} seconds")
+                    interval = new_interval
+                    next_run = last_run + next_run_delay(service_name, interval)
+                continue
+
+            # In event-driven mode, wait for a new dataentry row instead of querying blindly
+            if app.notifier is not None:
+                from dataentry_events import fallback_interval
+                sequence = app.notifier.wait_for_new(last_sequence, fallback_interval(app.config.get('trigger')),
+                                                     interrupt=wakeup)
+                if wakeup.is_set():
+                    continue  # Apply the config reload before uploading
+                if sequence == last_sequence:
+                    logger.info(f"[{service_name}] No new data event received, uploading on fallback interval")
+                last_sequence = sequence
+
+            # Retrieve data and submit it to the service
+            last_run = time.time()
+            run_service_once(service_name)
+
+            # Calculate next run time (later if the circuit breaker opened)
+            delay = next_run_delay(service_name, interval)
+            next_run = time.time() + delay
 
             # Log next scheduled update time
             next_update_time = datetime.fromtimestamp(next_run).strftime("%H:%M:%S")
-            logger.info(f"[{service_name}] Next update in {interval} seconds at {next_update_time}")
+            logger.info(f"[{service_name}] Next update in {delay:.0f} seconds at {next_update_time}")
 
         except Exception as e:
             error_details = traceback.format_exc()
             logger.error(f"Error in {service_name} service: {str(e)}")
             logger.debug(f"Error details: {error_details}")
 
-            # Don't bombard the service if there's an error - wait before retrying
-            time.sleep(min(interval, 30))  # Wait at least 30 seconds
-
-            # Recalculate next run time
-            next_run = time.time() + interval
+            # Count the error against the breaker so repeated failures back off exponentially
+            app.breakers[service_name].record_failure(TRANSIENT)
+            next_run = time.time() + next_run_delay(service_name, interval)
 
 def init_service(service_name):
     """Initialize a service from the configuration"""
-    if service_name not in SERVICES:
+    services = get_app().services
+    if service_name not in services:
         logger.error(f"Service {service_name} not found in configuration")
         return False
 
-    service_config = SERVICES[service_name]
+    service_config = services[service_name]
 
     # Check if the service is enabled
     if not service_config.get('enabled', False):
@@ -800,19 +1099,32 @@ def init_service(service_name):
 
 def main():
     """Main function to initialize and run all services"""
+    configure_logging()
     logger.info("=== Weather Station Service Starting ===")
+    app = get_app()
 
     # Initialize database connection
     try:
-        global conn, cursor
         logger.info("Establishing new database connection")
-        conn = db.connect()
-        cursor = conn.cursor()
+        app.conn = app.db.connect()
+        app.cursor = app.conn.cursor(buffered=True)
         logger.info("Connected to database")
     except Exception as e:
         logger.error(f"Failed to connect to database: {str(e)}")
         sys.exit(1)
 
+    # Start the optional new-data trigger and sensor ingestion endpoint
+    app.start_event_sources(lambda: Database(app.db_config))
+
+    # Optional local read API for dashboards
+    app.start_read_api(lambda: Database(app.db_config))
+
+    # Optional climatology (daily/monthly aggregates and records)
+    app.start_climate(lambda: Database(app.db_config))
+
+    # Optional span tracing and sampling profiler
+    start_tracing(app.config.get('trace'))
+
     # List of services to initialize
     services = ['weathercloud', 'wunderground', 'windy', 'pwsweather', 'metoffice']
 
@@ -824,6 +1136,18 @@ def main():
         if thread:
             threads[service_name] = thread
 
+    # Apply config file changes without restarting: start newly enabled services
+    # (disabled and retuned runners pick up the change themselves)
+    def apply_reload():
+        for service_name, change in (app.reload() or {}).items():
+            thread = threads.get(service_name)
+            if change == STARTED and service_name in SERVICE_FUNCTIONS and not (thread and thread.is_alive()):
+                new_thread = init_service(service_name)
+                if new_thread:
+                    threads[service_name] = new_thread
+
+    start_config_watcher(app.config.get('reload'), app.config_path, apply_reload)
+
     logger.info("=== Weather Station Service Running ===")
 
     # Periodically check that all services are still running
@@ -832,10 +1156,13 @@ def main():
             # List active services
             active_services = [name for name, thread in threads.items() if thread.is_alive()]
             logger.info(f"Service status: {len(active_services)}/{len(threads)} active ({', '.join(active_services)})")
+            logger.info(f"Metrics: {metrics.summary()}")
 
-            # If any service has died, restart it
+            # If any service has died, restart it (unless a config reload disabled it)
             for service_name, thread in list(threads.items()):
-                if not thread.is_alive():
+                if not thread.is_alive() and not app.services[service_name].get('enabled', False):
+                    del threads[service_name]
+                elif not thread.is_alive():
                     logger.warning(f"Service {service_name} has stopped. Restarting...")
                     new_thread = init_service(service_name)
                     if new_thread:
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+import argparse
+import csv
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import weather_services
+from weather_services import logger, SERVICE_FUNCTIONS
+from service_health import SUCCESS
+from snapshot import MEASUREMENT_FIELDS, SOURCE_FIELDS
+from station_metrics import metrics
+from station_trace import tracer, start_tracing
+
+DEFAULT_SPEED = 100  # virtual seconds per real second
+DEFAULT_SINK_PORT = 8799
+
+# Virtual clock running at a multiple of real time from a start point in history
+class VirtualClock:
+    def __init__(self, start, speed):
+        self.start = start
+        self.speed = speed
+        self.real_start = time.time()
+
+    def now(self):
+        return self.start + timedelta(seconds=(time.time() - self.real_start) * self.speed)
+
+    def sleep_until(self, when):
+        """Sleep in real time until the virtual clock reaches when"""
+        if self.speed > 0:
+            remaining = (when - self.now()).total_seconds() / self.speed
+            if remaining > 0:
+                time.sleep(remaining)
+
+# Local HTTP endpoint standing in for every upload service
+class MockSink:
+    def __init__(self, port, latency=0.0):
+        self.requests = Counter()
+        self.lock = threading.Lock()
+        sink = self
+
+        class SinkHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if latency:
+                    time.sleep(latency)
+                with sink.lock:
+                    sink.requests[self.path.split('/')[1].split('?')[0]] += 1
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"success")
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), SinkHandler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="mock_sink_thread", daemon=True).start()
+
+    def url(self, service_name):
+        return f"http://127.0.0.1:{self.port}/{service_name}"
+
+def run_simulation(start, end, speed, services, sink, output=None):
+    """Replay dataentry history between start and end through the upload pipeline.
+
+    Each service runs on its configured interval against the virtual clock;
+    snapshots are aggregated at the virtual "now" and uploads go to the mock sink.
+    """
+    # Point every simulated service at the mock sink
+    app = weather_services.get_app()
+    service_configs = app.services
+    for service_name in services:
+        service_configs[service_name]['credentials']['url'] = sink.url(service_name)
+
+    intervals = {name: int(service_configs[name].get('interval', 300)) for name in services}
+    next_due = {name: start for name in services}
+    clock = VirtualClock(start, speed)
+    outcomes = Counter()
+    writer = None
+
+    if output:
+        output_file = open(output, 'w', newline='')
+        writer = csv.writer(output_file)
+        writer.writerow(['virtual_time', 'service', 'outcome'] + list(MEASUREMENT_FIELDS + SOURCE_FIELDS))
+
+    real_start = time.time()
+    try:
+        while True:
+            # Next service due on the virtual timeline
+            service_name = min(next_due, key=next_due.get)
+            due = next_due[service_name]
+            if due > end:
+                break
+
+            clock.sleep_until(due)
+            next_due[service_name] = due + timedelta(seconds=intervals[service_name])
+
+            data = weather_services.get_weather_data(now=due)
+            if data is None:
+                outcomes[(service_name, 'no_data')] += 1
+                continue
+
+            # Same freshness rules as live uploads (unchanged or stale readings are skipped)
+            outcome = app.skip_reason(service_name, data)
+            if outcome is None:
+                outcome = SERVICE_FUNCTIONS[service_name](data)
+                if outcome == SUCCESS:
+                    app.mark_published(service_name, data)
+            outcomes[(service_name, outcome)] += 1
+
+            if writer is not None:
+                writer.writerow([due.isoformat(), service_name, outcome] + [getattr(data, field) for field in MEASUREMENT_FIELDS + SOURCE_FIELDS])
+    finally:
+        if writer is not None:
+            output_file.close()
+
+    elapsed = time.time() - real_start
+    return outcomes, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay dataentry history through the upload pipeline")
+    parser.add_argument('--start', required=True, help="Virtual start time (YYYY-MM-DD HH:MM:SS)")
+    parser.add_argument('--end', help="Virtual end time (default: start + 1 day)")
+    parser.add_argument('--speed', type=float, default=DEFAULT_SPEED,
+                        help="Virtual seconds per real second (0 = as fast as possible)")
+    parser.add_argument('--services', nargs='+', default=list(SERVICE_FUNCTIONS), choices=list(SERVICE_FUNCTIONS))
+    parser.add_argument('--sink-port', type=int, default=DEFAULT_SINK_PORT, help="Port for the mock upload sink")
+    parser.add_argument('--sink-latency', type=float, default=0.0, help="Simulated upload latency in seconds")
+    parser.add_argument('--output', help="Write every snapshot to this CSV file for aggregate validation")
+    parser.add_argument('--trace', action='store_true', help="Record pipeline spans and write a Chrome trace at the end")
+    args = parser.parse_args()
+
+    weather_services.configure_logging()
+    if args.trace:
+        start_tracing(dict(weather_services.get_app().config.get('trace') or {}, enabled=True))
+    start = datetime.fromisoformat(args.start)
+    end = datetime.fromisoformat(args.end) if args.end else start + timedelta(days=1)
+
+    sink = MockSink(args.sink_port, args.sink_latency)
+    logger.info(f"Simulating {', '.join(args.services)} from {start} to {end} at {args.speed:g}x")
+
+    outcomes, elapsed = run_simulation(start, end, args.speed, args.services, sink, args.output)
+
+    virtual_seconds = (end - start).total_seconds()
+    total = sum(outcomes.values())
+    logger.info(f"Simulated {virtual_seconds / 3600:.1f} hours with {total} uploads in {elapsed:.1f}s "
+                f"({virtual_seconds / max(elapsed, 1e-9):.0f}x real time, {total / max(elapsed, 1e-9):.1f} uploads/s)")
+    for (service_name, outcome), count in sorted(outcomes.items()):
+        logger.info(f"  {service_name}: {outcome} x{count}")
+    logger.info(f"Mock sink received: {dict(sink.requests)}")
+    logger.info(f"Metrics: {metrics.summary()}")
+    if args.trace:
+        tracer.dump('simulation')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/python3
+import os
+import sys
+import time
+import signal
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import weather_services
+from weather_services import logger
+from station_metrics import metrics, format_summary
+from storage import create_storage
+from config_reload import STARTED, STOPPED, RETUNED, UPDATED, start_config_watcher
+from station_trace import tracer, start_tracing
+
+# The forecast service lives in its own directory (imported only when enabled)
+FORECAST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forecast')
+
+# Supervisor defaults (overridable in the 'supervisor' config section)
+DEFAULT_WORKERS = 4
+DEFAULT_DRAIN_TIMEOUT = 30  # seconds to wait for in-flight jobs on shutdown
+DEFAULT_POOL_SIZE = 3  # uploader connection + current and full forecast updates (other jobs add their own)
+DEFAULT_SHARDS = 1  # upload worker processes (1 runs the uploads in this process)
+
+# Single scheduler dispatching every periodic job onto a shared worker pool
+class SharedScheduler:
+    def __init__(self, max_workers):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.notifier = None
+        self.fallback_interval = None
+
+    def attach_notifier(self, notifier, fallback):
+        """Wake event-driven jobs as soon as new dataentry rows land"""
+        self.notifier = notifier
+        self.fallback_interval = fallback
+        notifier.add_listener(self.wake_event.set)
+
+    def add_job(self, name, interval, func, run_immediately=True, event_driven=False):
+        """Register a job to run every interval seconds.
+
+        Event-driven jobs treat interval as the minimum spacing between runs and
+        only run once a new-data event has arrived (or the fallback interval passed).
+        """
+        job = {
+            'name': name,
+            'interval': interval,
+            'func': func,
+            'next_run': time.time() if run_immediately else time.time() + interval,
+            'future': None,
+            'event_driven': event_driven,
+            'last_sequence': None,
+            'last_run': 0
+        }
+        with self.lock:
+            self.jobs.append(job)
+        logger.info(f"Scheduled {name} every {interval} seconds")
+
+    def remove_job(self, name):
+        """Stop scheduling a job (a running copy is left to finish)"""
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job['name'] != name]
+        logger.info(f"Unscheduled {name}")
+
+    def set_interval(self, name, interval):
+        """Change a job's interval, rescheduling its next run from the last one"""
+        with self.lock:
+            for job in self.jobs:
+                if job['name'] == name:
+                    job['interval'] = interval
+                    if job['last_run']:
+                        job['next_run'] = job['last_run'] + interval
+        self.wake_event.set()
+        logger.info(f"Rescheduled {name} every {interval} seconds")
+
+    def _run_job(self, job):
+        start = time.time()
+        try:
+            job['func']()
+        except Exception as e:
+            logger.error(f"Error in {job['name']} job: {str(e)}")
+            logger.debug(f"Error details: {traceback.format_exc()}")
+            metrics.incr(f"jobs.{job['name']}.errors")
+        finally:
+            metrics.observe(f"jobs.{job['name']}", time.time() - start)
+
+    def run(self):
+        """Dispatch due jobs until stop() is called"""
+        while not self.stop_event.is_set():
+            now = time.time()
+            wake_times = []
+            with self.lock:
+                for job in self.jobs:
+                    if job['next_run'] > now:
+                        wake_times.append(job['next_run'])
+                        continue
+
+                    # Event-driven jobs wait for new data instead of querying on every tick
+                    if job['event_driven'] and self.notifier is not None:
+                        sequence = self.notifier.sequence
+                        fallback_at = job['last_run'] + self.fallback_interval
+                        if sequence == job['last_sequence'] and now < fallback_at:
+                            wake_times.append(fallback_at)
+                            continue
+                        job['last_sequence'] = sequence
+
+                    # Never run two copies of the same job at once
+                    if job['future'] is not None and not job['future'].done():
+                        logger.warning(f"{job['name']} is still running, skipping this cycle")
+                        metrics.incr(f"jobs.{job['name']}.skipped")
+                    else:
+                        job['future'] = self.executor.submit(self._run_job, job)
+
+                    job['last_run'] = now
+                    job['next_run'] = now + job['interval']
+                    wake_times.append(job['next_run'])
+
+            # Sleep until the next job is due, a new-data event arrives or shutdown
+            next_run = min(wake_times, default=now + 60)
+            self.wake_event.wait(max(0, next_run - time.time()))
+            self.wake_event.clear()
+
+    def in_flight(self):
+        """Return futures of jobs that are currently running"""
+        with self.lock:
+            return [job['future'] for job in self.jobs if job['future'] is not None and not job['future'].done()]
+
+    def stop(self, drain_timeout):
+        """Stop dispatching and wait for in-flight jobs to finish"""
+        self.stop_event.set()
+        self.wake_event.set()
+        pending = self.in_flight()
+        if pending:
+            logger.info(f"Draining {len(pending)} in-flight job(s) (timeout {drain_timeout}s)")
+            done, not_done = wait(pending, timeout=drain_timeout)
+            if not_done:
+                logger.warning(f"{len(not_done)} job(s) did not finish before the drain timeout")
+        self.executor.shutdown(wait=False)
+
+def create_connection_pool(db_config, pool_size):
+    """Create the connection pool shared by both subsystems"""
+    logger.info(f"Creating shared database connection pool (size {pool_size})")
+    return create_storage(db_config).create_pool("weather_station", pool_size, autocommit=True)
+
+def upload_job(service_name):
+    """Build a scheduler job submitting data to one upload service"""
+    return lambda: weather_services.run_service_once(service_name)
+
+def main():
+    """Run the upload services and forecast ingestion in one process"""
+    weather_services.configure_logging()
+    logger.info("=== Weather Station Supervisor Starting ===")
+    app = weather_services.get_app()
+    config = app.config
+
+    supervisor_config = config.get('supervisor') or {}
+    workers = int(supervisor_config.get('workers', DEFAULT_WORKERS))
+    drain_timeout = int(supervisor_config.get('drain_timeout', DEFAULT_DRAIN_TIMEOUT))
+    shards = int(supervisor_config.get('shards', DEFAULT_SHARDS))
+    pool_size = max(DEFAULT_POOL_SIZE, int(app.db_config.get('pool_size', DEFAULT_POOL_SIZE)))
+
+    # The notification table watcher holds one pooled connection of its own
+    trigger_config = config.get('trigger') or {}
+    if trigger_config.get('enabled', False) and trigger_config.get('mode') == 'table':
+        pool_size += 1
+
+    # So does the ingestion batch writer
+    ingest_config = config.get('ingest') or {}
+    if ingest_config.get('enabled', False):
+        pool_size += 1
+
+    # And the read API's forecast loader, and its history queries
+    api_config = config.get('api') or {}
+    if api_config.get('enabled', False):
+        pool_size += 2 if api_config.get('history', True) else 1
+
+    # And the climatology updates
+    climate_config = config.get('climate') or {}
+    if climate_config.get('enabled', False):
+        pool_size += 1
+
+    # And the forecast housekeeping, which runs alongside the forecast updates
+    forecast_config = config.get('forecast')
+    if forecast_config and forecast_config.get('enabled', True):
+        pool_size += 1
+
+        # And the far horizon update of a tiered refresh, which also starts immediately
+        if (forecast_config.get('tiers') or {}).get('near_days') is not None:
+            pool_size += 1
+
+    try:
+        pool = create_connection_pool(app.db_config, pool_size)
+    except Exception as e:
+        logger.error(f"Failed to create database connection pool: {str(e)}")
+        sys.exit(1)
+
+    app.set_connection_pool(pool)
+    scheduler = SharedScheduler(workers)
+
+    # Optional span tracing and sampling profiler
+    profiler = start_tracing(config.get('trace'))
+
+    # Optional event-driven uploads and direct sensor ingestion
+    app.start_event_sources(lambda: weather_services.Database(app.db_config, pool=pool))
+    notifier = app.notifier
+    if notifier is not None:
+        from dataentry_events import fallback_interval
+        scheduler.attach_notifier(notifier, fallback_interval(trigger_config))
+
+    # Optional local read API for dashboards
+    app.start_read_api(lambda: weather_services.Database(app.db_config, pool=pool))
+
+    # Optional climatology (daily/monthly aggregates and records)
+    app.start_climate(lambda: weather_services.Database(app.db_config, pool=pool))
+
+    # Upload services
+    enabled = []
+    for service_name in weather_services.SERVICE_FUNCTIONS:
+        service_config = app.services.get(service_name, {})
+        if not service_config.get('enabled', False):
+            logger.info(f"Service {service_name} is disabled in configuration")
+            continue
+        enabled.append(service_name)
+
+    # Optionally run them in worker processes instead of this one
+    shard_manager = None
+    if shards > 1:
+        from station_shards import start_shards
+        if notifier is not None:
+            logger.info("Sharded uploads run on their intervals; new-data events only wake in-process jobs")
+        shard_manager = start_shards(app.config_path, shards, workers, drain_timeout, enabled)
+    else:
+        for service_name in enabled:
+            interval = int(app.services[service_name].get('interval', 300))
+            scheduler.add_job(service_name, interval, upload_job(service_name), event_driven=notifier is not None)
+
+    # Apply config file changes to the upload schedules, keeping the pool and caches
+    def apply_reload():
+        freshness = app.config.get('freshness')
+        changes = app.reload() or {}
+
+        # Worker processes re-read the config when their shard is restarted
+        if shard_manager is not None:
+            enabled = [name for name in weather_services.SERVICE_FUNCTIONS
+                       if app.services.get(name, {}).get('enabled', False)]
+            shard_manager.apply(enabled)
+            if app.config.get('freshness') != freshness:
+                shard_manager.restart(enabled)
+            else:
+                shard_manager.restart([name for name, change in changes.items() if change in (RETUNED, UPDATED)])
+            return
+
+        for service_name, change in changes.items():
+            if service_name not in weather_services.SERVICE_FUNCTIONS:
+                continue
+            interval = int(app.services[service_name].get('interval', 300))
+            if change == STARTED:
+                scheduler.add_job(service_name, interval, upload_job(service_name), event_driven=notifier is not None)
+            elif change == STOPPED:
+                scheduler.remove_job(service_name)
+            elif change == RETUNED:
+                scheduler.set_interval(service_name, interval)
+
+    start_config_watcher(config.get('reload'), app.config_path, apply_reload)
+
+    # Forecast ingestion (optional)
+    if forecast_config and forecast_config.get('enabled', True):
+        sys.path.insert(0, FORECAST_DIR)
+        import visualcrossing_forecast as forecast
+
+        if forecast.validate_config(config):
+            forecast.configure(config, pool=pool)
+            forecast.create_database_tables()
+
+            # Refreshed forecast tables are re-read by the read API on its next request
+            if app.read_cache is not None:
+                from station_api import FORECAST_TABLES
+                forecast.UPDATE_LISTENERS.append(
+                    lambda tables: app.read_cache.invalidate(*(FORECAST_TABLES[table] for table in tables)))
+            scheduler.add_job('forecast_full', forecast.FORECAST_UPDATE_INTERVAL * 60, forecast.update_full_forecast)
+            if forecast.NEAR_DAYS is not None:
+                scheduler.add_job('forecast_far', forecast.FAR_UPDATE_INTERVAL * 60, forecast.update_far_forecast)
+            scheduler.add_job('forecast_current', forecast.CURRENT_UPDATE_INTERVAL * 60, forecast.update_current_only,
+                              run_immediately=False)
+            scheduler.add_job('forecast_purge', forecast.PURGE_INTERVAL * 60, forecast.purge_expired_forecasts,
+                              run_immediately=False)
+        else:
+            logger.error("Forecast configuration is invalid, forecast ingestion disabled")
+    else:
+        logger.info("Forecast ingestion is disabled in configuration")
+
+    # Graceful shutdown on SIGTERM/SIGINT
+    shutdown_event = threading.Event()
+
+    def request_shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        shutdown_event.set()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    scheduler_thread = threading.Thread(target=scheduler.run, name="scheduler", daemon=True)
+    scheduler_thread.start()
+    logger.info("=== Weather Station Supervisor Running ===")
+
+    # Periodically report status until shutdown is requested
+    while not shutdown_event.wait(60):
+        if not scheduler_thread.is_alive():
+            logger.warning("Scheduler has stopped. Restarting...")
+            scheduler_thread = threading.Thread(target=scheduler.run, name="scheduler", daemon=True)
+            scheduler_thread.start()
+
+        metrics.set_gauge('jobs.in_flight', len(scheduler.in_flight()))
+        if shard_manager is not None:
+            shard_manager.check()
+            summary = format_summary(shard_manager.snapshot())
+        else:
+            summary = metrics.summary()
+        logger.info(f"Status at {datetime.now().strftime('%H:%M:%S')}: {summary}")
+
+    scheduler.stop(drain_timeout)
+    if shard_manager is not None:
+        shard_manager.stop()
+
+    # Keep the spans (and profile) of the final cycles for offline analysis
+    if tracer.enabled:
+        path = tracer.dump('shutdown')
+        if profiler.running:
+            profiler.stop()
+            profiler.write(path.replace('.json', '.folded'))
+    logger.info("=== Weather Station Supervisor Stopped ===")
+
+if __name__ == "__main__":
+    main()